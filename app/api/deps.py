@@ -0,0 +1,41 @@
+# app/api/deps.py
+from typing import Any, Dict
+
+from fastapi import Depends, Header
+
+from app.services.auth_service import verify_access_token
+from app.services.user_service import get_user_profile
+
+
+def get_current_user(authorization: str = Header(None)) -> Dict[str, Any]:
+    """
+    Resolve the bearer token once per request. FastAPI caches a dependency
+    per request, so routes and sub-dependencies that both ask for it share
+    one lookup. Returns {"error": ...} on failure so routes can pass it
+    straight back like the rest of the API does.
+    """
+    if not authorization:
+        return {"error": "Missing token"}
+    user_id = verify_access_token(authorization.replace("Bearer ", ""))
+    if not user_id:
+        return {"error": "Invalid token"}
+    return {"id": user_id}
+
+
+def get_current_user_with_flags(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    """
+    get_current_user plus the profile flags (kyc_verified, is_admin), for the
+    routes that check them; the others skip the users lookup entirely.
+    """
+    if user.get("error"):
+        return user
+    try:
+        profile = get_user_profile(user["id"]) or {}
+    except Exception as e:
+        print(f"⚠️ Could not load profile of {user['id']}: {e}")
+        return {"error": "Could not load user profile, please retry"}
+    return {
+        "id": user["id"],
+        "kyc_verified": bool(profile.get("kyc_verified")),
+        "is_admin": bool(profile.get("is_admin")),
+    }
@@ -1,25 +1,24 @@
-from fastapi import APIRouter, Header, HTTPException
-from app.services.auth_service import verify_access_token
+from fastapi import APIRouter, Depends, HTTPException
+from app.api.deps import get_current_user_with_flags
+from app.core.scheduler import scheduler
+from app.core.websocket_manager import manager as ws_manager
 import app.services.admin_service as admin_service
+from app.services.listings_service import get_listings_page
+from app.services.realtime_listener import realtime_metrics
+from app.services.reconciliation_service import run_reconciliation
 from app.services.supabase_service import supabase
 
 router = APIRouter()
 
-def require_admin(authorization: str):
+def require_admin(user: dict = Depends(get_current_user_with_flags)):
     """Verify JWT and ensure the user is admin."""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing token")
+    if user.get("error"):
+        raise HTTPException(status_code=401, detail=user["error"])
 
-    token = authorization.replace("Bearer ", "")
-    user_id = verify_access_token(token)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user = supabase.table("users").select("is_admin").eq("id", user_id).execute().data
-    if not user or not user[0]["is_admin"]:
+    if not user["is_admin"]:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    return user_id
+    return user["id"]
 
 # ------------------- EXISTING ADMIN ROUTES -------------------
 
@@ -32,8 +31,10 @@ def remove_user(user_id: str):
     return admin_service.delete_user(user_id)
 
 @router.get("/admin/listings", tags=["Admin"])
-def all_listings():
-    return {"listings": admin_service.get_all_listings()}
+def all_listings(cursor: str = None, limit: int = 50, category_id: int = None, owner_id: str = None, legacy: bool = False):
+    if legacy:
+        return {"listings": admin_service.get_all_listings()}
+    return get_listings_page(cursor, limit, category_id=category_id, owner_id=owner_id)
 
 @router.delete("/admin/listings/{listing_id}", tags=["Admin"])
 def remove_listing(listing_id: int):
@@ -52,34 +53,53 @@ def platform_summary():
     return admin_service.get_platform_stats()
 
 @router.post("/kyc/review", tags=["Admin"])
-def review_kyc(user_id: str, approve: bool, reason: str = None, authorization: str = Header(None)):
-    admin_id = require_admin(authorization)
+def review_kyc(user_id: str, approve: bool, reason: str = None, admin_id: str = Depends(require_admin)):
     return admin_service.review_kyc(user_id, admin_id, approve, reason)
 
 # ------------------- NEW ADMIN ROUTES -------------------
 
 @router.get("/admin/delivery/view-all", tags=["Admin"])
-def admin_view_all_tasks(authorization: str = Header(None)):
-    require_admin(authorization)
+def admin_view_all_tasks(admin_id: str = Depends(require_admin)):
     return admin_service.get_all_delivery_tasks()
 
 @router.post("/admin/delivery/override", tags=["Admin"])
-def admin_override_verification(task_id: int, verification_type: str, authorization: str = Header(None)):
-    admin_id = require_admin(authorization)
+def admin_override_verification(task_id: int, verification_type: str, admin_id: str = Depends(require_admin)):
     return admin_service.override_verification(task_id, admin_id, verification_type)
 
 @router.post("/admin/delivery/regenerate-otp", tags=["Admin"])
-def admin_regenerate_otp(task_id: int, authorization: str = Header(None)):
-    admin_id = require_admin(authorization)
+def admin_regenerate_otp(task_id: int, admin_id: str = Depends(require_admin)):
     return admin_service.regenerate_otp(task_id, admin_id)
 
 @router.get("/admin/actions/logs", tags=["Admin"])
-def admin_view_logs(authorization: str = Header(None)):
-    require_admin(authorization)
+def admin_view_logs(admin_id: str = Depends(require_admin)):
     return {"actions": admin_service.get_admin_actions()}
 
 @router.get("/admin/notifications", tags=["Admin"])
-def admin_notifications(authorization: str = Header(None)):
-    admin_id = require_admin(authorization)
+def admin_notifications(admin_id: str = Depends(require_admin)):
     res = supabase.table("notifications").select("*").eq("user_id", admin_id).order("created_at", desc=True).execute()
     return {"notifications": res.data}
+
+@router.get("/admin/reconciliation", tags=["Admin"])
+def ledger_reconciliation(admin_id: str = Depends(require_admin)):
+    """Compare wallet balances with the ledger and succeeded payments with their credits."""
+    return run_reconciliation()
+
+@router.get("/admin/scheduler/metrics", tags=["Admin"])
+def scheduler_metrics(admin_id: str = Depends(require_admin)):
+    """Run counts, failures and durations of the periodic background jobs."""
+    return scheduler.metrics()
+
+@router.get("/admin/ws/metrics", tags=["Admin"])
+def websocket_metrics(admin_id: str = Depends(require_admin)):
+    """Open sockets, queued frames and dropped-message counters of this worker."""
+    return ws_manager.metrics()
+
+@router.get("/admin/realtime/metrics", tags=["Admin"])
+def realtime_listener_metrics(admin_id: str = Depends(require_admin)):
+    """Realtime feed health: reconnects, catch-ups, per-table lag and throughput."""
+    return realtime_metrics()
+
+@router.post("/admin/scheduler/{job_name}/run", tags=["Admin"])
+async def run_scheduled_job(job_name: str, admin_id: str = Depends(require_admin)):
+    """Trigger a background job now (skipped if it is already running)."""
+    return await scheduler.run_now(job_name)
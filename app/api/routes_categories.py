@@ -1,15 +1,25 @@
 # app/api/routes_categories.py
 
-from fastapi import APIRouter
-from app.services.supabase_service import get_all_categories
+from fastapi import APIRouter, Header, Response
+from app.services.supabase_service import get_categories_response
 
 # Create a router object — this groups related routes (in this case, category routes)
 router = APIRouter()
 
 @router.get("/categories", tags=["Categories"])
-def read_categories():
+def read_categories(if_none_match: str = Header(None)):
     """
     API endpoint to fetch all categories from Supabase.
+    Served from a process cache with a strong ETag; a matching
+    If-None-Match gets 304 with no body.
     """
-    data = get_all_categories()
-    return {"categories": data}
+    body, etag = get_categories_response()
+    if etag is None:
+        return {"categories": body}
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
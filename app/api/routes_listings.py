@@ -1,44 +1,64 @@
 # app/api/routes_listings.py
-from fastapi import APIRouter, Header
-from app.services.listings_service import get_all_listings, add_listing, delete_listing
-from app.services.auth_service import verify_access_token
+from datetime import date
+from fastapi import APIRouter, Depends, Query
+from app.api.deps import get_current_user, get_current_user_with_flags
+from app.services.availability_service import get_listing_availability
+from app.services.listings_service import get_all_listings, get_listings_page, add_listing, delete_listing
+from app.services.search_service import search_listings
 from app.services.supabase_service import supabase
 
 router = APIRouter()
 
 @router.get("/listings", tags=["Listings"])
-def all_listings():
-    """Get all listings"""
-    return {"listings": get_all_listings()}
+def all_listings(
+    cursor: str = None,
+    limit: int = 20,
+    category_id: int = None,
+    min_price: float = None,
+    max_price: float = None,
+    owner_id: str = None,
+    fields: str = None,
+    legacy: bool = False,
+):
+    """
+    Get listings one page at a time (newest first). Pass `next_cursor` back as
+    `cursor` for the following page. `legacy=true` returns the old unpaginated
+    {"listings": [...]} response.
+    """
+    if legacy:
+        return {"listings": get_all_listings()}
+    return get_listings_page(cursor, limit, category_id, min_price, max_price, owner_id, fields)
+
+@router.get("/listings/search", tags=["Listings"])
+def search(q: str = "", category_id: int = None, min_price: float = None, max_price: float = None, limit: int = 20, offset: int = 0):
+    """Full-text search over listing titles/descriptions with category and price facets"""
+    return search_listings(q, category_id, min_price, max_price, limit, offset)
 
 @router.get("/my_listings", tags=["Listings"])
-def my_listings(authorization: str = Header(None)):
+def my_listings(user: dict = Depends(get_current_user)):
     """Fetch listings posted by the logged-in user"""
-    if not authorization:
-        return {"error": "Missing token"}
-    user_id = verify_access_token(authorization.replace("Bearer ", ""))
-    if not user_id:
-        return {"error": "Invalid token"}
-    res = supabase.table("listings").select("*").eq("owner_id", user_id).execute()
+    if user.get("error"):
+        return user
+    res = supabase.table("listings").select("*").eq("owner_id", user["id"]).execute()
     return {"listings": res.data}
 
 @router.post("/listings", tags=["Listings"])
-def create_listing(title: str, description: str, price_per_day: float, category_id: int, authorization: str = Header(None)):
+def create_listing(title: str, description: str, price_per_day: float, category_id: int, user: dict = Depends(get_current_user_with_flags)):
     """Create new listing (requires wallet with at least ₹25)"""
-    if not authorization:
-        return {"error": "Missing token"}
-    token = authorization.replace("Bearer ", "")
-    owner_id = verify_access_token(token)
-    if not owner_id:
-        return {"error": "Invalid token"}
+    if user.get("error"):
+        return user
 
     # Enforce KYC verification before allowing listing creation
-    user_rows = supabase.table("users").select("kyc_verified").eq("id", owner_id).execute().data
-    if not user_rows or not user_rows[0].get("kyc_verified"):
+    if not user["kyc_verified"]:
         return {"error": "KYC verification required before listing an item"}
 
     # Create listing and charge the listing fee in the service
-    return add_listing(title, description, price_per_day, category_id, owner_id)
+    return add_listing(title, description, price_per_day, category_id, user["id"])
+
+@router.get("/listings/{listing_id}/availability", tags=["Listings"])
+def listing_availability(listing_id: int, from_date: date = Query(..., alias="from"), to_date: date = Query(..., alias="to")):
+    """Check whether a listing is free for [from, to) and list the bookings that overlap it"""
+    return get_listing_availability(listing_id, from_date, to_date)
 
 @router.delete("/listings/{listing_id}", tags=["Listings"])
 def remove_listing(listing_id: int):
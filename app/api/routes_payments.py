@@ -1,24 +1,55 @@
 # app/api/routes_payments.py
-from fastapi import APIRouter, Header
+import asyncio
+import json
+
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import JSONResponse
+from app.core.settings import settings
 from app.services.auth_service import verify_access_token
+from app.services.idempotency_service import run_idempotent_async
+from app.services.payment_provider import verify_webhook_signature
+from app.services.payment_webhooks import event_id_for, webhook_processor
 from app.services.payments_service import create_payment_order, verify_payment_signature
 
 router = APIRouter()
 
 @router.post("/payments/create_order", tags=["Payments"])
-def create_order(amount: float, purpose: str, authorization: str = Header(None)):
+async def create_order(amount: float, purpose: str, authorization: str = Header(None)):
     """Create a Razorpay order for adding money to wallet."""
     if not authorization:
         return {"error": "Missing token"}
     token = authorization.replace("Bearer ", "")
-    user_id = verify_access_token(token)
+    # May call the auth server on a cache miss; keep it off the event loop.
+    user_id = await asyncio.to_thread(verify_access_token, token)
     if not user_id:
         return {"error": "Invalid token"}
 
-    return create_payment_order(user_id, amount, purpose)
+    return await create_payment_order(user_id, amount, purpose)
 
 
 @router.post("/payments/verify", tags=["Payments"])
-def verify_payment(order_id: str, payment_id: str, signature: str):
-    """Verify Razorpay payment signature and credit wallet."""
-    return verify_payment_signature(order_id, payment_id, signature)
+async def verify_payment(order_id: str, payment_id: str, signature: str, idempotency_key: str = Header(None)):
+    """Verify Razorpay payment signature and credit wallet. Honors Idempotency-Key."""
+    return await run_idempotent_async(
+        idempotency_key,
+        "payments.verify",
+        {"order_id": order_id, "payment_id": payment_id, "signature": signature},
+        lambda: verify_payment_signature(order_id, payment_id, signature),
+    )
+
+
+@router.post("/payments/webhook", tags=["Payments"])
+async def razorpay_webhook(request: Request, x_razorpay_signature: str = Header(None), x_razorpay_event_id: str = Header(None)):
+    """Razorpay webhook: verify the HMAC, queue the event and acknowledge immediately."""
+    body = await request.body()
+    if not verify_webhook_signature(body, x_razorpay_signature, settings.RAZORPAY_WEBHOOK_SECRET):
+        return JSONResponse(status_code=400, content={"error": "Invalid webhook signature"})
+    try:
+        event = json.loads(body)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid JSON body"})
+
+    if not webhook_processor.enqueue(event_id_for(body, x_razorpay_event_id), event):
+        # Non-2xx makes Razorpay redeliver later.
+        return JSONResponse(status_code=503, content={"error": "Webhook queue full"})
+    return {"status": "queued"}
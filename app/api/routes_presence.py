@@ -0,0 +1,13 @@
+# app/api/routes_presence.py
+from fastapi import APIRouter, Depends
+from app.api.deps import get_current_user
+from app.services.presence_service import get_presence
+
+router = APIRouter()
+
+@router.get("/presence/{user_id}", tags=["Presence"])
+def user_presence(user_id: str, user: dict = Depends(get_current_user)):
+    """Whether a user has a live socket, and when they were last seen."""
+    if user.get("error"):
+        return user
+    return get_presence(user_id)
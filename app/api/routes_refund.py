@@ -1,18 +1,26 @@
 # app/api/routes_refunds.py
+import asyncio
 from fastapi import APIRouter, Header
 from app.services.auth_service import verify_access_token
+from app.services.idempotency_service import run_idempotent_async
 from app.services.refund_service import process_refund
 
 router = APIRouter()
 
 @router.post("/refunds", tags=["Refunds"])
-def refund_payment(provider_payment_id: str, amount: float, reason: str, authorization: str = Header(None)):
-    """Initiate refund through Razorpay for a completed payment."""
+async def refund_payment(provider_payment_id: str, amount: float, reason: str, authorization: str = Header(None), idempotency_key: str = Header(None)):
+    """Initiate refund through Razorpay for a completed payment. Honors Idempotency-Key."""
     if not authorization:
         return {"error": "Missing token"}
     token = authorization.replace("Bearer ", "")
-    user_id = verify_access_token(token)
+    # May call the auth server on a cache miss; keep it off the event loop.
+    user_id = await asyncio.to_thread(verify_access_token, token)
     if not user_id:
         return {"error": "Invalid token"}
 
-    return process_refund(provider_payment_id, user_id, amount, reason)
+    return await run_idempotent_async(
+        idempotency_key,
+        f"refunds:{user_id}",
+        {"provider_payment_id": provider_payment_id, "amount": amount, "reason": reason},
+        lambda: process_refund(provider_payment_id, user_id, amount, reason),
+    )
@@ -3,19 +3,25 @@ from fastapi import APIRouter, Header
 from datetime import date
 from app.services.transactions_service import create_transaction, get_user_transactions
 from app.services.auth_service import verify_access_token
+from app.services.idempotency_service import run_idempotent
 
 router = APIRouter()
 
 @router.post("/transactions", tags=["Transactions"])
-def create_tx(listing_id: int, start_date: date, end_date: date, authorization: str = Header(None)):
-    """Record a rental transaction"""
+def create_tx(listing_id: int, start_date: date, end_date: date, authorization: str = Header(None), idempotency_key: str = Header(None)):
+    """Record a rental transaction. Honors Idempotency-Key."""
     if not authorization:
         return {"error": "Missing token"}
     token = authorization.replace("Bearer ", "")
     renter_id = verify_access_token(token)
     if not renter_id:
         return {"error": "Invalid token"}
-    return create_transaction(renter_id, listing_id, start_date, end_date)
+    return run_idempotent(
+        idempotency_key,
+        f"transactions:{renter_id}",
+        {"listing_id": listing_id, "start_date": start_date, "end_date": end_date},
+        lambda: create_transaction(renter_id, listing_id, start_date, end_date),
+    )
 
 @router.get("/my_transactions", tags=["Transactions"])
 def user_transactions(authorization: str = Header(None)):
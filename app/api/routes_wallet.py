@@ -1,27 +1,67 @@
 # app/api/routes_wallet.py
-from fastapi import APIRouter, Header
-from app.services.wallet_service import get_wallet_balance, get_wallet_transactions
-from app.services.auth_service import verify_access_token
+import csv
+import io
+import json
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from app.api.deps import get_current_user
+from app.services.wallet_service import (
+    get_wallet_balance,
+    get_wallet_transactions,
+    get_wallet_transactions_page,
+    iter_wallet_transactions,
+)
 
 router = APIRouter()
 
+EXPORT_COLUMNS = ["id", "created_at", "type", "amount", "description", "reference"]
+
 @router.get("/wallet", tags=["Wallet"])
-def view_balance(authorization: str = Header(None)):
-    if not authorization:
-        return {"error": "Missing token"}
-    token = authorization.replace("Bearer ", "")
-    user_id = verify_access_token(token)
-    if not user_id:
-        return {"error": "Invalid token"}
-    return get_wallet_balance(user_id)
+def view_balance(user: dict = Depends(get_current_user)):
+    if user.get("error"):
+        return user
+    return get_wallet_balance(user["id"])
 
 @router.get("/wallet/transactions", tags=["Wallet"])
-def wallet_history(authorization: str = Header(None)):
-    """View wallet transaction history"""
-    if not authorization:
-        return {"error": "Missing token"}
-    token = authorization.replace("Bearer ", "")
-    user_id = verify_access_token(token)
-    if not user_id:
-        return {"error": "Invalid token"}
-    return {"transactions": get_wallet_transactions(user_id)}
+def wallet_history(cursor: str = None, limit: int = 50, legacy: bool = False, user: dict = Depends(get_current_user)):
+    """
+    View wallet transaction history, newest first. Pass `next_cursor` back as
+    `cursor` for older rows; `legacy=true` returns the full unpaginated list.
+    """
+    if user.get("error"):
+        return user
+    if legacy:
+        return {"transactions": get_wallet_transactions(user["id"])}
+    return get_wallet_transactions_page(user["id"], cursor, limit)
+
+@router.get("/wallet/transactions/export", tags=["Wallet"])
+def export_wallet_history(format: str = "csv", user: dict = Depends(get_current_user)):
+    """Stream the full statement as CSV or NDJSON without buffering it in memory"""
+    if user.get("error"):
+        return user
+    if format not in ("csv", "ndjson"):
+        return {"error": "format must be 'csv' or 'ndjson'"}
+
+    rows = iter_wallet_transactions(user["id"])
+    if format == "ndjson":
+        body = (json.dumps(row, default=str) + "\n" for row in rows)
+        return StreamingResponse(body, media_type="application/x-ndjson", headers={
+            "Content-Disposition": 'attachment; filename="wallet-statement.ndjson"',
+        })
+
+    def csv_lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow([row.get(c) for c in EXPORT_COLUMNS])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(csv_lines(), media_type="text/csv", headers={
+        "Content-Disposition": 'attachment; filename="wallet-statement.csv"',
+    })
@@ -1,17 +1,36 @@
 # app/api/routes_ws.py
 
-from fastapi import APIRouter, WebSocket, Query
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.core.websocket_manager import manager
+from app.core.ws_protocol import DEFAULT_ENCODING, ENCODINGS
 
 router = APIRouter()
 
+# Answers to the server's {"type": "ping"}; they only refresh last_seen.
+HEARTBEAT_REPLIES = {'{"type":"pong"}', '{"type": "pong"}', "pong"}
+
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    """WebSocket connection for a specific user."""
-    await manager.connect(user_id, websocket)
+async def websocket_endpoint(websocket: WebSocket, user_id: str, encoding: str = DEFAULT_ENCODING, heartbeat: bool = False):
+    """WebSocket connection for a specific user (one per device).
+
+    `?encoding=binary` opts into binary delivery updates (app/core/ws_protocol.py).
+    `?heartbeat=true` opts into {"type": "ping"} messages; such clients must
+    answer with {"type": "pong"} (or send anything) or get closed when idle.
+    """
+    if encoding not in ENCODINGS:
+        await websocket.close(code=1008)
+        return
+    connection = await manager.connect(user_id, websocket, encoding, heartbeat)
     try:
         while True:
             data = await websocket.receive_text()
+            manager.touch(connection)
+            if data in HEARTBEAT_REPLIES:
+                continue
             print(f"📩 {user_id}: {data}")  # optional
-    except Exception:
-        manager.disconnect(user_id)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"⚠️ WebSocket error for {user_id}: {e}")
+    finally:
+        manager.disconnect(user_id, connection)
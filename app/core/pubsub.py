@@ -0,0 +1,385 @@
+# app/core/pubsub.py
+"""Cross-worker pub/sub for WebSocket fan-out.
+
+Every worker publishes each user-addressed frame on one channel and every
+worker receives all of them (broadcast-and-filter): a worker delivers an
+envelope only to sockets it holds, and ignores envelopes it published
+itself since those were already delivered locally.
+
+Backends (settings.WS_PUBSUB_BACKEND):
+  * "local" - single process, nothing leaves the worker (default);
+  * "unix"  - single host; the first worker to take the lock file runs a
+              tiny relay on a Unix socket (WS_PUBSUB_URL is its path) and
+              every worker, itself included, connects to it;
+  * "redis" - multiple hosts; PUBLISH/SUBSCRIBE over the Redis protocol
+              (WS_PUBSUB_URL like redis://:password@host:6379/0).
+
+Publishing never blocks: payloads go through a bounded outbox drained by
+the backend's connection task, which reconnects with backoff.
+
+Envelope: {"o": origin worker, "u": user ids or null, "t"/"b": the JSON
+variant as text or base64 bytes, "x": {encoding: base64} other variants}.
+"""
+
+import abc
+import asyncio
+import base64
+import fcntl
+import json
+import os
+import random
+import socket
+import struct
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Union
+from urllib.parse import urlparse
+
+Frame = Union[str, bytes]
+Frames = Union[Frame, Mapping[str, Frame]]
+Handler = Callable[[bytes], None]
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+CHANNEL = "campurent:ws"
+_LENGTH = struct.Struct(">I")
+MAX_PAYLOAD = 1 << 20
+
+
+class PubSubBackend:
+    """Local backend: nothing to forward."""
+
+    name = "local"
+
+    def __init__(self) -> None:
+        self._handler: Optional[Handler] = None
+        self.stats = {"published": 0, "received": 0, "dropped": 0, "reconnects": 0, "connected": True}
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+
+    def publish(self, payload: bytes) -> None:
+        return None
+
+    async def stop(self) -> None:
+        return None
+
+
+class _StreamBackend(PubSubBackend, abc.ABC):
+    """Outbox + supervised connection shared by the unix and redis backends."""
+
+    def __init__(self, queue_size: int = 10000) -> None:
+        super().__init__()
+        self.queue_size = queue_size
+        self.stats["connected"] = False
+        self._outbox: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+        self._outbox = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._supervise())
+
+    def publish(self, payload: bytes) -> None:
+        if self._outbox is None or not self.stats["connected"]:
+            self.stats["dropped"] += 1
+            return
+        try:
+            self._outbox.put_nowait(payload)
+            self.stats["published"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+
+    def _deliver(self, payload: bytes) -> None:
+        self.stats["received"] += 1
+        try:
+            self._handler(payload)
+        except Exception as e:
+            print(f"⚠️ Pub/sub handler failed: {e}")
+
+    async def _supervise(self) -> None:
+        delay = 0.5
+        while True:
+            try:
+                await self._session()
+                delay = 0.5
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Pub/sub ({self.name}) connection lost: {e!r}")
+            self.stats["connected"] = False
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(delay + random.uniform(0, delay))
+            delay = min(delay * 2, 10.0)
+
+    @abc.abstractmethod
+    async def _session(self) -> None:
+        """Connect, mark the backend connected and pump frames until the link drops."""
+
+    async def _run_until_first_exit(self, *coros) -> None:
+        tasks = [asyncio.create_task(c) for c in coros]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            # Flip the flag before teardown so publishers fall back right away.
+            self.stats["connected"] = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# ---------------- unix socket relay ----------------
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if length > MAX_PAYLOAD:
+        raise ValueError(f"Pub/sub frame too large: {length}")
+    return await reader.readexactly(length)
+
+
+class UnixSocketBackend(_StreamBackend):
+    name = "unix"
+    # A relay client this far behind is dropped instead of buffering forever.
+    MAX_CLIENT_BUFFER = 8 << 20
+
+    def __init__(self, path: str, queue_size: int = 10000) -> None:
+        super().__init__(queue_size)
+        self.path = path
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: set = set()
+        self._client_tasks: set = set()
+
+    def _try_become_relay(self) -> bool:
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _start_relay(self) -> None:
+        if self._server is not None:
+            return
+        # Holding the lock means any socket file left behind is stale.
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve_client, path=self.path)
+        print(f"📡 WebSocket pub/sub relay listening on {self.path}")
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients.add(writer)
+        task = asyncio.current_task()
+        self._client_tasks.add(task)
+        try:
+            while True:
+                payload = await _read_frame(reader)
+                frame = _LENGTH.pack(len(payload)) + payload
+                for client in list(self._clients):
+                    if client is writer:
+                        continue
+                    if client.transport.get_write_buffer_size() > self.MAX_CLIENT_BUFFER:
+                        print("⚠️ Dropping slow pub/sub relay client")
+                        self._clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(frame)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            self._client_tasks.discard(task)
+            writer.close()
+
+    async def _session(self) -> None:
+        if self._try_become_relay():
+            await self._start_relay()
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        self.stats["connected"] = True
+        try:
+            await self._run_until_first_exit(self._read_loop(reader), self._write_loop(writer))
+        finally:
+            self.stats["connected"] = False
+            writer.close()
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            self._deliver(await _read_frame(reader))
+
+    async def _write_loop(self, writer: asyncio.StreamWriter) -> None:
+        while True:
+            payload = await self._outbox.get()
+            writer.write(_LENGTH.pack(len(payload)) + payload)
+            await writer.drain()
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._client_tasks):
+                task.cancel()
+            await asyncio.gather(*self._client_tasks, return_exceptions=True)
+            self._server = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+# ---------------- redis protocol ----------------
+
+def _resp_command(*args: Union[str, bytes]) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg.encode() if isinstance(arg, str) else arg
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis closed the connection")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise ConnectionError(f"Redis error: {rest.decode()}")
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(rest)
+        return None if count < 0 else [await _read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"Unexpected Redis reply: {line!r}")
+
+
+class RedisBackend(_StreamBackend):
+    name = "redis"
+
+    def __init__(self, url: str, channel: str = CHANNEL, queue_size: int = 10000) -> None:
+        super().__init__(queue_size)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = parsed.username or None
+        self.password = parsed.password or None
+        self.channel = channel
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+            writer.write(_resp_command(*auth))
+            await _read_reply(reader)
+        return reader, writer
+
+    async def _session(self) -> None:
+        sub_reader, sub_writer = await self._open()
+        pub_reader, pub_writer = await self._open()
+        try:
+            sub_writer.write(_resp_command("SUBSCRIBE", self.channel))
+            await _read_reply(sub_reader)  # subscribe confirmation
+            self.stats["connected"] = True
+            await self._run_until_first_exit(
+                self._subscribe_loop(sub_reader),
+                self._publish_loop(pub_writer),
+                self._discard_replies(pub_reader),
+            )
+        finally:
+            self.stats["connected"] = False
+            sub_writer.close()
+            pub_writer.close()
+
+    async def _subscribe_loop(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            reply = await _read_reply(reader)
+            if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                self._deliver(reply[2])
+
+    async def _publish_loop(self, writer: asyncio.StreamWriter) -> None:
+        while True:
+            payload = await self._outbox.get()
+            writer.write(_resp_command("PUBLISH", self.channel, payload))
+            await writer.drain()
+
+    async def _discard_replies(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            await _read_reply(reader)
+
+
+# ---------------- envelopes ----------------
+
+class PubSub:
+    """Wraps a backend with the envelope format and origin filtering."""
+
+    def __init__(self, backend: PubSubBackend) -> None:
+        self.backend = backend
+        self._deliver: Optional[Callable[[Optional[List[str]], Frames], None]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend.name != "local"
+
+    @property
+    def connected(self) -> bool:
+        return self.enabled and bool(self.backend.stats["connected"])
+
+    async def start(self, deliver: Callable[[Optional[List[str]], Frames], None]) -> None:
+        self._deliver = deliver
+        await self.backend.start(self._on_payload)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def publish(self, user_ids: Optional[Iterable[str]], frame: Frames) -> None:
+        """user_ids=None addresses every connected user."""
+        if not self.enabled:
+            return
+        envelope: Dict[str, Any] = {"o": WORKER_ID, "u": None if user_ids is None else list(user_ids)}
+        if not isinstance(frame, (str, bytes)):
+            variants = dict(frame)
+            frame = variants.pop("json")
+            envelope["x"] = {name: base64.b64encode(data).decode() for name, data in variants.items()}
+        if isinstance(frame, bytes):
+            envelope["b"] = base64.b64encode(frame).decode()
+        else:
+            envelope["t"] = frame
+        self.backend.publish(json.dumps(envelope, separators=(",", ":")).encode())
+
+    def _on_payload(self, payload: bytes) -> None:
+        envelope = json.loads(payload)
+        if envelope.get("o") == WORKER_ID or self._deliver is None:
+            return
+        frame: Frames = base64.b64decode(envelope["b"]) if "b" in envelope else envelope["t"]
+        if envelope.get("x"):
+            frame = {"json": frame, **{name: base64.b64decode(data) for name, data in envelope["x"].items()}}
+        self._deliver(envelope.get("u"), frame)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"backend": self.backend.name, "worker_id": WORKER_ID, **self.backend.stats}
+
+
+def create_pubsub(backend: str, url: Optional[str] = None) -> PubSub:
+    backend = (backend or "local").lower()
+    if backend == "unix":
+        return PubSub(UnixSocketBackend(url or "/tmp/campurent-ws.sock"))
+    if backend == "redis":
+        return PubSub(RedisBackend(url or "redis://localhost:6379/0"))
+    if backend != "local":
+        print(f"⚠️ Unknown WS_PUBSUB_BACKEND {backend!r}, using local")
+    return PubSub(PubSubBackend())
@@ -0,0 +1,137 @@
+# app/core/scheduler.py
+"""In-process scheduler for periodic background jobs.
+
+Each registered job runs in its own asyncio loop: sleep for its interval
+(plus/minus jitter, so jobs and instances do not fire in lockstep), run,
+record metrics, repeat. Sync jobs run in a worker thread. A job never
+overlaps itself: a manual run_now() while it is executing is skipped.
+
+A job that returns a dict with an "error" key counts as failed, matching
+how services report errors.
+"""
+
+import asyncio
+import inspect
+import random
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Job:
+    def __init__(self, name: str, func: Callable[[], Any], interval: float, jitter: float, initial_delay: Optional[float]) -> None:
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.initial_delay = initial_delay
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.last_duration: Optional[float] = None
+        self.last_started_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_result: Any = None
+
+    def next_delay(self) -> float:
+        spread = self.interval * self.jitter
+        return max(0.0, self.interval + random.uniform(-spread, spread))
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "interval_s": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started_at": self.last_started_at,
+            "last_duration_s": None if self.last_duration is None else round(self.last_duration, 4),
+            "avg_duration_s": round(self.total_duration / self.runs, 4) if self.runs else None,
+            "max_duration_s": round(self.max_duration, 4),
+            "last_error": self.last_error,
+            "last_result": self.last_result,
+        }
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, func: Callable[[], Any], interval: float, jitter: float = 0.1, initial_delay: Optional[float] = None) -> None:
+        """Register `func` to run every `interval` seconds (+/- jitter fraction).
+
+        Without an initial_delay the first run lands at a random point in
+        the first interval.
+        """
+        if name in self._jobs:
+            raise ValueError(f"Job {name!r} already registered")
+        job = Job(name, func, interval, jitter, initial_delay)
+        self._jobs[name] = job
+        if self._tasks:
+            self._tasks.append(asyncio.create_task(self._loop(job)))
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._loop(job)) for job in self._jobs.values()]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, job: Job) -> None:
+        delay = job.initial_delay if job.initial_delay is not None else random.uniform(0, job.interval)
+        while True:
+            await asyncio.sleep(delay)
+            await self._execute(job)
+            delay = job.next_delay()
+
+    async def _execute(self, job: Job) -> bool:
+        if job.running:
+            job.skipped += 1
+            return False
+        job.running = True
+        job.last_started_at = datetime.utcnow().isoformat()
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(job.func):
+                result = await job.func()
+            else:
+                result = await asyncio.to_thread(job.func)
+            if isinstance(result, dict) and result.get("error"):
+                raise RuntimeError(result["error"])
+            job.last_result = result if isinstance(result, (dict, int, float, str, type(None))) else repr(result)
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            print(f"⚠️ Scheduled job {job.name} failed: {e}")
+        finally:
+            duration = time.perf_counter() - started
+            job.running = False
+            job.runs += 1
+            job.last_duration = duration
+            job.total_duration += duration
+            job.max_duration = max(job.max_duration, duration)
+        return True
+
+    async def run_now(self, name: str) -> Dict[str, Any]:
+        job = self._jobs.get(name)
+        if job is None:
+            return {"error": f"Unknown job {name}"}
+        if not await self._execute(job):
+            return {"error": f"Job {name} is already running"}
+        return job.metrics()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"jobs": {name: job.metrics() for name, job in self._jobs.items()}}
+
+
+# Process-wide scheduler; jobs are registered and started from main.startup_event
+scheduler = Scheduler()
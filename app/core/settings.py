@@ -13,6 +13,29 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")
+# Project JWT secret (Supabase dashboard > API > JWT Settings). When set, access
+# tokens are verified locally instead of calling the auth server per request.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+AUTH_CLAIMS_CACHE_TTL = float(os.getenv("AUTH_CLAIMS_CACHE_TTL", "300"))
+AUTH_CLAIMS_CACHE_SIZE = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "10000"))
+# "razorpay" (default) or "fake" for the in-memory provider used in local runs/tests
+PAYMENT_PROVIDER = os.getenv("PAYMENT_PROVIDER", "razorpay")
+PAYMENT_HTTP_TIMEOUT = float(os.getenv("PAYMENT_HTTP_TIMEOUT", "10"))
+PAYMENT_MAX_RETRIES = int(os.getenv("PAYMENT_MAX_RETRIES", "3"))
+# Seconds between batched writes of buffered delivery locations
+LOCATION_FLUSH_INTERVAL = float(os.getenv("LOCATION_FLUSH_INTERVAL", "2"))
+# Set to "false" on instances that should skip the shared maintenance jobs
+# (stale-delivery closer, OTP sweeper)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() != "false"
+
+# WebSocket fan-out across workers: "local" (single process), "unix" (one
+# host, WS_PUBSUB_URL = socket path) or "redis" (WS_PUBSUB_URL = redis://...)
+WS_PUBSUB_BACKEND = os.getenv("WS_PUBSUB_BACKEND", "local")
+WS_PUBSUB_URL = os.getenv("WS_PUBSUB_URL")
+# Seconds between server pings on every socket, and of client silence after
+# which a socket is closed as dead
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "25"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "75"))
 
 class Settings:
 	def __init__(self):
@@ -22,5 +45,17 @@ class Settings:
 		self.RAZORPAY_KEY_ID = RAZORPAY_KEY_ID
 		self.RAZORPAY_KEY_SECRET = RAZORPAY_KEY_SECRET
 		self.RAZORPAY_WEBHOOK_SECRET = RAZORPAY_WEBHOOK_SECRET
+		self.SUPABASE_JWT_SECRET = SUPABASE_JWT_SECRET
+		self.AUTH_CLAIMS_CACHE_TTL = AUTH_CLAIMS_CACHE_TTL
+		self.AUTH_CLAIMS_CACHE_SIZE = AUTH_CLAIMS_CACHE_SIZE
+		self.PAYMENT_PROVIDER = PAYMENT_PROVIDER
+		self.PAYMENT_HTTP_TIMEOUT = PAYMENT_HTTP_TIMEOUT
+		self.PAYMENT_MAX_RETRIES = PAYMENT_MAX_RETRIES
+		self.LOCATION_FLUSH_INTERVAL = LOCATION_FLUSH_INTERVAL
+		self.SCHEDULER_ENABLED = SCHEDULER_ENABLED
+		self.WS_PUBSUB_BACKEND = WS_PUBSUB_BACKEND
+		self.WS_PUBSUB_URL = WS_PUBSUB_URL
+		self.WS_HEARTBEAT_INTERVAL = WS_HEARTBEAT_INTERVAL
+		self.WS_IDLE_TIMEOUT = WS_IDLE_TIMEOUT
 
 settings = Settings()
\ No newline at end of file
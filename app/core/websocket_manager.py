@@ -1,33 +1,299 @@
 # app/core/websocket_manager.py
-"""Minimal WebSocket manager stub.
+"""WebSocket connection manager.
 
-Provides a send_to_user coroutine used by the realtime listener. You can
-extend this to maintain actual WebSocket connections and broadcast messages.
+A user may have several sockets open (phone + laptop); each gets its own
+bounded send queue drained by a dedicated writer task. Sending to a user
+encodes the message once and only enqueues frames, so a slow client
+never blocks the caller or any other socket:
+
+  * when a socket's queue is full the oldest queued frame is dropped
+    (live updates supersede each other) and counted;
+  * a send that takes longer than send_timeout closes that socket.
+
+With a pub/sub backbone attached (see app/core/pubsub.py) every frame is
+also published so workers holding the user's other sockets deliver it.
+
+Liveness: uvicorn pings every socket at the protocol level (clients answer
+automatically) and closes those that stop answering, which ends the
+receive loop and removes the socket here. Clients that connect with
+`?heartbeat=true` additionally opt into application-level heartbeats:
+heartbeat() (run by the scheduler) sends them {"type": "ping"} and closes
+them once they have sent nothing, pong included, for idle_timeout seconds.
+Listen-only clients are never reaped by the application. last_seen
+(presence) only moves on real inbound traffic: the connect, messages and
+pongs.
+
+Each socket has an encoding ("json" or "binary", see app/core/ws_protocol.py).
+A message may be sent as a dict of pre-encoded variants keyed by encoding;
+every socket gets its own variant, falling back to "json".
 """
 
 import asyncio
-from typing import Any, Dict, Set
+import itertools
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+from fastapi import WebSocket
+
+from app.core.cache import TTLCache
+from app.core.pubsub import PubSub, create_pubsub
+from app.core.ws_protocol import DEFAULT_ENCODING
+
+Frame = Union[str, bytes]
+# A single frame for everyone, or one pre-encoded frame per encoding.
+Frames = Union[Frame, Mapping[str, Frame]]
+
+
+def frame_for(frames: Frames, encoding: str) -> Frame:
+    if isinstance(frames, (str, bytes)):
+        return frames
+    return frames.get(encoding) or frames[DEFAULT_ENCODING]
+
+
+class Connection:
+    __slots__ = ("id", "user_id", "websocket", "encoding", "heartbeat", "queue", "writer", "connected_at", "last_seen", "sent", "dropped")
+
+    def __init__(self, connection_id: int, user_id: str, websocket: WebSocket, queue_size: int, encoding: str = DEFAULT_ENCODING, heartbeat: bool = False) -> None:
+        self.id = connection_id
+        self.user_id = user_id
+        self.websocket = websocket
+        self.encoding = encoding
+        self.heartbeat = heartbeat
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.connected_at = datetime.utcnow().isoformat()
+        self.last_seen = time.time()
+        self.sent = 0
+        self.dropped = 0
+
+
+class ConnectionManager:
+    """Handles active WebSocket connections."""
+
+    def __init__(self, queue_size: int = 100, send_timeout: float = 10.0, close_timeout: float = 5.0) -> None:
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.close_timeout = close_timeout
+        self.active_connections: Dict[str, Dict[int, Connection]] = {}  # user_id -> {connection id: connection}
+        # Last activity of users whose sockets are gone, for presence lookups.
+        self.recently_seen = TTLCache(maxsize=100000, ttl=7 * 24 * 3600.0)
+        # Users whose last_seen changed since the presence registry last synced.
+        self._seen_changed: Dict[str, float] = {}
+        self._closing: set = set()
+        self._ids = itertools.count(1)
+        self.pubsub: PubSub = create_pubsub("local")
+        self.stats = {
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "messages_sent": 0,
+            "messages_dropped": 0,
+            "slow_sockets_closed": 0,
+            "undeliverable": 0,
+            "pings_sent": 0,
+            "idle_sockets_reaped": 0,
+        }
+
+    async def connect(self, user_id: str, websocket: WebSocket, encoding: str = DEFAULT_ENCODING, heartbeat: bool = False) -> Connection:
+        """Accept and register a socket; other sockets of the user stay open."""
+        await websocket.accept()
+        connection = Connection(next(self._ids), user_id, websocket, self.queue_size, encoding, heartbeat)
+        self.active_connections.setdefault(user_id, {})[connection.id] = connection
+        connection.writer = asyncio.create_task(self._writer(connection))
+        self.touch(connection)
+        self.stats["connections_opened"] += 1
+        print(f"🔗 User {user_id} connected ({len(self.active_connections[user_id])} sockets)")
+        return connection
+
+    def _remove(self, connection: Connection) -> bool:
+        sockets = self.active_connections.get(connection.user_id)
+        if not sockets or sockets.pop(connection.id, None) is None:
+            return False
+        if not sockets:
+            del self.active_connections[connection.user_id]
+        self.stats["connections_closed"] += 1
+        self.recently_seen.set(connection.user_id, max(connection.last_seen, self.recently_seen.get(connection.user_id, 0.0)))
+        self._seen_changed[connection.user_id] = self.last_seen(connection.user_id)
+        return True
+
+    def disconnect(self, user_id: str, connection: Optional[Connection] = None) -> None:
+        """Remove one socket, or every socket of the user when none is given."""
+        targets = [connection] if connection else list(self.active_connections.get(user_id, {}).values())
+        for conn in targets:
+            if self._remove(conn):
+                if conn.writer is not None and conn.writer is not asyncio.current_task():
+                    conn.writer.cancel()
+                print(f"❌ User {user_id} disconnected")
+
+    def touch(self, connection: Connection) -> None:
+        """Record inbound activity on a socket."""
+        connection.last_seen = time.time()
+        self._seen_changed[connection.user_id] = connection.last_seen
 
+    def last_seen(self, user_id: str) -> Optional[float]:
+        """Epoch seconds of the user's latest activity known to this worker."""
+        sockets = self.active_connections.get(user_id)
+        if sockets:
+            return max(c.last_seen for c in sockets.values())
+        return self.recently_seen.get(user_id)
 
-class WebSocketManager:
-    def __init__(self) -> None:
-        # Map user_id -> set of websocket connections (optional, not wired yet)
-        self._connections: Dict[str, Set[Any]] = {}
+    def pop_seen_changes(self) -> Dict[str, float]:
+        changes, self._seen_changed = self._seen_changed, {}
+        return changes
 
-    async def send_to_user(self, user_id: str, message: Dict[str, Any]) -> None:
-        """Send a message to a specific user.
+    def restore_seen_changes(self, changes: Dict[str, float]) -> None:
+        """Put back changes that failed to sync, unless newer ones arrived meanwhile."""
+        for user_id, ts in changes.items():
+            self._seen_changed.setdefault(user_id, ts)
 
-        This stub prints to the console. Replace with actual broadcast logic
-        if you're tracking active WebSocket connections.
+    async def _close(self, connection: Connection, code: int) -> None:
+        try:
+            await asyncio.wait_for(connection.websocket.close(code=code), self.close_timeout)
+        except Exception:
+            pass
+
+    def heartbeat(self, idle_timeout: float) -> Dict[str, int]:
+        """Ping heartbeat sockets and close those idle for longer than idle_timeout.
+
+        Other sockets are left to protocol-level pings; their last_seen is
+        not refreshed here, since a half-open socket still looks registered.
+        """
+        now = time.time()
+        ping = self.encode({"type": "ping", "ts": int(now)})
+        pinged = reaped = 0
+        for sockets in list(self.active_connections.values()):
+            for connection in list(sockets.values()):
+                if not connection.heartbeat:
+                    continue
+                if now - connection.last_seen > idle_timeout:
+                    self.disconnect(connection.user_id, connection)
+                    # A half-open socket may never acknowledge the close; don't wait on it.
+                    task = asyncio.create_task(self._close(connection, 1001))
+                    self._closing.add(task)
+                    task.add_done_callback(self._closing.discard)
+                    reaped += 1
+                else:
+                    self._enqueue(connection, ping)
+                    pinged += 1
+        self.stats["pings_sent"] += pinged
+        self.stats["idle_sockets_reaped"] += reaped
+        return {"pinged": pinged, "reaped": reaped}
+
+    async def _writer(self, connection: Connection) -> None:
+        try:
+            while True:
+                frame = await connection.queue.get()
+                if isinstance(frame, bytes):
+                    await asyncio.wait_for(connection.websocket.send_bytes(frame), self.send_timeout)
+                else:
+                    await asyncio.wait_for(connection.websocket.send_text(frame), self.send_timeout)
+                connection.sent += 1
+                self.stats["messages_sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["slow_sockets_closed"] += 1
+            print(f"⚠️ Closing socket of user {connection.user_id}: {e!r}")
+            self.disconnect(connection.user_id, connection)
+            try:
+                await connection.websocket.close(code=1011)
+            except Exception:
+                pass
+
+    def _enqueue(self, connection: Connection, frame: Frame) -> None:
+        try:
+            connection.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Newer frames supersede older ones; drop the oldest.
+            connection.queue.get_nowait()
+            connection.queue.put_nowait(frame)
+            connection.dropped += 1
+            self.stats["messages_dropped"] += 1
+
+    @staticmethod
+    def encode(message: Any) -> Frame:
+        if isinstance(message, (str, bytes)):
+            return message
+        return json.dumps(message, default=str, separators=(",", ":"))
+
+    def deliver_local(self, user_id: str, frame: Frames) -> int:
+        """Queue an encoded frame on every socket of the user held by this worker."""
+        sockets = self.active_connections.get(user_id)
+        if not sockets:
+            return 0
+        for connection in list(sockets.values()):
+            self._enqueue(connection, frame_for(frame, connection.encoding))
+        return len(sockets)
+
+    def _broadcast_local(self, frame: Frames) -> int:
+        reached = 0
+        for sockets in list(self.active_connections.values()):
+            for connection in list(sockets.values()):
+                self._enqueue(connection, frame_for(frame, connection.encoding))
+                reached += 1
+        return reached
+
+    def deliver_remote(self, user_ids: Optional[List[str]], frame: Frames) -> None:
+        """Frames published by other workers."""
+        if user_ids is None:
+            self._broadcast_local(frame)
+            return
+        for user_id in user_ids:
+            self.deliver_local(user_id, frame)
+
+    def send_frame(self, user_ids: List[str], frame: Frames, local_only: bool = False) -> int:
+        """Deliver locally and publish to other workers; returns local sockets reached.
+
+        local_only is for events every worker receives on its own (realtime rows).
         """
-        # Example implementation if you track connections:
-        # for ws in list(self._connections.get(user_id, [])):
-        #     try:
-        #         await ws.send_json(message)
-        #     except Exception:
-        #         pass
-        print(f"[WS] -> user {user_id}: {message}")
+        reached = 0
+        for user_id in user_ids:
+            local = self.deliver_local(user_id, frame)
+            if not local and (local_only or not self.pubsub.enabled):
+                self.stats["undeliverable"] += 1
+            reached += local
+        if not local_only:
+            self.pubsub.publish(user_ids, frame)
+        return reached
+
+    async def send_to_user(self, user_id: str, message: Any, local_only: bool = False) -> int:
+        """Send a JSON message to every socket of a user."""
+        return self.send_frame([user_id], self.encode(message), local_only)
+
+    async def send_to_users(self, user_ids: List[str], message: Any, local_only: bool = False) -> int:
+        return self.send_frame(list(dict.fromkeys(user_ids)), self.encode(message), local_only)
+
+    async def broadcast(self, message: Any) -> int:
+        """Send to all connected users, on every worker."""
+        frame = self.encode(message)
+        self.pubsub.publish(None, frame)
+        return self._broadcast_local(frame)
+
+    async def start_pubsub(self, backend: str, url: Optional[str] = None) -> None:
+        self.pubsub = create_pubsub(backend, url)
+        await self.pubsub.start(self.deliver_remote)
+
+    async def stop_pubsub(self) -> None:
+        await self.pubsub.stop()
+
+    def is_connected(self, user_id: str) -> bool:
+        return bool(self.active_connections.get(user_id))
+
+    def metrics(self) -> Dict[str, Any]:
+        connections = [c for sockets in self.active_connections.values() for c in sockets.values()]
+        return {
+            "users": len(self.active_connections),
+            "connections": len(connections),
+            "queued_frames": sum(c.queue.qsize() for c in connections),
+            "max_queue_depth": max((c.queue.qsize() for c in connections), default=0),
+            "binary_connections": sum(1 for c in connections if c.encoding == "binary"),
+            "heartbeat_connections": sum(1 for c in connections if c.heartbeat),
+            **self.stats,
+            "pubsub": self.pubsub.metrics(),
+        }
 
 
-# Singleton manager instance
-manager = WebSocketManager()
+# Global instance
+manager = ConnectionManager()
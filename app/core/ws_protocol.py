@@ -0,0 +1,57 @@
+# app/core/ws_protocol.py
+"""Compact binary frames for WebSocket clients that opt in.
+
+Clients connect with `/ws/{user_id}?encoding=binary` to receive live
+delivery positions as 32-byte binary frames instead of JSON text; every
+other message stays JSON text. Layout (little-endian, struct "<BBHIQdd"):
+
+    offset  size  field
+    0       1     message type (1 = delivery_update)
+    1       1     status code (see STATUS_CODES, 0 = unknown)
+    2       2     reserved, always 0
+    4       4     task_id (uint32)
+    8       8     seq (uint64, epoch milliseconds, 0 when unknown)
+    16      8     lat (float64)
+    24      8     lng (float64)
+"""
+
+import struct
+from typing import Any, Dict, Optional
+
+ENCODINGS = ("json", "binary")
+DEFAULT_ENCODING = "json"
+
+MSG_DELIVERY_UPDATE = 1
+DELIVERY_UPDATE = struct.Struct("<BBHIQdd")
+
+STATUS_CODES = {"pending": 1, "picked": 2, "completed": 3, "cancelled": 4, "canceled": 4}
+STATUS_NAMES = {1: "pending", 2: "picked", 3: "completed", 4: "cancelled"}
+_UINT32_MAX = 0xFFFFFFFF
+_UINT64_MAX = 0xFFFFFFFFFFFFFFFF
+
+
+def encode_delivery_update(task_id: Any, seq: Optional[int], lat: float, lng: float, status: Optional[str]) -> Optional[bytes]:
+    """Binary delivery_update frame, or None when the values don't fit the layout."""
+    try:
+        task_id = int(task_id)
+        seq = int(seq or 0)
+        if not (0 <= task_id <= _UINT32_MAX and 0 <= seq <= _UINT64_MAX):
+            return None
+        return DELIVERY_UPDATE.pack(MSG_DELIVERY_UPDATE, STATUS_CODES.get(status or "", 0), 0, task_id, seq, float(lat), float(lng))
+    except (TypeError, ValueError, struct.error):
+        return None
+
+
+def decode_delivery_update(frame: bytes) -> Dict[str, Any]:
+    """Inverse of encode_delivery_update, in the JSON message's shape."""
+    kind, status, _, task_id, seq, lat, lng = DELIVERY_UPDATE.unpack(frame)
+    if kind != MSG_DELIVERY_UPDATE:
+        raise ValueError(f"Unknown binary message type {kind}")
+    return {
+        "type": "delivery_update",
+        "task_id": task_id,
+        "lat": lat,
+        "lng": lng,
+        "status": STATUS_NAMES.get(status),
+        "seq": seq or None,
+    }
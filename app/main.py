@@ -18,6 +18,7 @@ from app.api import routes_payments
 from app.api import routes_refund
 from app.api import routes_kyc
 from app.api import routes_ws
+from app.api import routes_presence
 
 app = FastAPI(title="CampuRent")
 
@@ -44,14 +45,62 @@ app.include_router(routes_payments.router)
 app.include_router(routes_refund.router)
 app.include_router(routes_kyc.router)
 app.include_router(routes_ws.router)
+app.include_router(routes_presence.router)
 
 
 # Start realtime event listener on startup
 import asyncio
 from app.services.realtime_listener import watch_realtime_events
+from app.services.search_service import build_search_index_with_retry
+from app.services.availability_service import warm_up_availability
+from app.services.geo_index import build_delivery_index
+from app.services.location_ingest import location_ingestor
+from app.services.payment_provider import close_payment_provider
+from app.services.payment_webhooks import webhook_processor
+from app.core.scheduler import scheduler
+from app.core.settings import settings
+from app.core.websocket_manager import manager as ws_manager
+from app.services.admin_service import auto_close_stale_deliveries
+from app.services.delivery_service import sweep_expired_otps
+from app.services.idempotency_service import purge_expired_keys
+from app.services.track_service import persist_tracks
+from app.services.presence_service import heartbeat_sockets, sync_presence
+from app.services.admin_events import admin_events
+from app.services.realtime_dispatch import dispatcher as realtime_dispatcher
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize realtime listener"""
+    """Initialize realtime listener and in-memory indexes"""
+    asyncio.create_task(build_search_index_with_retry())
+    asyncio.create_task(asyncio.to_thread(warm_up_availability))
+    asyncio.create_task(asyncio.to_thread(build_delivery_index))
+    await ws_manager.start_pubsub(settings.WS_PUBSUB_BACKEND, settings.WS_PUBSUB_URL)
+    webhook_processor.start()
+    admin_events.start()
+    realtime_dispatcher.start()
+    location_ingestor.start()
+    # Track buffers and sockets live in this process, so every instance runs these.
+    scheduler.add_job("persist_delivery_tracks", persist_tracks, interval=60)
+    scheduler.add_job("ws_heartbeat", heartbeat_sockets, interval=settings.WS_HEARTBEAT_INTERVAL)
+    scheduler.add_job("sync_presence", sync_presence, interval=30)
+    if settings.SCHEDULER_ENABLED:
+        scheduler.add_job("auto_close_stale_deliveries", auto_close_stale_deliveries, interval=3600)
+        scheduler.add_job("sweep_expired_otps", sweep_expired_otps, interval=300)
+        scheduler.add_job("purge_idempotency_keys", purge_expired_keys, interval=3600)
+    scheduler.start()
     asyncio.create_task(watch_realtime_events())
     print("🚀 Server + Realtime listener started")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs, drain queued events and webhooks, flush buffers and release pooled connections"""
+    await scheduler.stop()
+    await realtime_dispatcher.stop()
+    await admin_events.stop()
+    await webhook_processor.stop()
+    await location_ingestor.stop()
+    await asyncio.to_thread(persist_tracks)
+    await asyncio.to_thread(sync_presence)
+    await close_payment_provider()
+    await ws_manager.stop_pubsub()
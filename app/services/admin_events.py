@@ -0,0 +1,112 @@
+# app/services/admin_events.py
+"""Micro-batched admin notifications and audit rows.
+
+Realtime handlers call notify()/log(), which only append to in-memory
+buffers. A background task writes each buffer with one multi-row insert
+every flush_interval seconds, or sooner once batch_size rows are waiting.
+"""
+
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.services.supabase_service import supabase
+
+MAX_ROWS_PER_INSERT = 500
+# Rows kept across failed flushes before the oldest are discarded.
+MAX_BUFFERED_ROWS = 10000
+
+
+class AdminEventBatcher:
+    def __init__(self, batch_size: int = 200, flush_interval: float = 0.5) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._notifications: List[Dict[str, Any]] = []
+        self._actions: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"notifications": 0, "actions": 0, "inserts": 0, "failed_flushes": 0, "discarded": 0}
+
+    def _add(self, buffer: List[Dict[str, Any]], row: Dict[str, Any]) -> None:
+        with self._lock:
+            buffer.append(row)
+            full = len(self._notifications) + len(self._actions) >= self.batch_size
+        if full and self._wake is not None:
+            self._wake.set()
+
+    def notify(self, admin_id: str, title: str, message: str) -> None:
+        self.stats["notifications"] += 1
+        self._add(self._notifications, {
+            "user_id": admin_id,
+            "title": title,
+            "message": message,
+            "type": "system",
+            "is_read": False,
+            "created_at": datetime.utcnow().isoformat(),
+        })
+
+    def log(self, admin_id: str, action_type: str, target_table: str, target_id: Any, details: Optional[str] = None) -> None:
+        self.stats["actions"] += 1
+        self._add(self._actions, {
+            "admin_id": admin_id,
+            "action_type": action_type,
+            "target_table": target_table,
+            "target_id": target_id,
+            "details": details,
+            "created_at": datetime.utcnow().isoformat(),
+        })
+
+    def _write(self, table: str, rows: List[Dict[str, Any]], buffer: List[Dict[str, Any]]) -> None:
+        written = 0
+        try:
+            for start in range(0, len(rows), MAX_ROWS_PER_INSERT):
+                supabase.table(table).insert(rows[start:start + MAX_ROWS_PER_INSERT]).execute()
+                written = start + MAX_ROWS_PER_INSERT
+                self.stats["inserts"] += 1
+        except Exception as e:
+            rows = rows[written:]
+            self.stats["failed_flushes"] += 1
+            print(f"⚠️ Failed to write {len(rows)} {table} rows: {e}")
+            with self._lock:
+                buffer[:0] = rows
+                overflow = len(buffer) - MAX_BUFFERED_ROWS
+                if overflow > 0:
+                    del buffer[:overflow]
+                    self.stats["discarded"] += overflow
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                notifications, actions = self._notifications[:], self._actions[:]
+                self._notifications.clear()
+                self._actions.clear()
+            self._write("notifications", notifications, self._notifications)
+            self._write("admin_actions", actions, self._actions)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.to_thread(self.flush)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+# Process-wide batcher started from main.startup_event
+admin_events = AdminEventBatcher()
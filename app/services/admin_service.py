@@ -1,8 +1,16 @@
 # app/services/admin_service.py
+from app.services.admin_events import admin_events
+from app.services.geo_index import INACTIVE_STATUSES, delivery_index
+from app.services.location_ingest import location_ingestor
+from app.services.search_service import listing_index
 from app.services.supabase_service import supabase
-from datetime import datetime
+from app.services.user_service import invalidate_user_profile
+from app.services.delivery_service import OTP_TTL_MINUTES
+from datetime import datetime, timedelta
 import random
 
+STALE_DELIVERY_HOURS = 48
+
 def get_all_users():
     try:
         r = supabase.table("users").select("*").execute()
@@ -27,6 +35,7 @@ def get_all_listings():
 def delete_listing(listing_id: int):
     try:
         r = supabase.table("listings").delete().eq("id", listing_id).execute()
+        listing_index.remove(listing_id)
         return {"deleted": r.data}
     except Exception as e:
         return {"error": str(e)}
@@ -73,6 +82,7 @@ def review_kyc(user_id: str, reviewer_id: str, approve: bool, reason: str | None
         }).eq("user_id", user_id).execute()
 
         supabase.table("users").update({"kyc_verified": approve}).eq("id", user_id).execute()
+        invalidate_user_profile(user_id)
 
         return {"user_id": user_id, "approved": approve}
     except Exception as e:
@@ -136,7 +146,12 @@ def regenerate_otp(task_id: int, admin_id: str):
     """Allows admin to regenerate OTP in case user didn’t receive one."""
     try:
         new_otp = str(random.randint(100000, 999999))
-        res = supabase.table("delivery_tasks").update({"pickup_otp": new_otp, "last_status_update": datetime.utcnow().isoformat()}).eq("id", task_id).execute()
+        res = supabase.table("delivery_tasks").update({
+            "pickup_otp": new_otp,
+            # Fresh expiry, otherwise the OTP sweeper burns it right away
+            "otp_expires_at": (datetime.utcnow() + timedelta(minutes=OTP_TTL_MINUTES)).isoformat(),
+            "last_status_update": datetime.utcnow().isoformat(),
+        }).eq("id", task_id).execute()
 
         log_and_notify_admin(
             admin_id,
@@ -189,50 +204,50 @@ def log_and_notify_admin(admin_id: str, action_type: str, target_table: str, tar
     )
 
 
-def auto_close_stale_deliveries():
-    """Marks delivery tasks older than 48h as 'completed' if not already closed."""
+def auto_close_stale_deliveries(max_age_hours: int = STALE_DELIVERY_HOURS):
+    """
+    Marks delivery tasks older than max_age_hours as 'completed' if not already
+    closed: one filtered update, then one batched audit insert.
+    """
     try:
-        from datetime import timedelta
-        cutoff = datetime.utcnow() - timedelta(hours=48)
-        res = supabase.table("delivery_tasks").select("*").lt("created_at", cutoff.isoformat()).neq("status", "completed").execute()
+        now = datetime.utcnow()
+        cutoff = now - timedelta(hours=max_age_hours)
+        res = supabase.table("delivery_tasks").update({
+            "status": "completed",
+            "last_status_update": now.isoformat(),
+        }).lt("created_at", cutoff.isoformat()).not_.in_("status", list(INACTIVE_STATUSES)).execute()
 
-        if not res.data:
+        closed = res.data or []
+        if not closed:
             return {"message": "No stale deliveries"}
 
-        for task in res.data:
-            supabase.table("delivery_tasks").update({"status": "completed"}).eq("id", task["id"]).execute()
-            log_admin_action_sync("system", "auto_close", "delivery_tasks", task["id"], "Auto-closed stale delivery")
-
-        return {"closed_tasks": len(res.data)}
+        for task in closed:
+            delivery_index.remove(task["id"])
+            location_ingestor.apply_task(task)
+        try:
+            supabase.table("admin_actions").insert([
+                {
+                    "admin_id": "system",
+                    "action_type": "auto_close",
+                    "target_table": "delivery_tasks",
+                    "target_id": task["id"],
+                    "details": "Auto-closed stale delivery",
+                    "created_at": now.isoformat(),
+                }
+                for task in closed
+            ]).execute()
+        except Exception as e:
+            print(f"Failed to log admin action: {e}")
+
+        return {"closed_tasks": len(closed)}
     except Exception as e:
         return {"error": str(e)}
 
 async def send_admin_notification(admin_id: str, title: str, message: str):
-    """Async version for contexts using Supabase async client."""
-    try:
-        await supabase.table("notifications").insert({
-            "user_id": admin_id,
-            "title": title,
-            "message": message,
-            "type": "system",
-            "is_read": False,
-            "created_at": datetime.utcnow().isoformat(),
-        }).execute()
-    except Exception as e:
-        print(f"⚠️ Failed to send admin notification: {e}")
+    """Async version: queued and written in batches by admin_events."""
+    admin_events.notify(admin_id, title, message)
 
 
 async def log_admin_action(admin_id: str, action_type: str, target_table: str, target_id: int, details: str | None = None):
-    """Async version for contexts using Supabase async client."""
-    try:
-        await supabase.table("admin_actions").insert({
-            "admin_id": admin_id,
-            "action_type": action_type,
-            "target_table": target_table,
-            "target_id": target_id,
-            "details": details,
-            "created_at": datetime.utcnow().isoformat(),
-        }).execute()
-    except Exception as e:
-        print(f"⚠️ Failed to log admin action: {e}")
-
+    """Async version: queued and written in batches by admin_events."""
+    admin_events.log(admin_id, action_type, target_table, target_id, details)
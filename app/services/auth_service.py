@@ -1,6 +1,14 @@
 # app/services/auth_service.py
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Dict, Optional
+
 from supabase import create_client, Client
 from app.core import settings
+from app.core.cache import TTLCache
 
 # Use the service role or anon key depending on required operations. Here we use anon
 # because auth client uses anon key for user signups/signins.
@@ -31,12 +39,79 @@ def get_user_details(access_token: str):
         return {"error": str(e)}
 
 
-def verify_access_token(access_token: str):
+# Decoded claims keyed by sha256(token), so raw tokens never sit in memory as keys.
+_claims_cache = TTLCache(maxsize=settings.AUTH_CLAIMS_CACHE_SIZE, ttl=settings.AUTH_CLAIMS_CACHE_TTL)
+
+# Sentinel: the token could not be checked locally and needs the auth server.
+_UNVERIFIABLE = object()
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _decode_local_jwt(access_token: str):
+    """
+    Verify an HS256 Supabase access token in-process.
+    Returns the claims dict, None if the token is invalid or expired, or
+    _UNVERIFIABLE when there is no secret or the token uses another algorithm.
+    """
+    secret = settings.SUPABASE_JWT_SECRET
+    if not secret:
+        return _UNVERIFIABLE
     try:
-        r = supabase.auth.get_user(access_token)
-        if r and getattr(r, "user", None):
-            return r.user.id
+        header_b64, payload_b64, signature_b64 = access_token.split(".")
+        header = json.loads(_b64url_decode(header_b64))
+        if header.get("alg") != "HS256":
+            return _UNVERIFIABLE
+
+        expected = hmac.new(secret.encode(), f"{header_b64}.{payload_b64}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64url_decode(signature_b64)):
+            return None
+
+        claims = json.loads(_b64url_decode(payload_b64))
+        if not claims.get("sub") or float(claims.get("exp", 0)) <= time.time():
+            return None
+        return claims
+    except Exception:
         return None
-    except Exception as e:
-        print("Auth verify error:", e)
+
+
+def get_token_claims(access_token: str) -> Optional[Dict[str, Any]]:
+    """
+    Resolve the claims for an access token: cache, then local JWT check, then
+    the auth server as a fallback. Returns None for invalid tokens.
+    """
+    if not access_token:
+        return None
+    key = hashlib.sha256(access_token.encode()).hexdigest()
+    claims = _claims_cache.get(key)
+    if claims is not None:
+        if float(claims.get("exp", 0)) > time.time():
+            return claims
+        _claims_cache.pop(key)
+        return None
+
+    claims = _decode_local_jwt(access_token)
+    if claims is _UNVERIFIABLE:
+        try:
+            r = supabase.auth.get_user(access_token)
+            user = getattr(r, "user", None) if r else None
+            if not user:
+                return None
+            # The remote check does not hand back exp; trust it for the cache TTL only.
+            claims = {"sub": user.id, "exp": time.time() + settings.AUTH_CLAIMS_CACHE_TTL}
+        except Exception as e:
+            print("Auth verify error:", e)
+            return None
+    if not claims:
         return None
+
+    # Never cache a token beyond its own expiry.
+    _claims_cache.set(key, claims, ttl=min(settings.AUTH_CLAIMS_CACHE_TTL, float(claims["exp"]) - time.time()))
+    return claims
+
+
+def verify_access_token(access_token: str):
+    claims = get_token_claims(access_token)
+    return claims["sub"] if claims else None
@@ -0,0 +1,192 @@
+# app/services/availability_service.py
+"""Per-listing index of booked date ranges.
+
+Ranges are half-open [start_date, end_date): a booking ending on the 5th
+does not block one starting on the 5th. Each listing keeps its ranges
+sorted by start together with a running maximum of end dates, so "does
+anything overlap [s, e)?" is one bisect plus one lookup.
+"""
+
+import bisect
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.supabase_service import supabase
+from app.utils.pagination import apply_keyset, page_result
+
+# Bookings in these states no longer hold the listing.
+RELEASED_STATUSES = ("rejected", "cancelled", "canceled", "declined")
+
+
+def parse_day(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def booking_range(start_date: Any, end_date: Any) -> Tuple[date, date]:
+    """Half-open range for a booking; same-day bookings hold one day."""
+    start = parse_day(start_date)
+    end = parse_day(end_date)
+    if end <= start:
+        end = start + timedelta(days=1)
+    return start, end
+
+
+class IntervalIndex:
+    """Booked ranges of one listing, keyed by booking id."""
+
+    def __init__(self) -> None:
+        self._ranges: Dict[Any, Tuple[date, date]] = {}
+        self._sorted: List[Tuple[date, date, Any]] = []
+        self._starts: List[date] = []
+        self._max_end: List[date] = []
+
+    def __len__(self) -> int:
+        return len(self._ranges)
+
+    def add(self, booking_id: Any, start: date, end: date) -> None:
+        if self._ranges.get(booking_id) == (start, end):
+            return
+        self._ranges[booking_id] = (start, end)
+        self._rebuild()
+
+    def remove(self, booking_id: Any) -> None:
+        if self._ranges.pop(booking_id, None) is not None:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._sorted = sorted((s, e, b) for b, (s, e) in self._ranges.items())
+        self._starts = [s for s, _, _ in self._sorted]
+        self._max_end = []
+        running = date.min
+        for _, e, _ in self._sorted:
+            running = max(running, e)
+            self._max_end.append(running)
+
+    def overlaps(self, start: date, end: date, ignore_booking: Any = None) -> bool:
+        # Only ranges starting before `end` can overlap; among those, the
+        # largest end decides.
+        k = bisect.bisect_left(self._starts, end)
+        if k == 0 or self._max_end[k - 1] <= start:
+            return False
+        if ignore_booking is None:
+            return True
+        return any(b != ignore_booking for _, _, b in self.overlapping(start, end))
+
+    def overlapping(self, start: date, end: date) -> List[Tuple[date, date, Any]]:
+        k = bisect.bisect_left(self._starts, end)
+        return [r for r in self._sorted[:k] if r[1] > start]
+
+
+class AvailabilityIndex:
+    """Booked ranges for every listing, loaded from bookings."""
+
+    def __init__(self) -> None:
+        self._listings: Dict[Any, IntervalIndex] = {}
+        self._booking_listing: Dict[Any, Any] = {}
+        self._loaded: set = set()
+        self._warm = False
+        self._lock = threading.RLock()
+        self._listing_locks: Dict[Any, threading.Lock] = {}
+
+    def listing_lock(self, listing_id: Any) -> threading.Lock:
+        """Serializes check-then-insert for one listing inside this process."""
+        with self._lock:
+            return self._listing_locks.setdefault(listing_id, threading.Lock())
+
+    def apply_booking(self, row: Dict[str, Any]) -> None:
+        """Insert, move or drop a booking according to its current row."""
+        booking_id = row.get("id")
+        listing_id = row.get("listing_id")
+        if booking_id is None:
+            return
+        with self._lock:
+            previous = self._booking_listing.pop(booking_id, None)
+            if previous is not None:
+                self._listings[previous].remove(booking_id)
+            if listing_id is None or row.get("status") in RELEASED_STATUSES:
+                return
+            if not row.get("start_date") or not row.get("end_date"):
+                return
+            start, end = booking_range(row["start_date"], row["end_date"])
+            self._listings.setdefault(listing_id, IntervalIndex()).add(booking_id, start, end)
+            self._booking_listing[booking_id] = listing_id
+
+    def _ensure_loaded(self, listing_id: Any) -> None:
+        if self._warm or listing_id in self._loaded:
+            return
+        res = supabase.table("bookings").select("id, listing_id, start_date, end_date, status")\
+            .eq("listing_id", listing_id).not_.in_("status", list(RELEASED_STATUSES)).execute()
+        with self._lock:
+            for row in res.data or []:
+                self.apply_booking(row)
+            self._loaded.add(listing_id)
+
+    def warm_up(self, page_size: int = 1000) -> None:
+        """Load every active booking so later lookups never hit the database."""
+        cursor = None
+        rows: List[Dict[str, Any]] = []
+        while True:
+            query = supabase.table("bookings").select("id, listing_id, start_date, end_date, status, created_at")\
+                .not_.in_("status", list(RELEASED_STATUSES))
+            res = apply_keyset(query, cursor).limit(page_size + 1).execute()
+            page = page_result(res.data or [], page_size)
+            rows.extend(page["items"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+        with self._lock:
+            for row in rows:
+                self.apply_booking(row)
+            self._warm = True
+
+    def has_conflict(self, listing_id: Any, start: date, end: date, ignore_booking: Any = None) -> bool:
+        self._ensure_loaded(listing_id)
+        with self._lock:
+            index = self._listings.get(listing_id)
+            return bool(index) and index.overlaps(start, end, ignore_booking)
+
+    def booked_ranges(self, listing_id: Any, start: date, end: date) -> List[Dict[str, Any]]:
+        self._ensure_loaded(listing_id)
+        with self._lock:
+            index = self._listings.get(listing_id)
+            if not index:
+                return []
+            return [
+                {"booking_id": b, "start_date": s.isoformat(), "end_date": e.isoformat()}
+                for s, e, b in index.overlapping(start, end)
+            ]
+
+
+# Process-wide index used by bookings_service, routes and the realtime listener
+availability = AvailabilityIndex()
+
+
+def warm_up_availability():
+    try:
+        availability.warm_up()
+        print("📅 Availability index loaded")
+    except Exception as e:
+        # Lookups fall back to per-listing loads until the next restart.
+        print(f"⚠️ Failed to load availability index: {e}")
+
+
+def get_listing_availability(listing_id: int, from_date: Any, to_date: Any) -> Dict[str, Any]:
+    try:
+        start, end = parse_day(from_date), parse_day(to_date)
+        if end <= start:
+            return {"error": "`to` must be after `from`"}
+        booked = availability.booked_ranges(listing_id, start, end)
+        return {
+            "listing_id": listing_id,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "available": not booked,
+            "booked": booked,
+        }
+    except Exception as e:
+        return {"error": str(e)}
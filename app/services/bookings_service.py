@@ -1,59 +1,93 @@
 # app/services/bookings_service.py
-from datetime import datetime
-from typing import Dict, Any
-from app.services.supabase_service import supabase
-from app.services.wallet_service import debit_wallet
+import asyncio
+from typing import Dict, Any, Optional
+from app.services.availability_service import availability, booking_range
+from app.services.supabase_service import supabase, supabase_admin
+from app.services.user_service import get_user_profile
+from app.services.wallet_service import get_wallet_balance, invalidate_wallet_balance
 
 BOOKING_FEE = 20.0
 
 
-def create_booking(listing_id: int, renter_id: str, owner_id: str, start_date: str, end_date: str) -> Dict[str, Any]:
-    try:
-        # Enforce KYC verification before proceeding
-        user_rows = supabase.table("users").select("kyc_verified").eq("id", renter_id).execute().data
-        if not user_rows:
-            return {"error": "User not found or not eligible to book"}
-        user = user_rows[0]
-        if not user.get("kyc_verified"):
-            return {"error": "KYC verification required before booking."}
+def _fetch_listing_price(listing_id: int) -> Optional[Dict[str, Any]]:
+    res = supabase.table("listings").select("price_per_day, price").eq("id", listing_id).execute()
+    return res.data[0] if res.data else None
 
-        # charge booking fee immediately
-        debit_res = debit_wallet(renter_id, BOOKING_FEE, f"Booking fee for listing {listing_id}")
-        if isinstance(debit_res, dict) and debit_res.get("error"):
-            return {"error": "Insufficient wallet balance. Please top-up first.", "details": debit_res}
 
-        # fetch listing price_per_day (fallback to price)
-        listing_res = supabase.table("listings").select("price_per_day, price").eq("id", listing_id).execute()
-        if not listing_res.data:
-            return {"error": "Listing not found"}
-        listing = listing_res.data[0]
-        rent_per_day = float(listing.get("price_per_day") or listing.get("price") or 0)
+def _commit_booking(listing_id: int, renter_id: str, owner_id: str, start_date: str, end_date: str, start, end, rent_amount: float) -> Dict[str, Any]:
+    """Debit the fee and insert the booking in one database transaction.
+
+    start/end is the range used for the overlap check; the booking row keeps
+    the dates as the client sent them.
+    """
+    with availability.listing_lock(listing_id):
+        # Re-check under the lock: another request may have booked meanwhile.
+        if availability.has_conflict(listing_id, start, end):
+            return {"error": "Listing is already booked for these dates"}
+        try:
+            res = supabase_admin.rpc("create_booking_with_fee", {
+                "p_listing_id": listing_id,
+                "p_renter_id": renter_id,
+                "p_owner_id": owner_id,
+                "p_start_date": start_date,
+                "p_end_date": end_date,
+                "p_rent_amount": rent_amount,
+                "p_fee": BOOKING_FEE,
+            }).execute()
+        except Exception as e:
+            if "insufficient_balance" in str(e):
+                return {"error": "Insufficient wallet balance. Please top-up first."}
+            raise
+        finally:
+            # The fee was (maybe) debited inside the database function.
+            invalidate_wallet_balance(renter_id)
+        rows = res.data if isinstance(res.data, list) else [res.data] if res.data else []
+        for row in rows:
+            availability.apply_booking(row)
+        return {"booking": rows}
 
-        # parse dates
-        from datetime import datetime as _dt
-        start = _dt.strptime(start_date, "%Y-%m-%d")
-        end = _dt.strptime(end_date, "%Y-%m-%d")
-        days = max(1, (end - start).days)
 
-        rent_amount = rent_per_day * days
-        total_amount = rent_amount + BOOKING_FEE
+async def create_booking_async(listing_id: int, renter_id: str, owner_id: str, start_date: str, end_date: str, renter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    `renter` is the caller's profile with its flags as already loaded by the
+    request (see app.api.deps.get_current_user_with_flags); without it the
+    profile is read here. The independent reads (renter profile, listing
+    price, wallet balance, availability) run concurrently and everything is
+    validated before the fee debit and booking insert are committed together
+    by the create_booking_with_fee database function.
+    """
+    try:
+        try:
+            start, end = booking_range(start_date, end_date)
+        except ValueError:
+            return {"error": "Dates must be in YYYY-MM-DD format"}
 
-        booking_data = {
-            "listing_id": listing_id,
-            "renter_id": renter_id,
-            "owner_id": owner_id,
-            "start_date": start_date,
-            "end_date": end_date,
-            "rent_amount": rent_amount,
-            "total_amount": total_amount,
-            "platform_fee": 0,
-            "delivery_fee": 0,
-            "status": "requested",
-            "created_at": datetime.utcnow().isoformat()
-        }
+        lookups = [
+            asyncio.to_thread(_fetch_listing_price, listing_id),
+            asyncio.to_thread(get_wallet_balance, renter_id),
+            asyncio.to_thread(availability.has_conflict, listing_id, start, end),
+        ]
+        if renter is None:
+            lookups.append(asyncio.to_thread(get_user_profile, renter_id))
+        listing, wallet, conflict, *profile = await asyncio.gather(*lookups)
+        user = renter if renter is not None else profile[0]
 
-        res = supabase.table("bookings").insert(booking_data).execute()
-        return {"booking": res.data}
+        if not user:
+            return {"error": "User not found or not eligible to book"}
+        if not user.get("kyc_verified"):
+            return {"error": "KYC verification required before booking."}
+        if not listing:
+            return {"error": "Listing not found"}
+        if conflict:
+            return {"error": "Listing is already booked for these dates"}
+        if wallet.get("error"):
+            return {"error": wallet["error"]}
+        if float(wallet.get("balance", 0)) < BOOKING_FEE:
+            return {"error": "Insufficient wallet balance. Please top-up first.", "details": {"balance": wallet.get("balance", 0)}}
+
+        rent_per_day = float(listing.get("price_per_day") or listing.get("price") or 0)
+        rent_amount = rent_per_day * max(1, (end - start).days)
+        return await asyncio.to_thread(_commit_booking, listing_id, renter_id, owner_id, start_date, end_date, start, end, rent_amount)
     except Exception as e:
         return {"error": str(e)}
 
@@ -61,6 +95,8 @@ def create_booking(listing_id: int, renter_id: str, owner_id: str, start_date: s
 def update_booking_status(booking_id: int, status: str) -> Dict[str, Any]:
     try:
         res = supabase.table("bookings").update({"status": status}).eq("id", booking_id).execute()
+        for row in res.data or []:
+            availability.apply_booking(row)
         return {"updated": res.data}
     except Exception as e:
         return {"error": str(e)}
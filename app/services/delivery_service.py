@@ -1,8 +1,13 @@
 # app/services/delivery_service.py
 from datetime import datetime, timedelta
+import asyncio
 import random, string
 
 from app.services.supabase_service import supabase
+from app.services.geo_index import delivery_index, build_delivery_index
+from app.services.location_ingest import location_ingestor
+from app.services.live_tracking import live_tracker
+from app.services.track_service import track_store, get_task_track
 
 OTP_TTL_MINUTES = 30
 
@@ -95,6 +100,9 @@ def verify_pickup_otp(booking_id: int, otp: str, actor_user_id: str):
         "pickup_otp": None,  # burn the OTP
         "last_status_update": _utcnow_iso(),
     }).eq("booking_id", booking_id).execute()
+    if upd.data:
+        delivery_index.apply_task(upd.data[0])
+        location_ingestor.apply_task(upd.data[0])
     return {"success": True, "task": upd.data[0] if upd.data else None}
 
 def verify_drop_otp(booking_id: int, otp: str, actor_user_id: str):
@@ -119,29 +127,77 @@ def verify_drop_otp(booking_id: int, otp: str, actor_user_id: str):
         "drop_otp": None,  # burn the OTP
         "last_status_update": _utcnow_iso(),
     }).eq("booking_id", booking_id).execute()
+    if upd.data:
+        delivery_index.apply_task(upd.data[0])
+        location_ingestor.apply_task(upd.data[0])
     return {"success": True, "task": upd.data[0] if upd.data else None}
 
 
+def sweep_expired_otps():
+    """Burn OTPs whose expiry has passed on tasks that are still open."""
+    try:
+        res = supabase.table("delivery_tasks").update({
+            "pickup_otp": None,
+            "drop_otp": None,
+        }).lt("otp_expires_at", _utcnow_iso())\
+            .neq("status", "completed")\
+            .or_("pickup_otp.not.is.null,drop_otp.not.is.null").execute()
+        return {"expired_otps": len(res.data or [])}
+    except Exception as e:
+        return {"error": str(e)}
+
+
 # --- Geo helpers ---
 
 def update_live_location(task_id: int, lat: float, lng: float, actor_user_id: str):
-    """Update live location for a delivery task (either owner or renter)"""
+    """
+    Record a live location ping for a delivery task (either owner or renter).
+    The position is buffered and written to delivery_tasks by the ingestor's
+    periodic flush, so the ping is acknowledged without a database write.
+    """
     try:
-        task = supabase.table("delivery_tasks").select("*").eq("id", task_id).execute()
-        if not task.data:
-            return {"error": "Task not found"}
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return {"error": "Invalid coordinates"}
+        accepted = location_ingestor.submit(task_id, lat, lng, actor_user_id)
+        if accepted.get("error"):
+            return accepted
+        track_store.record(task_id, lat, lng)
+        return {"success": True, "task_id": task_id, "seq": accepted["seq"]}
+    except Exception as e:
+        return {"error": str(e)}
 
-        task = task.data[0]
-        if actor_user_id not in (task.get("owner_id"), task.get("renter_id")):
-            return {"error": "Not authorized"}
 
-        res = supabase.table("delivery_tasks").update({
-            "current_lat": lat,
-            "current_lng": lng,
-            "last_update": datetime.utcnow().isoformat(),
-        }).eq("id", task_id).execute()
+async def update_live_location_async(task_id: int, lat: float, lng: float, actor_user_id: str):
+    """
+    Same as update_live_location, then pushes the position straight to the
+    owner's and renter's WebSocket sessions instead of waiting for the
+    database write to come back through realtime.
+    """
+    try:
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return {"error": "Invalid coordinates"}
+        # A cached task makes submit() pure memory; a miss does one lookup.
+        accepted = await asyncio.to_thread(location_ingestor.submit, task_id, lat, lng, actor_user_id)
+        if accepted.get("error"):
+            return accepted
+        track_store.record(task_id, lat, lng)
+        await live_tracker.publish(
+            task_id, accepted["owner_id"], accepted["renter_id"], lat, lng, accepted["status"], accepted["seq"]
+        )
+        return {"success": True, "task_id": task_id, "seq": accepted["seq"]}
+    except Exception as e:
+        return {"error": str(e)}
 
-        return {"success": True, "updated": res.data[0] if res.data else None}
+
+def get_track_for_user(task_id: int, user: dict):
+    """Simplified route of a task for its owner, renter or an admin."""
+    try:
+        task = location_ingestor.participants(task_id)
+        if task is None:
+            return {"error": "Task not found"}
+        if user["id"] not in (task.get("owner_id"), task.get("renter_id")) and not user.get("is_admin"):
+            return {"error": "Not authorized"}
+        return get_task_track(task_id)
     except Exception as e:
         return {"error": str(e)}
 
@@ -156,29 +212,14 @@ def get_task_by_booking(booking_id: int):
 
 def get_active_deliveries_nearby(lat: float, lng: float, radius_km: float = 5.0):
     """
-    Fetch deliveries within given radius (approx using simple haversine filter).
-    For admin/map views or for showing nearby deliveries.
+    Active deliveries within radius_km of (lat, lng), closest first.
+    Served from the in-memory grid index; completed tasks are not included.
     """
     try:
-        res = supabase.table("delivery_tasks").select("*").execute()
-        if not res.data:
+        if radius_km <= 0:
             return []
-
-        from math import radians, sin, cos, sqrt, atan2
-        nearby = []
-        for row in res.data:
-            if not row.get("current_lat") or not row.get("current_lng"):
-                continue
-            # rough haversine
-            R = 6371
-            dlat = radians(row["current_lat"] - lat)
-            dlon = radians(row["current_lng"] - lng)
-            a = sin(dlat/2)**2 + cos(radians(lat)) * cos(radians(row["current_lat"])) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            distance = R * c
-            if distance <= radius_km:
-                row["distance_km"] = round(distance, 2)
-                nearby.append(row)
-        return nearby
+        if not delivery_index.ready and not build_delivery_index():
+            return {"error": "Delivery index unavailable"}
+        return delivery_index.nearby(lat, lng, radius_km)
     except Exception as e:
         return {"error": str(e)}
@@ -0,0 +1,170 @@
+# app/services/geo_index.py
+"""In-memory spatial index of active delivery tasks.
+
+Tasks are bucketed into a uniform lat/lng grid (CELL_DEG degrees per side).
+A radius query only visits the cells overlapping the query's bounding box,
+then computes haversine distances for the candidates in one NumPy pass.
+Completed or cancelled tasks and tasks without a position are not indexed.
+"""
+
+import math
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.services.supabase_service import supabase
+from app.utils.pagination import apply_keyset, page_result
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.32
+CELL_DEG = 0.05  # ~5.5 km of latitude
+INACTIVE_STATUSES = ("completed", "cancelled", "canceled")
+# Columns served by /delivery/nearby; OTPs never leave the database.
+TASK_FIELDS = ("id", "booking_id", "owner_id", "renter_id", "status", "mode", "current_lat", "current_lng", "last_update")
+
+Cell = Tuple[int, int]
+
+
+def _cell(lat: float, lng: float) -> Cell:
+    return (math.floor(lat / CELL_DEG), math.floor(lng / CELL_DEG))
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Distances in km from (lat, lng) to every point in lats/lngs."""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - math.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _position(row: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    lat, lng = row.get("current_lat"), row.get("current_lng")
+    if lat is None or lng is None:
+        return None
+    try:
+        return float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+
+
+class DeliveryGeoIndex:
+    def __init__(self) -> None:
+        self._tasks: Dict[Any, Dict[str, Any]] = {}
+        self._task_cell: Dict[Any, Cell] = {}
+        self._cells: Dict[Cell, Set[Any]] = {}
+        self._warm = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    @property
+    def ready(self) -> bool:
+        return self._warm
+
+    def remove(self, task_id: Any) -> None:
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            cell = self._task_cell.pop(task_id, None)
+            if cell is not None:
+                members = self._cells.get(cell)
+                if members is not None:
+                    members.discard(task_id)
+                    if not members:
+                        del self._cells[cell]
+
+    def apply_task(self, row: Dict[str, Any]) -> None:
+        """Index, move or drop a task according to its current row.
+
+        Partial rows (e.g. only id + position) are merged into what is
+        already indexed for the task.
+        """
+        task_id = row.get("id")
+        if task_id is None:
+            return
+        with self._lock:
+            merged = dict(self._tasks.get(task_id) or {})
+            merged.update({k: row[k] for k in TASK_FIELDS if k in row})
+            position = _position(merged)
+            if merged.get("status") in INACTIVE_STATUSES or position is None:
+                self.remove(task_id)
+                return
+            cell = _cell(*position)
+            if self._task_cell.get(task_id) != cell:
+                self.remove(task_id)
+                self._cells.setdefault(cell, set()).add(task_id)
+                self._task_cell[task_id] = cell
+            self._tasks[task_id] = merged
+
+    def replace_all(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._tasks.clear()
+            self._task_cell.clear()
+            self._cells.clear()
+            for row in rows:
+                self.apply_task(row)
+            self._warm = True
+
+    def _candidate_ids(self, lat: float, lng: float, radius_km: float) -> List[Any]:
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlng = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        lo_lat, lo_lng = _cell(lat - dlat, lng - dlng)
+        hi_lat, hi_lng = _cell(lat + dlat, lng + dlng)
+        span = (hi_lat - lo_lat + 1) * (hi_lng - lo_lng + 1)
+        ids: List[Any] = []
+        if span > len(self._cells):
+            # Huge radius: cheaper to scan the occupied cells than the box.
+            for (clat, clng), members in self._cells.items():
+                if lo_lat <= clat <= hi_lat and lo_lng <= clng <= hi_lng:
+                    ids.extend(members)
+            return ids
+        for clat in range(lo_lat, hi_lat + 1):
+            for clng in range(lo_lng, hi_lng + 1):
+                members = self._cells.get((clat, clng))
+                if members:
+                    ids.extend(members)
+        return ids
+
+    def nearby(self, lat: float, lng: float, radius_km: float) -> List[Dict[str, Any]]:
+        """Active tasks within radius_km, closest first, with distance_km."""
+        with self._lock:
+            ids = self._candidate_ids(lat, lng, radius_km)
+            if not ids:
+                return []
+            rows = [self._tasks[i] for i in ids]
+            lats = np.fromiter((float(r["current_lat"]) for r in rows), dtype=np.float64, count=len(rows))
+            lngs = np.fromiter((float(r["current_lng"]) for r in rows), dtype=np.float64, count=len(rows))
+        distances = haversine_km(lat, lng, lats, lngs)
+        hits = np.flatnonzero(distances <= radius_km)
+        hits = hits[np.argsort(distances[hits], kind="stable")]
+        return [dict(rows[i], distance_km=round(float(distances[i]), 2)) for i in hits]
+
+
+# Process-wide index used by delivery_service and the realtime listener
+delivery_index = DeliveryGeoIndex()
+
+
+def build_delivery_index(page_size: int = 1000) -> bool:
+    """Load every active task that has a position."""
+    try:
+        cursor = None
+        rows: List[Dict[str, Any]] = []
+        while True:
+            query = supabase.table("delivery_tasks").select(", ".join(TASK_FIELDS + ("created_at",)))\
+                .not_.in_("status", list(INACTIVE_STATUSES))\
+                .not_.is_("current_lat", "null")
+            res = apply_keyset(query, cursor).limit(page_size + 1).execute()
+            page = page_result(res.data or [], page_size)
+            rows.extend(page["items"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+        delivery_index.replace_all(rows)
+        print(f"🗺️ Delivery geo index loaded: {len(delivery_index)} active tasks")
+        return True
+    except Exception as e:
+        print(f"⚠️ Failed to load delivery geo index: {e}")
+        return False
@@ -0,0 +1,235 @@
+# app/services/idempotency_service.py
+"""Idempotency-Key support for endpoints that move money.
+
+The first request with a given (scope, key) inserts a "pending" row in
+idempotency_keys, runs the handler and records its outcome, whatever it
+is: a retry after a provider timeout must not refund or charge twice, so
+error responses are replayed too and a client that wants a fresh attempt
+sends a new key. A retry that arrives while the first request is still
+running gets an "in progress" error instead of running the handler. A
+pending row older than PENDING_TIMEOUT_SECONDS belongs to a request that
+died mid-handler; a retry with the same parameters takes it over. Rows
+older than KEY_TTL_SECONDS are purged by a scheduled job.
+
+Completed outcomes are cached in a bounded in-memory LRU in front of the
+table, so replays are cheap, survive restarts and reach other instances.
+If the table is unreachable the in-memory path alone protects retries
+against this instance.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.services.supabase_service import supabase_admin
+
+KEY_TTL_SECONDS = 24 * 3600
+# Longer than any handler (provider calls time out well before this).
+PENDING_TIMEOUT_SECONDS = 300
+MAX_KEY_LENGTH = 255
+PENDING = "pending"
+COMPLETED = "completed"
+
+_memory = TTLCache(maxsize=20000, ttl=KEY_TTL_SECONDS)
+
+
+class _KeyLocks:
+    """Per-key locks that live exactly as long as a request holds or waits on them."""
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self._factory = factory
+        self._locks: Dict[Any, list] = {}
+        self._guard = threading.Lock()
+
+    def checkout(self, name: Any) -> Any:
+        with self._guard:
+            entry = self._locks.get(name)
+            if entry is None:
+                entry = self._locks[name] = [self._factory(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def checkin(self, name: Any) -> None:
+        with self._guard:
+            entry = self._locks[name]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[name]
+
+
+_thread_locks = _KeyLocks(threading.Lock)
+_async_locks = _KeyLocks(asyncio.Lock)
+
+
+@contextmanager
+def _held(scope: str, key: str):
+    lock = _thread_locks.checkout((scope, key))
+    try:
+        with lock:
+            yield
+    finally:
+        _thread_locks.checkin((scope, key))
+
+
+@asynccontextmanager
+async def _held_async(scope: str, key: str):
+    lock = _async_locks.checkout((scope, key))
+    try:
+        async with lock:
+            yield
+    finally:
+        _async_locks.checkin((scope, key))
+
+
+def request_hash(params: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _lookup(scope: str, key: str) -> Optional[Dict[str, Any]]:
+    stored = _memory.get((scope, key))
+    if stored is not None:
+        return stored
+    try:
+        res = supabase_admin.table("idempotency_keys").select("request_hash, status, response, created_at")\
+            .eq("scope", scope).eq("key", key).limit(1).execute()
+    except Exception as e:
+        print(f"⚠️ Idempotency lookup failed, using this instance's memory only: {e}")
+        return None
+    if not res.data:
+        return None
+    stored = res.data[0]
+    if stored.get("status") != PENDING:
+        _memory.set((scope, key), stored)
+    return stored
+
+
+def _ago(seconds: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+
+
+def _take_over(scope: str, key: str, fingerprint: str) -> bool:
+    """Re-claim a pending row whose owner stopped updating it. The update is
+    conditional, so only one of several concurrent retries wins."""
+    res = supabase_admin.table("idempotency_keys").update({"created_at": datetime.now(timezone.utc).isoformat()})\
+        .eq("scope", scope).eq("key", key).eq("request_hash", fingerprint).eq("status", PENDING)\
+        .lt("created_at", _ago(PENDING_TIMEOUT_SECONDS)).execute()
+    return bool(res.data)
+
+
+def _claim(scope: str, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Insert the pending row. Returns the existing record when another
+    request already owns the key, None when this one may run."""
+    try:
+        supabase_admin.table("idempotency_keys").insert(
+            {"scope": scope, "key": key, "request_hash": fingerprint, "status": PENDING}
+        ).execute()
+        return None
+    except Exception as e:
+        if not ("23505" in str(e) or "duplicate key" in str(e)):
+            print(f"⚠️ Failed to record pending idempotency key: {e}")
+            return None
+    stored = _lookup(scope, key) or {"request_hash": fingerprint, "status": PENDING}
+    if stored.get("status") == PENDING and stored["request_hash"] == fingerprint:
+        try:
+            if _take_over(scope, key, fingerprint):
+                print(f"♻️ Took over stale idempotency key {scope}/{key}")
+                return None
+        except Exception as e:
+            print(f"⚠️ Failed to take over stale idempotency key: {e}")
+    return stored
+
+
+def _store(scope: str, key: str, fingerprint: str, response: Any) -> None:
+    stored = {"request_hash": fingerprint, "status": COMPLETED, "response": response}
+    _memory.set((scope, key), stored)
+    try:
+        supabase_admin.table("idempotency_keys").upsert(
+            {"scope": scope, "key": key, **stored},
+            on_conflict="scope,key",
+        ).execute()
+    except Exception as e:
+        # The in-memory copy still protects retries against this instance.
+        print(f"⚠️ Failed to persist idempotency key: {e}")
+
+
+def _replay(stored: Dict[str, Any], fingerprint: str) -> Any:
+    if stored["request_hash"] != fingerprint:
+        return {"error": "Idempotency-Key was already used with different parameters"}
+    if stored.get("status") == PENDING:
+        return {"error": "A request with this Idempotency-Key is still in progress"}
+    return stored["response"]
+
+
+def _invalid_key(key: str) -> Optional[Dict[str, Any]]:
+    if len(key) > MAX_KEY_LENGTH:
+        return {"error": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}
+    return None
+
+
+# Recorded when the handler raises: whatever it did can't be known.
+UNKNOWN_OUTCOME = {"error": "Request failed with an unknown outcome; check its status before retrying with a new Idempotency-Key"}
+
+
+def run_idempotent(key: Optional[str], scope: str, params: Dict[str, Any], handler: Callable[[], Any]) -> Any:
+    """Sync variant for threadpool routes."""
+    if not key:
+        return handler()
+    if _invalid_key(key):
+        return _invalid_key(key)
+    fingerprint = request_hash(params)
+    stored = _lookup(scope, key)
+    if stored is not None and stored.get("status") != PENDING:
+        return _replay(stored, fingerprint)
+
+    # Pending keys go through the lock: a request on this instance may be
+    # about to finish, and a stale claim may be taken over.
+    with _held(scope, key):
+        # A concurrent retry may have finished while we waited.
+        stored = _memory.get((scope, key)) or _claim(scope, key, fingerprint)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+        try:
+            response = handler()
+        except Exception:
+            _store(scope, key, fingerprint, UNKNOWN_OUTCOME)
+            raise
+        _store(scope, key, fingerprint, response)
+    return response
+
+
+async def run_idempotent_async(key: Optional[str], scope: str, params: Dict[str, Any], handler: Callable[[], Awaitable[Any]]) -> Any:
+    """Async variant: database lookups and writes run off the event loop."""
+    if not key:
+        return await handler()
+    if _invalid_key(key):
+        return _invalid_key(key)
+    fingerprint = request_hash(params)
+    stored = await asyncio.to_thread(_lookup, scope, key)
+    if stored is not None and stored.get("status") != PENDING:
+        return _replay(stored, fingerprint)
+
+    async with _held_async(scope, key):
+        stored = _memory.get((scope, key)) or await asyncio.to_thread(_claim, scope, key, fingerprint)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+        try:
+            response = await handler()
+        except Exception:
+            await asyncio.to_thread(_store, scope, key, fingerprint, UNKNOWN_OUTCOME)
+            raise
+        await asyncio.to_thread(_store, scope, key, fingerprint, response)
+    return response
+
+
+def purge_expired_keys() -> Dict[str, Any]:
+    """Scheduler job: delete keys older than KEY_TTL_SECONDS."""
+    try:
+        res = supabase_admin.table("idempotency_keys").delete().lt("created_at", _ago(KEY_TTL_SECONDS)).execute()
+        return {"purged": len(res.data or [])}
+    except Exception as e:
+        return {"error": str(e)}
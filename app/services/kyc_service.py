@@ -2,6 +2,7 @@
 
 from datetime import datetime
 from app.services.supabase_service import supabase
+from app.services.user_service import invalidate_user_profile
 import requests
 import os
 import base64
@@ -59,6 +60,7 @@ def submit_kyc(user_id: str, govt_id_url: str, selfie_url: str):
             "kyc_selfie": selfie_url,
             "kyc_submitted_at": datetime.utcnow().isoformat(),
         }).eq("id", user_id).execute()
+        invalidate_user_profile(user_id)
 
         if auto_pass:
             return {"verified": True, "method": "auto", "score": score}
@@ -100,6 +102,7 @@ def review_kyc(user_id: str, admin_id: str, approve: bool, reason: str = None):
         supabase.table("users").update({
             "kyc_verified": approve
         }).eq("id", user_id).execute()
+        invalidate_user_profile(user_id)
 
         return {"success": True, "approved": approve}
     except Exception as e:
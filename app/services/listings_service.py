@@ -1,11 +1,20 @@
 # app/services/listings_service.py
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from app.services.search_service import listing_index
 from app.services.supabase_service import supabase
 from app.services.wallet_service import debit_wallet
+from app.utils.pagination import apply_keyset, clamp_limit, page_result
 
 LISTING_FEE = 25.0
 
+# Columns clients may request through `fields=`; id/created_at are always
+# returned because the page cursor is built from them.
+LISTING_FIELDS = {
+    "id", "title", "description", "price_per_day", "price", "category_id",
+    "owner_id", "image_url", "is_paid_listing_fee", "created_at",
+}
+
 
 def get_all_listings():
     try:
@@ -15,6 +24,49 @@ def get_all_listings():
         return {"error": str(e)}
 
 
+def _select_clause(fields: Optional[str]) -> str:
+    if not fields:
+        return "*"
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in LISTING_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    columns = ["id", "created_at"] + [f for f in requested if f not in ("id", "created_at")]
+    return ", ".join(columns)
+
+
+def get_listings_page(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    owner_id: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    One page of listings, newest first, keyset-paginated on (created_at, id).
+    Filters run in Postgres so only `limit + 1` rows ever leave the database.
+    """
+    try:
+        limit = clamp_limit(limit)
+        query = supabase.table("listings").select(_select_clause(fields))
+        if category_id is not None:
+            query = query.eq("category_id", category_id)
+        if min_price is not None:
+            query = query.gte("price_per_day", min_price)
+        if max_price is not None:
+            query = query.lte("price_per_day", max_price)
+        if owner_id:
+            query = query.eq("owner_id", owner_id)
+        res = apply_keyset(query, cursor).limit(limit + 1).execute()
+
+        page = page_result(res.data or [], limit)
+        return {"listings": page["items"], "next_cursor": page["next_cursor"], "has_more": page["has_more"]}
+    except Exception as e:
+        return {"error": str(e)}
+
+
 def add_listing(title: str, description: str, price: float, category_id: int, owner_id: str, require_paid: bool = True) -> Dict[str, Any]:
     """
     Create a listing and optionally debit LISTING_FEE from owner's wallet.
@@ -35,6 +87,8 @@ def add_listing(title: str, description: str, price: float, category_id: int, ow
             "created_at": datetime.utcnow().isoformat()
         }
         res = supabase.table("listings").insert(data).execute()
+        for row in res.data or []:
+            listing_index.upsert(row)
         return {"created": res.data}
     except Exception as e:
         return {"error": str(e)}
@@ -43,6 +97,7 @@ def add_listing(title: str, description: str, price: float, category_id: int, ow
 def delete_listing(listing_id: int):
     try:
         res = supabase.table("listings").delete().eq("id", listing_id).execute()
+        listing_index.remove(listing_id)
         return {"deleted": res.data}
     except Exception as e:
         return {"error": str(e)}
@@ -0,0 +1,77 @@
+# app/services/live_tracking.py
+"""Push live delivery locations to the task's owner and renter.
+
+The location endpoint publishes straight to the WebSocket manager as soon
+as a ping is accepted. The realtime listener publishes the same update
+again when the batched write reaches Postgres, which is how users
+connected to other instances hear about it when no pub/sub backbone links
+the workers. Both paths drop anything at or below the last sequence
+number already pushed for the task, so nobody receives a position twice
+or out of order.
+
+Each update is encoded once as JSON and once as a binary frame (see
+app/core/ws_protocol.py); sockets that opted into binary get the latter.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.websocket_manager import manager
+from app.core.ws_protocol import encode_delivery_update
+
+
+class LiveTracker:
+    def __init__(self) -> None:
+        self._last_seq = TTLCache(maxsize=50000, ttl=3600.0)
+        self._lock = threading.Lock()
+        self.stats = {"pushed": 0, "duplicates": 0}
+
+    def claim(self, task_id: Any, seq: Optional[int]) -> bool:
+        """True if `seq` is newer than anything pushed for the task."""
+        if seq is None:
+            # Rows written before location_seq existed; nothing to compare.
+            return True
+        with self._lock:
+            last = self._last_seq.get(task_id)
+            if last is not None and seq <= last:
+                self.stats["duplicates"] += 1
+                return False
+            self._last_seq.set(task_id, seq)
+            return True
+
+    def is_stale(self, task_id: Any, seq: Optional[int]) -> bool:
+        last = self._last_seq.get(task_id)
+        return seq is not None and last is not None and seq < last
+
+    async def publish(self, task_id: Any, owner_id: Optional[str], renter_id: Optional[str], lat: float, lng: float, status: Optional[str], seq: Optional[int], local_only: bool = False) -> bool:
+        if not self.claim(task_id, seq):
+            return False
+        message: Dict[str, Any] = {
+            "type": "delivery_update",
+            "task_id": task_id,
+            "lat": lat,
+            "lng": lng,
+            "status": status,
+            "seq": seq,
+        }
+        # Encoded once per encoding and only queued per socket, so this never waits on a client.
+        frames = {"json": manager.encode(message)}
+        binary = encode_delivery_update(task_id, seq, lat, lng, status)
+        if binary is not None:
+            frames["binary"] = binary
+        manager.send_frame(list(dict.fromkeys(u for u in (owner_id, renter_id) if u)), frames, local_only)
+        self.stats["pushed"] += 1
+        return True
+
+    async def publish_from_realtime(self, task_id: Any, owner_id: Optional[str], renter_id: Optional[str], lat: float, lng: float, status: Optional[str], seq: Optional[int]) -> bool:
+        """Realtime path. Every worker receives the row itself, so only local
+        sockets are served; while pub/sub links the workers, the direct push
+        has already reached everyone and this is skipped."""
+        if manager.pubsub.connected:
+            return False
+        return await self.publish(task_id, owner_id, renter_id, lat, lng, status, seq, local_only=True)
+
+
+# Process-wide tracker shared by the location endpoint and the realtime listener
+live_tracker = LiveTracker()
@@ -0,0 +1,145 @@
+# app/services/location_ingest.py
+"""Coalesced ingestion of live delivery locations.
+
+A ping is authorized against a cached task -> participants map and then
+only replaces the task's buffered position in memory. A background loop
+writes the latest position of every task that moved since the last flush
+with one delivery_apply_locations call, so database writes scale with
+active tasks x flush rate rather than with ping rate.
+
+Every accepted ping gets a per-task sequence number; it is written to
+delivery_tasks.location_seq so consumers can drop stale positions. The
+number is the acceptance time in epoch milliseconds (bumped by one when a
+task gets two pings in the same millisecond), so workers that accept pings
+for the same task agree on their order without coordinating, as long as
+their clocks are NTP-synced.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.settings import settings
+from app.services.geo_index import INACTIVE_STATUSES, delivery_index
+from app.services.supabase_service import supabase, supabase_admin
+
+PARTICIPANT_FIELDS = "id, owner_id, renter_id, status, location_seq"
+
+
+class LocationIngestor:
+    def __init__(self, flush_interval: float = 2.0) -> None:
+        self.flush_interval = flush_interval
+        self._participants = TTLCache(maxsize=50000, ttl=300.0)
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._seq: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"pings": 0, "flushes": 0, "rows_written": 0, "flush_errors": 0}
+
+    # ---- participants ----
+    def participants(self, task_id: Any) -> Optional[Dict[str, Any]]:
+        """Cached id/owner_id/renter_id/status/location_seq of a task, or None."""
+        task = self._participants.get(task_id)
+        if task is None:
+            res = supabase.table("delivery_tasks").select(PARTICIPANT_FIELDS).eq("id", task_id).limit(1).execute()
+            if not res.data:
+                return None
+            task = res.data[0]
+            self._participants.set(task_id, task)
+        return task
+
+    def apply_task(self, row: Dict[str, Any]) -> None:
+        """Refresh a cached task from a realtime event or a status update."""
+        task_id = row.get("id")
+        if task_id is None:
+            return
+        cached = self._participants.get(task_id)
+        if cached is not None:
+            self._participants.set(task_id, dict(cached, **{k: row[k] for k in ("owner_id", "renter_id", "status") if k in row}))
+        if row.get("location_seq") is not None:
+            with self._lock:
+                self._seq[task_id] = max(self._seq.get(task_id, 0), int(row["location_seq"]))
+
+    # ---- ingest ----
+    def submit(self, task_id: Any, lat: float, lng: float, actor_user_id: str) -> Dict[str, Any]:
+        task = self.participants(task_id)
+        if task is None:
+            return {"error": "Task not found"}
+        if actor_user_id not in (task.get("owner_id"), task.get("renter_id")):
+            return {"error": "Not authorized"}
+        if task.get("status") in INACTIVE_STATUSES:
+            return {"error": "Delivery is no longer active"}
+
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            last = max(self._seq.get(task_id, 0), int(task.get("location_seq") or 0))
+            seq = max(int(time.time() * 1000), last + 1)
+            self._seq[task_id] = seq
+            self._pending[task_id] = {"id": task_id, "lat": lat, "lng": lng, "ts": now, "seq": seq}
+            self.stats["pings"] += 1
+
+        delivery_index.apply_task({
+            "id": task_id,
+            "owner_id": task.get("owner_id"),
+            "renter_id": task.get("renter_id"),
+            "status": task.get("status"),
+            "current_lat": lat,
+            "current_lng": lng,
+            "last_update": now,
+        })
+        return {
+            "success": True,
+            "task_id": task_id,
+            "seq": seq,
+            "owner_id": task.get("owner_id"),
+            "renter_id": task.get("renter_id"),
+            "status": task.get("status"),
+        }
+
+    # ---- flush ----
+    def flush(self) -> int:
+        """Write every buffered position in one call; returns rows sent."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                supabase_admin.rpc("delivery_apply_locations", {"p_updates": list(batch.values())}).execute()
+            except Exception as e:
+                # Put the positions back unless a newer ping arrived meanwhile.
+                with self._lock:
+                    for task_id, update in batch.items():
+                        self._pending.setdefault(task_id, update)
+                    self.stats["flush_errors"] += 1
+                print(f"⚠️ Failed to flush {len(batch)} delivery locations: {e}")
+                return 0
+            with self._lock:
+                self.stats["flushes"] += 1
+                self.stats["rows_written"] += len(batch)
+            return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the loop and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+# Process-wide ingestor started from main.startup_event
+location_ingestor = LocationIngestor(settings.LOCATION_FLUSH_INTERVAL)
@@ -0,0 +1,183 @@
+# app/services/payment_provider.py
+"""Async payment-provider adapter.
+
+One shared httpx.AsyncClient (keep-alive pool) talks to the Razorpay REST
+API, so order creation and refunds never hold a threadpool worker while
+waiting on the provider. Calls have per-request timeouts and bounded
+retries with full jitter. Signature checks are local HMACs.
+
+FakePaymentProvider implements the same interface in memory; select it with
+PAYMENT_PROVIDER=fake for local runs and tests.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import random
+import uuid
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.settings import settings
+
+RAZORPAY_API = "https://api.razorpay.com/v1"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class PaymentProviderError(Exception):
+    """The provider rejected a call or could not be reached."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, payload: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.payload = payload or {}
+
+
+class SignatureVerificationError(PaymentProviderError):
+    pass
+
+
+def _hmac_sha256(secret: str, message: bytes) -> str:
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class RazorpayProvider:
+    def __init__(
+        self,
+        key_id: str,
+        key_secret: str,
+        base_url: str = RAZORPAY_API,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        backoff: float = 0.25,
+        max_connections: int = 50,
+    ) -> None:
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.key_id or "", self.key_secret or ""),
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._http
+
+    async def _sleep_backoff(self, attempt: int) -> None:
+        await asyncio.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    async def _request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None, idempotent: bool = True) -> Dict[str, Any]:
+        """
+        Connection failures are retried for every call (the request never
+        reached the provider). Timeouts and 429/5xx responses are retried only
+        for `idempotent` calls, since the provider may already have acted.
+        """
+        attempt = 0
+        while True:
+            try:
+                resp = await self._client().request(method, path, json=json)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if attempt >= self.max_retries:
+                    raise PaymentProviderError(f"Provider unreachable: {e}")
+            except httpx.TimeoutException as e:
+                if not idempotent or attempt >= self.max_retries:
+                    raise PaymentProviderError(f"Provider timed out: {e}")
+            else:
+                if resp.status_code < 400:
+                    return resp.json()
+                if not (idempotent and resp.status_code in RETRYABLE_STATUS and attempt < self.max_retries):
+                    try:
+                        payload = resp.json()
+                    except ValueError:
+                        payload = {}
+                    message = payload.get("error", {}).get("description") or resp.text or f"HTTP {resp.status_code}"
+                    raise PaymentProviderError(message, resp.status_code, payload)
+            await self._sleep_backoff(attempt)
+            attempt += 1
+
+    async def create_order(self, amount_paise: int, currency: str = "INR", receipt: Optional[str] = None) -> Dict[str, Any]:
+        # A retried duplicate is just an unpaid order, so this is safe to retry.
+        body = {"amount": amount_paise, "currency": currency, "payment_capture": 1}
+        if receipt:
+            body["receipt"] = receipt
+        return await self._request("POST", "/orders", json=body, idempotent=True)
+
+    async def refund(self, payment_id: str, amount_paise: int) -> Dict[str, Any]:
+        return await self._request("POST", f"/payments/{payment_id}/refund", json={"amount": amount_paise}, idempotent=False)
+
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str) -> None:
+        expected = _hmac_sha256(self.key_secret or "", f"{order_id}|{payment_id}".encode())
+        if not signature or not hmac.compare_digest(expected, signature):
+            raise SignatureVerificationError("Invalid payment signature")
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+class FakePaymentProvider(RazorpayProvider):
+    """In-memory provider with Razorpay-shaped responses; no network."""
+
+    def __init__(self, key_id: str = "rzp_test_fake", key_secret: str = "fake_secret") -> None:
+        super().__init__(key_id, key_secret)
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.refunds: Dict[str, Dict[str, Any]] = {}
+
+    async def create_order(self, amount_paise: int, currency: str = "INR", receipt: Optional[str] = None) -> Dict[str, Any]:
+        order = {"id": f"order_{uuid.uuid4().hex[:14]}", "amount": amount_paise, "currency": currency, "receipt": receipt, "status": "created"}
+        self.orders[order["id"]] = order
+        return order
+
+    async def refund(self, payment_id: str, amount_paise: int) -> Dict[str, Any]:
+        if not payment_id.startswith("pay_"):
+            raise PaymentProviderError("The id provided does not exist", 400)
+        refund = {"id": f"rfnd_{uuid.uuid4().hex[:14]}", "payment_id": payment_id, "amount": amount_paise, "status": "processed"}
+        self.refunds[refund["id"]] = refund
+        return refund
+
+    def sign_payment(self, order_id: str, payment_id: str) -> str:
+        """Signature a real checkout would hand back for this order/payment."""
+        return _hmac_sha256(self.key_secret, f"{order_id}|{payment_id}".encode())
+
+    async def aclose(self) -> None:
+        return None
+
+
+def verify_webhook_signature(body: bytes, signature: Optional[str], secret: Optional[str]) -> bool:
+    """Razorpay signs the raw webhook body with HMAC-SHA256 and the webhook secret."""
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(_hmac_sha256(secret, body), signature)
+
+
+_provider: Optional[RazorpayProvider] = None
+
+
+def get_payment_provider() -> RazorpayProvider:
+    global _provider
+    if _provider is None:
+        if settings.PAYMENT_PROVIDER == "fake":
+            _provider = FakePaymentProvider()
+        else:
+            _provider = RazorpayProvider(
+                settings.RAZORPAY_KEY_ID,
+                settings.RAZORPAY_KEY_SECRET,
+                timeout=settings.PAYMENT_HTTP_TIMEOUT,
+                max_retries=settings.PAYMENT_MAX_RETRIES,
+            )
+    return _provider
+
+
+async def close_payment_provider() -> None:
+    if _provider is not None:
+        await _provider.aclose()
@@ -0,0 +1,174 @@
+# app/services/payment_webhooks.py
+"""Queued processing of Razorpay webhooks.
+
+POST /payments/webhook only verifies the signature and enqueues the event.
+Worker tasks drain the queue in batches: each batch skips event ids already
+in payment_webhook_events, settles all paid orders with one payments_settle
+call (which flips the payments rows and credits the wallets in the same
+transaction), and only then records its event ids. A crash or failed RPC in
+between leaves the events unrecorded, so the retry or Razorpay's redelivery
+settles them; payments_settle only transitions unsettled payments, so doing
+that twice never credits twice.
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.services.payments_service import settle_payments
+from app.services.supabase_service import supabase, supabase_admin
+
+SETTLE_EVENTS = ("payment.captured", "order.paid")
+FAIL_EVENTS = ("payment.failed",)
+MAX_ATTEMPTS = 5
+
+
+def event_id_for(body: bytes, header_event_id: Optional[str]) -> str:
+    """Razorpay sends X-Razorpay-Event-Id; fall back to a hash of the body."""
+    return header_event_id or "sha256:" + hashlib.sha256(body).hexdigest()
+
+
+def _payment_entity(event: Dict[str, Any]) -> Dict[str, Any]:
+    return ((event.get("payload") or {}).get("payment") or {}).get("entity") or {}
+
+
+def _order_id(event: Dict[str, Any]) -> Optional[str]:
+    order = ((event.get("payload") or {}).get("order") or {}).get("entity") or {}
+    return _payment_entity(event).get("order_id") or order.get("id")
+
+
+class WebhookProcessor:
+    def __init__(self, workers: int = 2, batch_size: int = 50, batch_wait: float = 0.2, maxsize: int = 10000) -> None:
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Fast-path dedupe; payment_webhook_events is the source of truth.
+        self._seen = TTLCache(maxsize=50000, ttl=24 * 3600)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Give queued events a chance to finish, then cancel the workers."""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ {self._queue.qsize()} payment webhooks still queued at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, event_id: str, event: Dict[str, Any]) -> bool:
+        """False when the queue is full, so the route can ask Razorpay to retry."""
+        if self._queue is None:
+            return False
+        if self._seen.get(event_id):
+            return True
+        try:
+            self._queue.put_nowait((event_id, event, 0))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _next_batch(self) -> List[Tuple[str, Dict[str, Any], int]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._process(batch)
+            except Exception as e:
+                print(f"⚠️ Payment webhook batch failed: {e}")
+                await self._retry(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _retry(self, batch) -> None:
+        loop = asyncio.get_running_loop()
+        for event_id, event, attempt in batch:
+            if attempt + 1 >= MAX_ATTEMPTS:
+                print(f"❌ Dropping payment webhook {event_id} after {MAX_ATTEMPTS} attempts")
+                continue
+            loop.call_later(min(30, 2 ** attempt), self._requeue, (event_id, event, attempt + 1))
+
+    def _requeue(self, item) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            print(f"❌ Webhook queue full, dropping retry of {item[0]}")
+
+    async def _unprocessed(self, batch) -> List[Tuple[str, Dict[str, Any], int]]:
+        """Events of the batch not yet recorded as processed."""
+        fresh = {}
+        for item in batch:
+            if not self._seen.get(item[0]):
+                fresh.setdefault(item[0], item)
+        if not fresh:
+            return []
+        res = await asyncio.to_thread(
+            supabase_admin.table("payment_webhook_events").select("event_id").in_("event_id", list(fresh)).execute
+        )
+        for row in res.data or []:
+            self._seen.set(row["event_id"], True)
+            fresh.pop(row["event_id"], None)
+        return list(fresh.values())
+
+    async def _record(self, events) -> None:
+        rows = [{"event_id": event_id, "event": event.get("event", "")} for event_id, event, _ in events]
+        await asyncio.to_thread(
+            supabase_admin.table("payment_webhook_events").upsert(rows, on_conflict="event_id", ignore_duplicates=True).execute
+        )
+        for event_id, _, _ in events:
+            self._seen.set(event_id, True)
+
+    async def _process(self, batch) -> None:
+        events = await self._unprocessed(batch)
+        if not events:
+            return
+        settle: Dict[str, Dict[str, Any]] = {}
+        failed: List[str] = []
+        for _, event, _ in events:
+            name = event.get("event")
+            order_id = _order_id(event)
+            if not order_id:
+                continue
+            if name in SETTLE_EVENTS:
+                settle[order_id] = {"order_id": order_id, "payment_id": _payment_entity(event).get("id"), "signature": None}
+            elif name in FAIL_EVENTS:
+                failed.append(order_id)
+
+        if settle:
+            settled = await asyncio.to_thread(settle_payments, list(settle.values()))
+            print(f"💰 Webhook settled {len(settled)} of {len(settle)} paid orders")
+        failed = [o for o in failed if o not in settle]
+        if failed:
+            await asyncio.to_thread(
+                supabase.table("payments").update({"status": "failed"}).in_("provider_order_id", failed).eq("status", "created").execute
+            )
+        await self._record(events)
+
+
+# Process-wide processor started from main.startup_event
+webhook_processor = WebhookProcessor()
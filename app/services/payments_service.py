@@ -1,27 +1,21 @@
 # app/services/payments_service.py
-import razorpay
+import asyncio
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 from app.core.settings import settings
-from app.services.supabase_service import supabase
-from app.services.wallet_service import credit_wallet
+from app.services.payment_provider import get_payment_provider, SignatureVerificationError
+from app.services.supabase_service import supabase, supabase_admin
+from app.services.wallet_service import invalidate_wallet_balance
 
-razorpay_client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
 
-
-def create_payment_order(user_id: str, amount: float, purpose: str) -> Dict[str, Any]:
+async def create_payment_order(user_id: str, amount: float, purpose: str) -> Dict[str, Any]:
     """
     Create a Razorpay order and persist it to payments table.
     Stores provider_order_id in payments.provider_order_id to match your schema.
     Returns order id and key id for client checkout.
     """
     try:
-        order_data = {
-            "amount": int(round(amount * 100)),  # paise
-            "currency": "INR",
-            "payment_capture": 1
-        }
-        order = razorpay_client.order.create(order_data)
+        order = await get_payment_provider().create_order(int(round(amount * 100)))  # paise
 
         record = {
             "user_id": user_id,
@@ -33,7 +27,7 @@ def create_payment_order(user_id: str, amount: float, purpose: str) -> Dict[str,
             "metadata": {"purpose": purpose},
             "created_at": datetime.utcnow().isoformat()
         }
-        supabase.table("payments").insert(record).execute()
+        await asyncio.to_thread(supabase.table("payments").insert(record).execute)
 
         return {"order_id": order.get("id"), "key_id": settings.RAZORPAY_KEY_ID}
 
@@ -41,40 +35,47 @@ def create_payment_order(user_id: str, amount: float, purpose: str) -> Dict[str,
         return {"error": str(e)}
 
 
-def verify_payment_signature(provider_order_id: str, provider_payment_id: str, signature: str) -> Dict[str, Any]:
+def settle_payments(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Verify Razorpay signature and on success update payments and credit user's wallet.
+    Mark paid orders as succeeded and credit their wallets in one call to the
+    payments_settle database function. `items` are {"order_id", "payment_id",
+    "signature"} dicts. Returns only the payments that transitioned now, so an
+    order settled by both the webhook and /payments/verify is credited once.
+    """
+    res = supabase_admin.rpc("payments_settle", {"p_items": items}).execute()
+    settled = res.data or []
+    for payment in settled:
+        invalidate_wallet_balance(payment["user_id"])
+    return settled
+
+
+async def verify_payment_signature(provider_order_id: str, provider_payment_id: str, signature: str) -> Dict[str, Any]:
+    """
+    Verify Razorpay signature and on success mark the payment succeeded and
+    credit the user's wallet (both inside payments_settle).
     Uses provider_order_id to find the payment row.
     """
     try:
-        razorpay_client.utility.verify_payment_signature({
-            "razorpay_order_id": provider_order_id,
-            "razorpay_payment_id": provider_payment_id,
-            "razorpay_signature": signature
-        })
+        get_payment_provider().verify_payment_signature(provider_order_id, provider_payment_id, signature)
 
-        # update payment record
-        supabase.table("payments").update({
-            "provider_payment_id": provider_payment_id,
+        settled = await asyncio.to_thread(settle_payments, [{
+            "order_id": provider_order_id,
+            "payment_id": provider_payment_id,
             "signature": signature,
-            "status": "succeeded",
-            "verified_at": datetime.utcnow().isoformat()
-        }).eq("provider_order_id", provider_order_id).execute()
+        }])
+        if settled:
+            return {"success": True, "message": "Payment verified and wallet credited"}
 
-        # fetch payment to credit wallet
-        payment_res = supabase.table("payments").select("*").eq("provider_order_id", provider_order_id).execute()
+        # Nothing transitioned: unknown order, or already settled (e.g. by the webhook)
+        payment_res = await asyncio.to_thread(supabase.table("payments").select("status").eq("provider_order_id", provider_order_id).execute)
         if not payment_res.data:
             return {"error": "Payment record not found after verification"}
+        if payment_res.data[0].get("status") in ("succeeded", "refunded"):
+            return {"success": True, "message": "Payment already verified"}
+        return {"error": f"Payment cannot be verified in status {payment_res.data[0].get('status')}"}
 
-        payment = payment_res.data[0]
-        # credit wallet (top-up)
-        credit_wallet(payment["user_id"], float(payment["amount"]), f"Top-up {payment.get('metadata', {}).get('purpose', '')}")
-
-        # add wallet transaction already handled in credit_wallet
-        return {"success": True, "message": "Payment verified and wallet credited"}
-
-    except razorpay.errors.SignatureVerificationError:
-        supabase.table("payments").update({"status": "failed"}).eq("provider_order_id", provider_order_id).execute()
+    except SignatureVerificationError:
+        await asyncio.to_thread(supabase.table("payments").update({"status": "failed"}).eq("provider_order_id", provider_order_id).execute)
         return {"error": "Invalid payment signature"}
     except Exception as e:
         return {"error": str(e)}
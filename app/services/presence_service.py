@@ -0,0 +1,69 @@
+# app/services/presence_service.py
+"""Who is online, and when users were last seen.
+
+Each worker knows its own sockets (app/core/websocket_manager.py). To
+answer for users connected elsewhere, every worker upserts the last_seen
+of users it saw since the previous run into `user_presence`; a user
+counts as online there while last_seen is within the idle timeout plus
+one sync interval. last_seen moves on inbound traffic only, so a
+listen-only client held by another worker reads as offline once that
+window has passed since it last sent anything.
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.core.settings import settings
+from app.core.websocket_manager import manager
+from app.services.supabase_service import supabase_admin
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+def _online_window() -> float:
+    return settings.WS_IDLE_TIMEOUT + settings.WS_HEARTBEAT_INTERVAL
+
+
+async def heartbeat_sockets() -> Dict[str, int]:
+    """Scheduler job: ping live sockets and reap idle ones."""
+    return manager.heartbeat(settings.WS_IDLE_TIMEOUT)
+
+
+def sync_presence() -> Dict[str, Any]:
+    """Scheduler job: write last_seen of recently active users in one call.
+    presence_touch keeps the newer value, so a worker with older data never
+    moves a user's last_seen backwards."""
+    changes = manager.pop_seen_changes()
+    if not changes:
+        return {"synced": 0}
+    rows = [{"user_id": user_id, "last_seen": _iso(ts)} for user_id, ts in changes.items()]
+    try:
+        supabase_admin.rpc("presence_touch", {"p_rows": rows}).execute()
+        return {"synced": len(rows)}
+    except Exception as e:
+        manager.restore_seen_changes(changes)
+        return {"error": str(e)}
+
+
+def get_presence(user_id: str) -> Dict[str, Any]:
+    local_connections = len(manager.active_connections.get(user_id, {}))
+    last_seen = manager.last_seen(user_id)
+    if local_connections:
+        return {"user_id": user_id, "online": True, "last_seen": _iso(last_seen), "connections": local_connections}
+    try:
+        res = supabase_admin.table("user_presence").select("last_seen").eq("user_id", user_id).limit(1).execute()
+        row = (res.data or [None])[0]
+    except Exception as e:
+        print(f"⚠️ Presence lookup for {user_id} failed: {e}")
+        row = None
+    if row and row.get("last_seen"):
+        stored = datetime.fromisoformat(row["last_seen"].replace("Z", "+00:00"))
+        if stored.tzinfo is None:
+            stored = stored.replace(tzinfo=timezone.utc)
+        last_seen = max(last_seen or 0.0, stored.timestamp())
+    # Workers without a pub/sub backbone still share user_presence.
+    online = bool(last_seen) and time.time() - last_seen <= _online_window()
+    return {"user_id": user_id, "online": online, "last_seen": _iso(last_seen), "connections": 0}
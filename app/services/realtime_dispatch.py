@@ -0,0 +1,224 @@
+# app/services/realtime_dispatch.py
+"""Queued dispatch of Supabase realtime events.
+
+The realtime client invokes callbacks synchronously from its socket
+reader, so the callback here only normalizes the payload and enqueues it.
+N consumer tasks run the registered handlers. Events are sharded by
+(table, row id), so changes to one row are handled in order while
+different rows proceed in parallel. Queues are bounded; when one is full
+the event is dropped and counted.
+
+Per table the dispatcher also tracks a watermark (the newest commit
+timestamp seen), delivery lag (commit -> received), handling lag
+(received -> handlers done) and throughput. The listener uses the
+watermarks to re-read rows missed while the channel was down.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def normalize_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Accept both the current {"data": {"record", ...}} shape and the older
+    {"new", "old", "eventType"} one."""
+    data = payload.get("data")
+    if isinstance(data, dict):
+        return {
+            "table": data.get("table"),
+            "type": str(getattr(data.get("type"), "value", data.get("type")) or "").upper(),
+            "new": data.get("record") or {},
+            "old": data.get("old_record") or {},
+            "commit_timestamp": data.get("commit_timestamp"),
+        }
+    return {
+        "table": payload.get("table"),
+        "type": str(payload.get("eventType") or payload.get("type") or "").upper(),
+        "new": payload.get("new") or {},
+        "old": payload.get("old") or {},
+        "commit_timestamp": payload.get("commit_timestamp"),
+    }
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """ISO timestamp -> aware UTC datetime; naive values are taken as UTC."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace(" ", "T"))
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class TableStats:
+    """Counters for one table. Lags are exponential moving averages in ms."""
+
+    ALPHA = 0.1
+    RATE_WINDOW = 60.0
+
+    def __init__(self) -> None:
+        self.events = 0
+        self.catch_up_events = 0
+        self.handled = 0
+        self.watermark: Optional[datetime] = None
+        self.last_event_at: Optional[float] = None
+        self.delivery_lag_ms = 0.0
+        self.max_delivery_lag_ms = 0.0
+        self.handling_lag_ms = 0.0
+        self.max_handling_lag_ms = 0.0
+        self.events_per_sec = 0.0
+        self._window_start = time.time()
+        self._window_events = 0
+
+    def _ewma(self, current: float, sample: float) -> float:
+        return sample if current == 0.0 else current + self.ALPHA * (sample - current)
+
+    def advance(self, ts: Optional[datetime]) -> None:
+        if ts is not None and (self.watermark is None or ts > self.watermark):
+            self.watermark = ts
+
+    def received(self, event: Dict[str, Any], now: float) -> None:
+        self.last_event_at = now
+        self._window_events += 1
+        if now - self._window_start >= self.RATE_WINDOW:
+            self.events_per_sec = self._window_events / (now - self._window_start)
+            self._window_start, self._window_events = now, 0
+        committed = parse_timestamp(event.get("commit_timestamp"))
+        self.advance(committed)
+        if event.get("catch_up"):
+            self.catch_up_events += 1
+            return
+        self.events += 1
+        if committed is not None:
+            lag = max(0.0, (now - committed.timestamp()) * 1000)
+            self.delivery_lag_ms = self._ewma(self.delivery_lag_ms, lag)
+            self.max_delivery_lag_ms = max(self.max_delivery_lag_ms, lag)
+
+    def done(self, event: Dict[str, Any], now: float) -> None:
+        self.handled += 1
+        if event.get("catch_up"):
+            return
+        lag = (now - event["received_at"]) * 1000
+        self.handling_lag_ms = self._ewma(self.handling_lag_ms, lag)
+        self.max_handling_lag_ms = max(self.max_handling_lag_ms, lag)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "catch_up_events": self.catch_up_events,
+            "handled": self.handled,
+            "events_per_sec": round(self.events_per_sec, 2),
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "seconds_since_last_event": round(time.time() - self.last_event_at, 1) if self.last_event_at else None,
+            "delivery_lag_ms": round(self.delivery_lag_ms, 1),
+            "max_delivery_lag_ms": round(self.max_delivery_lag_ms, 1),
+            "handling_lag_ms": round(self.handling_lag_ms, 1),
+            "max_handling_lag_ms": round(self.max_handling_lag_ms, 1),
+        }
+
+
+class EventDispatcher:
+    def __init__(self, workers: int = 4, queue_size: int = 5000) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self._handlers: Dict[Tuple[str, str], List[Handler]] = {}
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"received": 0, "processed": 0, "failed": 0, "dropped": 0, "unhandled": 0}
+        self.table_stats: Dict[str, TableStats] = {}
+
+    def on(self, table: str, event: str, handler: Handler) -> None:
+        """Run `handler` for `event` ("INSERT", "UPDATE", "DELETE" or "*") on `table`."""
+        self._handlers.setdefault((table, event.upper()), []).append(handler)
+
+    @property
+    def tables(self) -> List[str]:
+        return sorted({table for table, _ in self._handlers})
+
+    def _handlers_for(self, table: str, event: str) -> List[Handler]:
+        return self._handlers.get((table, event), []) + self._handlers.get((table, "*"), [])
+
+    def _table(self, table: str) -> TableStats:
+        stats = self.table_stats.get(table)
+        if stats is None:
+            stats = self.table_stats[table] = TableStats()
+        return stats
+
+    def watermark(self, table: str) -> Optional[datetime]:
+        return self._table(table).watermark
+
+    def advance_watermark(self, table: str, ts: datetime) -> None:
+        self._table(table).advance(ts)
+
+    def submit(self, payload: Dict[str, Any]) -> None:
+        """Realtime callback: never blocks the socket reader."""
+        self.enqueue(normalize_payload(payload))
+
+    def enqueue(self, event: Dict[str, Any]) -> None:
+        """Queue a normalized event (catch-up events carry catch_up=True)."""
+        self.stats["received"] += 1
+        event["received_at"] = time.time()
+        self._table(event["table"]).received(event, event["received_at"])
+        if not self._queues:
+            self.stats["dropped"] += 1
+            return
+        row = event["new"] or event["old"]
+        shard = hash((event["table"], row.get("id"))) % len(self._queues)
+        try:
+            self._queues[shard].put_nowait(event)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+
+    async def _consume(self, queue: asyncio.Queue) -> None:
+        while True:
+            event = await queue.get()
+            try:
+                handlers = self._handlers_for(event["table"], event["type"])
+                if not handlers:
+                    self.stats["unhandled"] += 1
+                for handler in handlers:
+                    try:
+                        await handler(event)
+                    except Exception as e:
+                        self.stats["failed"] += 1
+                        print(f"⚠️ Realtime handler for {event['table']} {event['type']} failed: {e}")
+                self.stats["processed"] += 1
+                self._table(event["table"]).done(event, time.time())
+            finally:
+                queue.task_done()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._consume(q)) for q in self._queues]
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ {sum(q.qsize() for q in self._queues)} realtime events still queued at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": sum(q.qsize() for q in self._queues),
+            **self.stats,
+            "tables": {table: stats.as_dict() for table, stats in sorted(self.table_stats.items())},
+        }
+
+
+# Process-wide dispatcher fed by the realtime listener
+dispatcher = EventDispatcher()
@@ -1,139 +1,356 @@
 # app/services/realtime_listener.py
+"""Supabase realtime feed: handlers per table plus the supervised listener.
+
+After a reconnect, rows changed while the channel was down are re-read by
+their change columns and replayed as catch-up events (payload
+catch_up=True, old={}). Notifications and audit rows are de-duplicated on
+(table, id, status), so a replayed row that was already handled live does
+not notify twice. Known gaps: deleted rows cannot be recovered, so a
+listing deleted during an outage stays in the search index until the next
+rebuild, and status changes of payments that were not settled are only
+seen through verified_at.
+"""
 
 import asyncio
-import importlib
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from realtime import RealtimeSubscribeStates
 from supabase import AsyncClient, create_async_client
 from app.core import settings
-from app.services.admin_service import send_admin_notification, log_admin_action
+from app.core.cache import TTLCache
+from app.services.admin_events import admin_events
+from app.services.availability_service import availability
+from app.services.geo_index import delivery_index
+from app.services.location_ingest import location_ingestor
+from app.services.live_tracking import live_tracker
+from app.services.realtime_dispatch import dispatcher
+from app.services.search_service import listing_index
+from app.services.supabase_service import invalidate_categories_cache, supabase
+from app.services.wallet_service import apply_wallet_event
+from app.utils.pagination import quote_filter_value
 
 
-async def watch_realtime_events():
-    """Async listener that reacts to realtime changes in key tables."""
-    print("🟡 Starting Realtime Listener...")
+# (table, id, status) already notified about; catch-up replays carry no old
+# row, so this is what keeps them from repeating notifications.
+_notified = TTLCache(maxsize=100000, ttl=7 * 24 * 3600.0)
 
-    # Create async client
-    supabase: AsyncClient = await create_async_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
-
-    # Create a realtime channel
-    channel = supabase.channel("server-events")
-
-    # --------------- DELIVERY STATUS WATCHER ---------------
-    async def handle_delivery_update(payload):
-        new_data = payload.get("new", {})
-        old_data = payload.get("old", {})
-        status = new_data.get("status")
-        task_id = new_data.get("id")
-
-        # Case 1: Delivery status changed
-        if status and status != old_data.get("status"):
-            if status in ["picked", "completed"]:
-                await send_admin_notification(
-                    admin_id="system",
-                    title=f"Delivery {status}",
-                    message=f"Delivery task #{task_id} marked as {status}.",
-                )
-                await log_admin_action(
-                    "system",
-                    "delivery_status_update",
-                    "delivery_tasks",
-                    task_id,
-                    f"Status changed to {status}",
-                )
-
-        # Case 2: Live location update
-        lat = new_data.get("current_lat")
-        lng = new_data.get("current_lng")
-        if lat and lng and (
-            lat != old_data.get("current_lat") or lng != old_data.get("current_lng")
-        ):
-            print(f"📍 Live update — Task #{task_id}: ({lat}, {lng})")
-
-            # Fetch both users involved
-            renter_id = new_data.get("renter_id")
-            owner_id = new_data.get("owner_id")
-            # Broadcast to both users
-            manager = None
-            try:
-                websocket_module = importlib.import_module("app.core.websocket_manager")
-                manager = getattr(websocket_module, "manager", None)
-            except Exception:
-                manager = None
-
-            update_message = {
-                "type": "delivery_update",
-                "task_id": task_id,
-                "lat": lat,
-                "lng": lng,
-                "status": new_data.get("status"),
-            }
-
-            # Send updates
-            if manager:
-                if renter_id:
-                    await manager.send_to_user(renter_id, update_message)
-                if owner_id:
-                    await manager.send_to_user(owner_id, update_message)
-            else:
-                print("⚠️ WebSocket manager not available; skipping realtime user updates.")
 
-    channel.on_postgres_changes(
-        event="UPDATE",
-        schema="public",
-        table="delivery_tasks",
-        callback=handle_delivery_update,
-    )
+def _first_notice(table: str, row_id: Any, status: Any) -> bool:
+    key = (table, row_id, status)
+    if _notified.get(key):
+        return False
+    _notified.set(key, True)
+    return True
 
-    # --------------- REPORT WATCHER ---------------
-    async def handle_new_report(payload):
-        report = payload.get("new", {})
-        await send_admin_notification(
-            admin_id="system",
-            title="New Report Filed",
-            message=f"Issue type: {report.get('issue_type')} for listing #{report.get('listing_id')}",
-        )
-        await log_admin_action(
-            "system",
-            "new_report",
-            "reports",
-            report.get("id"),
-            "Auto-logged on report submission",
-        )
 
-    channel.on_postgres_changes(
-        event="INSERT",
-        schema="public",
-        table="reports",
-        callback=handle_new_report,
-    )
+# --------------- DELIVERY STATUS WATCHER ---------------
+async def handle_delivery_update(payload):
+    new_data = payload.get("new", {})
+    old_data = payload.get("old", {})
+    status = new_data.get("status")
+    task_id = new_data.get("id")
+    location_ingestor.apply_task(new_data)
+    if live_tracker.is_stale(task_id, new_data.get("location_seq")):
+        # A newer ping is already indexed; keep its position.
+        delivery_index.apply_task({k: v for k, v in new_data.items() if k not in ("current_lat", "current_lng", "last_update")})
+    else:
+        delivery_index.apply_task(new_data)
 
-    # --------------- PAYMENT WATCHER ---------------
-    async def handle_payment_update(payload):
-        payment = payload.get("new", {})
-        if payment.get("status") == "succeeded":
-            await send_admin_notification(
+    # Case 1: Delivery status changed
+    if status and status != old_data.get("status"):
+        if status in ["picked", "completed"] and _first_notice("delivery_tasks", task_id, status):
+            admin_events.notify(
                 admin_id="system",
-                title="Payment Success",
-                message=f"User {payment.get('user_id')} paid ₹{payment.get('amount')} successfully.",
+                title=f"Delivery {status}",
+                message=f"Delivery task #{task_id} marked as {status}.",
             )
-            await log_admin_action(
+            admin_events.log(
                 "system",
-                "payment_success",
-                "payments",
-                payment.get("id"),
-                "Payment confirmed",
+                "delivery_status_update",
+                "delivery_tasks",
+                task_id,
+                f"Status changed to {status}",
             )
 
-    channel.on_postgres_changes(
-        event="UPDATE",
-        schema="public",
-        table="payments",
-        callback=handle_payment_update,
+    # Case 2: Live location update. Pings are already pushed in-process
+    # by the instance that accepted them; this path covers users
+    # connected elsewhere and is de-duplicated by location_seq.
+    lat = new_data.get("current_lat")
+    lng = new_data.get("current_lng")
+    if lat and lng and (
+        lat != old_data.get("current_lat") or lng != old_data.get("current_lng")
+    ):
+        await live_tracker.publish_from_realtime(
+            task_id,
+            new_data.get("owner_id"),
+            new_data.get("renter_id"),
+            lat,
+            lng,
+            new_data.get("status"),
+            new_data.get("location_seq"),
+        )
+
+
+async def handle_delivery_insert(payload):
+    delivery_index.apply_task(payload.get("new", {}))
+
+
+# --------------- REPORT WATCHER ---------------
+async def handle_new_report(payload):
+    report = payload.get("new", {})
+    if not _first_notice("reports", report.get("id"), None):
+        return
+    admin_events.notify(
+        admin_id="system",
+        title="New Report Filed",
+        message=f"Issue type: {report.get('issue_type')} for listing #{report.get('listing_id')}",
+    )
+    admin_events.log(
+        "system",
+        "new_report",
+        "reports",
+        report.get("id"),
+        "Auto-logged on report submission",
     )
 
-    # Subscribe to all
-    await channel.subscribe()
-    print("✅ Subscribed to realtime: delivery_tasks, reports, payments")
 
-    # Keep listener alive
+# --------------- PAYMENT WATCHER ---------------
+async def handle_payment_update(payload):
+    payment = payload.get("new", {})
+    if (
+        payment.get("status") == "succeeded"
+        and payload.get("old", {}).get("status") != "succeeded"
+        and _first_notice("payments", payment.get("id"), "succeeded")
+    ):
+        admin_events.notify(
+            admin_id="system",
+            title="Payment Success",
+            message=f"User {payment.get('user_id')} paid ₹{payment.get('amount')} successfully.",
+        )
+        admin_events.log(
+            "system",
+            "payment_success",
+            "payments",
+            payment.get("id"),
+            "Payment confirmed",
+        )
+
+
+# --------------- LISTING SEARCH INDEX ---------------
+async def handle_listing_upsert(payload):
+    listing = payload.get("new", {})
+    if listing.get("id") is not None:
+        listing_index.upsert(listing)
+
+
+async def handle_listing_delete(payload):
+    listing = payload.get("old", {})
+    if listing.get("id") is not None:
+        listing_index.remove(listing["id"])
+
+
+# --------------- BOOKING AVAILABILITY ---------------
+async def handle_booking_change(payload):
+    booking = payload.get("new", {})
+    if booking.get("id") is not None:
+        availability.apply_booking(booking)
+
+
+# --------------- WALLET BALANCE CACHE ---------------
+async def handle_wallet_change(payload):
+    apply_wallet_event(payload.get("new", {}))
+
+
+# --------------- CATEGORIES CACHE ---------------
+async def handle_category_change(payload):
+    invalidate_categories_cache()
+
+
+def register_handlers():
+    """Route realtime events to their handlers (idempotent)."""
+    if dispatcher.tables:
+        return
+    dispatcher.on("delivery_tasks", "UPDATE", handle_delivery_update)
+    dispatcher.on("delivery_tasks", "INSERT", handle_delivery_insert)
+    dispatcher.on("reports", "INSERT", handle_new_report)
+    dispatcher.on("payments", "UPDATE", handle_payment_update)
+    dispatcher.on("listings", "INSERT", handle_listing_upsert)
+    dispatcher.on("listings", "UPDATE", handle_listing_upsert)
+    dispatcher.on("listings", "DELETE", handle_listing_delete)
+    dispatcher.on("bookings", "INSERT", handle_booking_change)
+    dispatcher.on("bookings", "UPDATE", handle_booking_change)
+    dispatcher.on("wallets", "INSERT", handle_wallet_change)
+    dispatcher.on("wallets", "UPDATE", handle_wallet_change)
+    dispatcher.on("categories", "*", handle_category_change)
+
+
+# --------------- CATCH-UP AFTER RECONNECTS ---------------
+# Per table: the columns that move when a row changes, and the event type
+# missed rows are replayed as. Tables missing here (categories) get one
+# synthetic event so their handlers refresh wholesale. Deletes cannot be
+# recovered this way (see the module docstring).
+CATCH_UP: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "delivery_tasks": (("last_status_update", "last_update"), "UPDATE"),
+    "bookings": (("updated_at",), "UPDATE"),
+    "listings": (("updated_at",), "UPDATE"),
+    "payments": (("verified_at",), "UPDATE"),
+    "reports": (("created_at",), "INSERT"),
+    "wallets": (("last_updated",), "UPDATE"),
+}
+CATCH_UP_PAGE = 500
+CATCH_UP_MAX_ROWS = 5000
+# Commit timestamps come from the database clock, row columns mostly from ours.
+CATCH_UP_MARGIN = timedelta(seconds=5)
+HEALTH_INTERVAL = 10
+# Failed health checks tolerated while the client rejoins on its own.
+UNHEALTHY_LIMIT = 3
+MAX_BACKOFF = 60.0
+
+listener_stats: Dict[str, Any] = {
+    "connected": False,
+    "sessions": 0,
+    "reconnects": 0,
+    "catch_ups": 0,
+    "catch_up_rows": 0,
+    "last_subscribed_at": None,
+    "last_error": None,
+}
+
+
+def _read_changed_rows(table: str, columns: Tuple[str, ...], since: datetime) -> List[Dict[str, Any]]:
+    stamp = since.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+    rows: List[Dict[str, Any]] = []
+    while len(rows) < CATCH_UP_MAX_ROWS:
+        query = supabase.table(table).select("*")
+        if len(columns) == 1:
+            query = query.gt(columns[0], stamp)
+        else:
+            query = query.or_(",".join(f"{column}.gt.{quote_filter_value(stamp)}" for column in columns))
+        page = query.order("id").range(len(rows), len(rows) + CATCH_UP_PAGE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < CATCH_UP_PAGE:
+            break
+    else:
+        print(f"⚠️ Realtime catch-up for {table} stopped at {CATCH_UP_MAX_ROWS} rows")
+    return rows
+
+
+async def catch_up(subscribed_at: datetime) -> int:
+    """Replay rows changed since each table's watermark through the dispatcher."""
+    replayed = 0
+    first = listener_stats["catch_ups"] == 0
+    for table in dispatcher.tables:
+        since = dispatcher.watermark(table)
+        if first or since is None:
+            # First subscription: in-memory state was just loaded from the database.
+            dispatcher.advance_watermark(table, subscribed_at)
+            continue
+        spec = CATCH_UP.get(table)
+        if spec is None:
+            dispatcher.enqueue({"table": table, "type": "UPDATE", "new": {}, "old": {}, "commit_timestamp": None, "catch_up": True})
+            dispatcher.advance_watermark(table, subscribed_at)
+            continue
+        columns, event_type = spec
+        try:
+            rows = await asyncio.to_thread(_read_changed_rows, table, columns, since - CATCH_UP_MARGIN)
+        except Exception as e:
+            print(f"⚠️ Realtime catch-up for {table} failed: {e}")
+            continue
+        for row in rows:
+            changed_at = max((row[c] for c in columns if row.get(c)), default=None)
+            dispatcher.enqueue({"table": table, "type": event_type, "new": row, "old": {}, "commit_timestamp": changed_at, "catch_up": True})
+        dispatcher.advance_watermark(table, subscribed_at)
+        replayed += len(rows)
+    listener_stats["catch_ups"] += 1
+    listener_stats["catch_up_rows"] += replayed
+    return replayed
+
+
+async def _on_subscribed() -> None:
+    subscribed_at = datetime.now(timezone.utc)
+    listener_stats["connected"] = True
+    listener_stats["last_subscribed_at"] = subscribed_at.isoformat()
+    replayed = await catch_up(subscribed_at)
+    print(f"✅ Subscribed to realtime: {', '.join(dispatcher.tables)} ({replayed} rows caught up)")
+
+
+async def _run_session() -> None:
+    """One client + channel; returns only by raising when the feed is lost."""
+    supabase_async: AsyncClient = await create_async_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
+    listener_stats["sessions"] += 1
+
+    # Create a realtime channel; callbacks only enqueue, handlers run on the dispatcher
+    channel = supabase_async.channel("server-events")
+    for table in dispatcher.tables:
+        channel.on_postgres_changes(
+            event="*",
+            schema="public",
+            table=table,
+            callback=dispatcher.submit,
+        )
+
+    status_changes: asyncio.Queue = asyncio.Queue()
+
+    def on_status(status: RealtimeSubscribeStates, error: Optional[Exception] = None) -> None:
+        status_changes.put_nowait((status, error))
+
+    joined = False
+    unhealthy = 0
+    try:
+        await channel.subscribe(on_status)
+        while True:
+            try:
+                status, error = await asyncio.wait_for(status_changes.get(), HEALTH_INTERVAL)
+            except asyncio.TimeoutError:
+                # The client rejoins by itself after short drops; anything it
+                # missed meanwhile is caught up once it is joined again.
+                if supabase_async.realtime.is_connected and channel.is_joined:
+                    unhealthy = 0
+                    if not joined:
+                        joined = True
+                        await _on_subscribed()
+                    continue
+                joined = False
+                listener_stats["connected"] = False
+                unhealthy += 1
+                if unhealthy >= UNHEALTHY_LIMIT:
+                    raise ConnectionError("realtime channel not joined")
+                continue
+            if status == RealtimeSubscribeStates.SUBSCRIBED:
+                unhealthy = 0
+                joined = True
+                await _on_subscribed()
+            else:
+                raise ConnectionError(f"realtime channel {status.value}: {error}")
+    finally:
+        listener_stats["connected"] = False
+        try:
+            await supabase_async.realtime.close()
+        except Exception:
+            pass
+
+
+async def watch_realtime_events():
+    """Keep the realtime feed alive: reconnect with backoff and catch up on gaps."""
+    print("🟡 Starting Realtime Listener...")
+    register_handlers()
+    delay = 1.0
     while True:
-        await asyncio.sleep(30)
+        subscriptions = listener_stats["catch_ups"]
+        try:
+            await _run_session()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            listener_stats["last_error"] = repr(e)
+            print(f"⚠️ Realtime listener disconnected: {e!r}")
+        if listener_stats["catch_ups"] > subscriptions:
+            delay = 1.0  # the session got subscribed; start backing off afresh
+        listener_stats["reconnects"] += 1
+        await asyncio.sleep(delay + random.uniform(0, delay))
+        delay = min(delay * 2, MAX_BACKOFF)
+
+
+def realtime_metrics() -> Dict[str, Any]:
+    return {"listener": dict(listener_stats), "dispatcher": dispatcher.metrics()}
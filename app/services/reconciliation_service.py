@@ -0,0 +1,226 @@
+# app/services/reconciliation_service.py
+"""Ledger reconciliation for wallets, wallet_transactions and payments.
+
+Checks that
+  * every wallets.balance equals the user's credits minus debits,
+  * every succeeded payment produced exactly one wallet credit.
+
+Tables are pulled in keyset pages straight into column lists, and all the
+per-user / per-payment grouping is done with NumPy (np.unique + bincount),
+so a million ledger rows reconcile in seconds.
+
+CLI:
+    python -m app.services.reconciliation_service --output report.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.supabase_service import supabase
+
+PAGE_SIZE = 1000
+BALANCE_TOLERANCE = 0.005
+PAYMENT_REFERENCE_PREFIX = "payment:"
+# Credits written by verify_payment_signature before references existed.
+LEGACY_TOPUP_PREFIX = "Top-up"
+
+
+def payment_reference(payment_id: Any) -> str:
+    """Ledger reference stored on the wallet credit for a payments row."""
+    return f"{PAYMENT_REFERENCE_PREFIX}{payment_id}"
+
+
+def _fetch_columns(table: str, columns: Sequence[str], page_size: int = PAGE_SIZE, filters: Optional[Dict[str, Any]] = None) -> Dict[str, list]:
+    """Page through `table` ordered by id and collect each column into a list."""
+    out: Dict[str, list] = {c: [] for c in columns}
+    select = ", ".join(dict.fromkeys(["id", *columns]))
+    last_id = None
+    while True:
+        query = supabase.table(table).select(select)
+        for column, value in (filters or {}).items():
+            query = query.eq(column, value)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.order("id").limit(page_size).execute().data or []
+        for column in columns:
+            out[column].extend(row.get(column) for row in rows)
+        if len(rows) < page_size:
+            return out
+        last_id = rows[-1]["id"]
+
+
+def load_ledger(page_size: int = PAGE_SIZE) -> Dict[str, Dict[str, list]]:
+    return {
+        "wallets": _fetch_columns("wallets", ["user_id", "balance"], page_size),
+        "transactions": _fetch_columns("wallet_transactions", ["user_id", "type", "amount", "reference", "description"], page_size),
+        "payments": _fetch_columns("payments", ["id", "user_id", "amount", "provider_order_id"], page_size, {"status": "succeeded"}),
+    }
+
+
+def _str_array(values: list) -> np.ndarray:
+    # Fixed-width unicode arrays sort and compare in C, unlike object arrays.
+    return np.array(["" if v is None else str(v) for v in values], dtype=str)
+
+
+def _float_array(values: list) -> np.ndarray:
+    return np.array([0.0 if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def _cents(amounts: np.ndarray) -> np.ndarray:
+    return np.round(amounts * 100).astype(np.int64)
+
+
+def _counts_for(keys: np.ndarray, population: np.ndarray) -> np.ndarray:
+    """How many times each entry of `keys` occurs in `population`."""
+    if len(population) == 0 or len(keys) == 0:
+        return np.zeros(len(keys), dtype=np.int64)
+    uniq, counts = np.unique(population, return_counts=True)
+    idx = np.searchsorted(uniq, keys)
+    idx_clipped = np.minimum(idx, len(uniq) - 1)
+    return np.where(uniq[idx_clipped] == keys, counts[idx_clipped], 0)
+
+
+def reconcile(wallets: Dict[str, list], transactions: Dict[str, list], payments: Dict[str, list], tolerance: float = BALANCE_TOLERANCE) -> Dict[str, Any]:
+    """Compute drift, missing credits and duplicate credits from column lists."""
+    started = time.perf_counter()
+
+    w_user = _str_array(wallets["user_id"])
+    w_balance = _float_array(wallets["balance"])
+    t_user = _str_array(transactions["user_id"])
+    t_type = _str_array(transactions["type"])
+    t_amount = _float_array(transactions["amount"])
+    t_ref = _str_array(transactions["reference"])
+    t_desc = _str_array(transactions["description"])
+    p_id = _str_array(payments["id"])
+    p_user = _str_array(payments["user_id"])
+    p_amount = _float_array(payments["amount"])
+    p_order = _str_array(payments["provider_order_id"])
+
+    # ---- balance drift: wallets.balance vs sum(credits) - sum(debits) ----
+    users, codes = np.unique(np.concatenate([w_user, t_user]), return_inverse=True)
+    w_codes, t_codes = codes[: len(w_user)], codes[len(w_user):]
+    is_credit = t_type == "credit"
+    ledger = np.bincount(t_codes, weights=np.where(is_credit, t_amount, -t_amount), minlength=len(users))
+    balance = np.zeros(len(users))
+    np.add.at(balance, w_codes, w_balance)
+    diff = balance - ledger
+    drift_idx = np.flatnonzero(np.abs(diff) > tolerance)
+    drift = [
+        {
+            "user_id": str(users[i]),
+            "wallet_balance": round(float(balance[i]), 2),
+            "ledger_balance": round(float(ledger[i]), 2),
+            "difference": round(float(diff[i]), 2),
+        }
+        for i in drift_idx
+    ]
+
+    # ---- payment credits matched by reference ----
+    credit_refs = t_ref[is_credit & (t_ref != "")]
+    p_refs = np.char.add(PAYMENT_REFERENCE_PREFIX, p_id)
+    ref_counts = _counts_for(p_refs, credit_refs)
+
+    duplicate_credits = [
+        {
+            "payment_id": str(p_id[i]),
+            "user_id": str(p_user[i]),
+            "amount": float(p_amount[i]),
+            "reference": str(p_refs[i]),
+            "credit_count": int(ref_counts[i]),
+        }
+        for i in np.flatnonzero(ref_counts > 1)
+    ]
+
+    # ---- payments without a referenced credit: fall back to legacy top-ups ----
+    # Legacy credits carry no reference, so match them to payments by
+    # (user, amount in cents) and only flag the shortfall per key.
+    unref = np.flatnonzero(ref_counts == 0)
+    legacy_mask = is_credit & (t_ref == "") & np.char.startswith(t_desc, LEGACY_TOPUP_PREFIX)
+    legacy_keys = np.char.add(np.char.add(t_user[legacy_mask], "|"), _cents(t_amount[legacy_mask]).astype(str))
+    unref_keys = np.char.add(np.char.add(p_user[unref], "|"), _cents(p_amount[unref]).astype(str))
+
+    missing_credits: List[Dict[str, Any]] = []
+    if len(unref):
+        order = np.argsort(unref_keys, kind="stable")
+        sorted_keys = unref_keys[order]
+        group_start = np.r_[0, np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1]
+        group_sizes = np.diff(np.r_[group_start, len(sorted_keys)])
+        rank = np.arange(len(sorted_keys)) - np.repeat(group_start, group_sizes)
+        available = _counts_for(sorted_keys, legacy_keys)
+        for i in order[rank >= available]:
+            p = unref[i]
+            missing_credits.append({
+                "payment_id": str(p_id[p]),
+                "user_id": str(p_user[p]),
+                "amount": float(p_amount[p]),
+                "provider_order_id": str(p_order[p]) or None,
+            })
+
+    # More legacy top-ups than unreferenced payments for a key: extra credits.
+    legacy_uniq, legacy_counts = np.unique(legacy_keys, return_counts=True) if len(legacy_keys) else (np.array([], dtype=str), np.array([], dtype=np.int64))
+    orphan = legacy_counts - _counts_for(legacy_uniq, unref_keys)
+    for key, extra in zip(legacy_uniq[orphan > 0], orphan[orphan > 0]):
+        user_id, cents = str(key).rsplit("|", 1)
+        duplicate_credits.append({
+            "payment_id": None,
+            "user_id": user_id,
+            "amount": int(cents) / 100,
+            "reference": None,
+            "credit_count": int(extra),
+        })
+
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "summary": {
+            "wallets": int(len(w_user)),
+            "ledger_rows": int(len(t_user)),
+            "succeeded_payments": int(len(p_id)),
+            "drift_count": len(drift),
+            "missing_credit_count": len(missing_credits),
+            "duplicate_credit_count": len(duplicate_credits),
+            "elapsed_s": round(time.perf_counter() - started, 3),
+        },
+        "drift": drift,
+        "missing_credits": missing_credits,
+        "duplicate_credits": duplicate_credits,
+    }
+
+
+def run_reconciliation(page_size: int = PAGE_SIZE) -> Dict[str, Any]:
+    try:
+        started = time.perf_counter()
+        ledger = load_ledger(page_size)
+        report = reconcile(ledger["wallets"], ledger["transactions"], ledger["payments"])
+        report["summary"]["total_elapsed_s"] = round(time.perf_counter() - started, 3)
+        return report
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reconcile wallets, wallet_transactions and payments.")
+    parser.add_argument("--output", "-o", help="write the JSON report here instead of stdout")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args(argv)
+
+    report = run_reconciliation(args.page_size)
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if report.get("error"):
+        return 2
+    summary = report["summary"]
+    return 1 if summary["drift_count"] or summary["missing_credit_count"] or summary["duplicate_credit_count"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# app/services/search_service.py
+"""In-memory full-text index over listings.
+
+Built at startup from the listings table (retried with backoff until it
+succeeds), then kept current by the listing service (local writes) and the
+realtime listener (writes from other instances). Changes that land while a
+build is reading the table are replayed after the swap. Queries never touch
+Supabase.
+"""
+
+import asyncio
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.services.supabase_service import supabase
+from app.utils.pagination import apply_keyset, page_result
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "the", "to", "with",
+}
+# Title terms count this many times, so a title match outranks a description match.
+TITLE_WEIGHT = 2
+PRICE_BUCKETS = [(0, 100), (100, 500), (500, 1000), (1000, None)]
+# Listing columns kept in memory and returned with each hit.
+RESULT_FIELDS = ("id", "title", "price_per_day", "category_id", "owner_id", "image_url", "created_at")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _price(row: Dict[str, Any]) -> float:
+    return float(row.get("price_per_day") or row.get("price") or 0)
+
+
+class ListingSearchIndex:
+    """Inverted index with BM25 ranking and category/price facets."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[Any, int]] = {}
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        # Changes seen while a rebuild is reading the table, replayed after
+        # the swap so the snapshot can't undo them: id -> row, or None for removal.
+        self._changes_during_build: Optional[Dict[Any, Optional[Dict[str, Any]]]] = None
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        listing_id = row.get("id")
+        if listing_id is None:
+            return
+        with self._lock:
+            if self._changes_during_build is not None:
+                self._changes_during_build[listing_id] = row
+            self._upsert_locked(listing_id, row)
+
+    def _upsert_locked(self, listing_id: Any, row: Dict[str, Any]) -> None:
+        terms = Counter(tokenize(row.get("title")) * TITLE_WEIGHT + tokenize(row.get("description")))
+        self._remove_locked(listing_id)
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[listing_id] = tf
+        length = sum(terms.values())
+        self._docs[listing_id] = {
+            "terms": tuple(terms),
+            "length": length,
+            "category_id": row.get("category_id"),
+            "price": _price(row),
+            "row": {k: row.get(k) for k in RESULT_FIELDS},
+        }
+        self._total_length += length
+
+    def remove(self, listing_id: Any) -> None:
+        with self._lock:
+            if self._changes_during_build is not None:
+                self._changes_during_build[listing_id] = None
+            self._remove_locked(listing_id)
+
+    def _remove_locked(self, listing_id: Any) -> None:
+        doc = self._docs.pop(listing_id, None)
+        if not doc:
+            return
+        self._total_length -= doc["length"]
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(listing_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def begin_rebuild(self) -> None:
+        """Start recording upserts/removes; call before reading the table."""
+        with self._lock:
+            self._changes_during_build = {}
+
+    def abort_rebuild(self) -> None:
+        with self._lock:
+            self._changes_during_build = None
+
+    def replace_all(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Swap in a table snapshot, then re-apply changes recorded since begin_rebuild."""
+        with self._lock:
+            changes = self._changes_during_build or {}
+            self._changes_during_build = None
+            self._postings.clear()
+            self._docs.clear()
+            self._total_length = 0
+            for row in rows:
+                if row.get("id") is not None:
+                    self._upsert_locked(row["id"], row)
+            for listing_id, row in changes.items():
+                if row is None:
+                    self._remove_locked(listing_id)
+                else:
+                    self._upsert_locked(listing_id, row)
+            self.ready = True
+
+    def _matches_filters(self, doc, category_id, min_price, max_price) -> bool:
+        if category_id is not None and doc["category_id"] != category_id:
+            return False
+        if min_price is not None and doc["price"] < min_price:
+            return False
+        if max_price is not None and doc["price"] > max_price:
+            return False
+        return True
+
+    def search(
+        self,
+        q: str = "",
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        terms = list(dict.fromkeys(tokenize(q)))
+        with self._lock:
+            n_docs = len(self._docs)
+            avg_len = (self._total_length / n_docs) if n_docs else 0.0
+            scores: Dict[Any, float] = {}
+
+            if terms:
+                for term in terms:
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for listing_id, tf in postings.items():
+                        doc = self._docs[listing_id]
+                        norm = self.k1 * (1 - self.b + self.b * doc["length"] / (avg_len or 1))
+                        scores[listing_id] = scores.get(listing_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                candidates = scores.keys()
+            else:
+                # No text query: browse by facets, newest ids first.
+                candidates = self._docs.keys()
+
+            matched = [i for i in candidates if self._matches_filters(self._docs[i], category_id, min_price, max_price)]
+            if terms:
+                ranked = heapq.nlargest(offset + limit, matched, key=lambda i: scores[i])
+            else:
+                ranked = heapq.nlargest(offset + limit, matched, key=lambda i: (self._docs[i]["row"].get("created_at") or "", str(i)))
+
+            categories: Counter = Counter()
+            prices: Counter = Counter()
+            for listing_id in matched:
+                doc = self._docs[listing_id]
+                categories[doc["category_id"]] += 1
+                for low, high in PRICE_BUCKETS:
+                    if doc["price"] >= low and (high is None or doc["price"] < high):
+                        prices[f"{low}-{high}" if high is not None else f"{low}+"] += 1
+                        break
+
+            results = []
+            for listing_id in ranked[offset:]:
+                hit = dict(self._docs[listing_id]["row"])
+                if terms:
+                    hit["score"] = round(scores[listing_id], 4)
+                results.append(hit)
+
+        return {
+            "results": results,
+            "total": len(matched),
+            "facets": {
+                "category_id": [{"value": k, "count": v} for k, v in categories.most_common()],
+                "price_per_day": [{"range": k, "count": v} for k, v in prices.items()],
+            },
+        }
+
+
+# Process-wide index used by routes and the realtime listener
+listing_index = ListingSearchIndex()
+
+
+def build_search_index(page_size: int = 1000) -> Dict[str, Any]:
+    """Load every listing into the index, one keyset page at a time."""
+    listing_index.begin_rebuild()
+    try:
+        rows: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            query = supabase.table("listings").select("id, title, description, price_per_day, price, category_id, owner_id, image_url, created_at")
+            res = apply_keyset(query, cursor).limit(page_size + 1).execute()
+            page = page_result(res.data or [], page_size)
+            rows.extend(page["items"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+        listing_index.replace_all(rows)
+        print(f"🔎 Search index built: {len(listing_index)} listings")
+        return {"indexed": len(listing_index)}
+    except Exception as e:
+        listing_index.abort_rebuild()
+        print(f"⚠️ Failed to build search index: {e}")
+        return {"error": str(e)}
+
+
+async def build_search_index_with_retry(max_delay: float = 60.0) -> Dict[str, Any]:
+    """Startup task: retry build_search_index with exponential backoff until it
+    succeeds, so a Supabase hiccup at boot doesn't leave search down for good."""
+    delay = 1.0
+    while True:
+        result = await asyncio.to_thread(build_search_index)
+        if not result.get("error"):
+            return result
+        print(f"🔁 Retrying search index build in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def search_listings(q: str = "", category_id: Optional[int] = None, min_price: Optional[float] = None, max_price: Optional[float] = None, limit: int = 20, offset: int = 0):
+    if not listing_index.ready:
+        return {"error": "Search index is still building, try again shortly"}
+    return listing_index.search(q, category_id, min_price, max_price, max(1, min(limit, 100)), max(0, offset))
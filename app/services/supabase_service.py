@@ -1,11 +1,29 @@
 # app/services/supabase_service.py
 
+import hashlib
+import json
+
 from supabase import create_client, Client
 from app.core import settings
+from app.core.cache import TTLCache
 
 # Create Supabase client
 supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
 
+# Service-role client for the money-moving database functions, whose EXECUTE
+# is revoked from anon/authenticated so they can't be called through PostgREST.
+if settings.SUPABASE_SERVICE_ROLE_KEY:
+    supabase_admin: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+else:
+    print("⚠️ SUPABASE_SERVICE_ROLE_KEY is not set; privileged database functions will be refused")
+    supabase_admin = supabase
+
+# Categories almost never change: keep the serialized response for a while and
+# drop it explicitly when the table changes (see realtime_listener).
+CATEGORIES_CACHE_TTL = 600.0
+_categories_cache = TTLCache(maxsize=1, ttl=CATEGORIES_CACHE_TTL)
+
+
 def get_all_categories():
     """
     Fetch all categories from the 'categories' table.
@@ -13,8 +31,29 @@ def get_all_categories():
     """
     try:
         response = supabase.table("categories").select("*").execute()
-        # Print response for debugging
-        print("Supabase Response:", response)
         return response.data if response.data else {"message": "No categories found"}
     except Exception as e:
         return {"error": str(e)}
+
+
+def get_categories_response():
+    """
+    Return (body, etag) for GET /categories, serialized once and cached.
+    Errors are returned as (dict, None) and never cached.
+    """
+    cached = _categories_cache.get("categories")
+    if cached is not None:
+        return cached
+
+    data = get_all_categories()
+    if isinstance(data, dict) and data.get("error"):
+        return data, None
+
+    body = json.dumps({"categories": data}, separators=(",", ":"), default=str).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    _categories_cache.set("categories", (body, etag))
+    return body, etag
+
+
+def invalidate_categories_cache():
+    _categories_cache.clear()
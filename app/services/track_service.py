@@ -0,0 +1,243 @@
+# app/services/track_service.py
+"""Location history of delivery tasks.
+
+Accepted pings are appended to per-task array('d') buffers (24 bytes per
+point instead of a dict per ping). A scheduled job simplifies each
+buffer with Douglas-Peucker and writes it to delivery_track_segments as
+a Google-encoded polyline, so a long delivery is stored, and read back,
+as a few short strings. The last persisted point stays in the buffer and
+starts the next segment, so the route has no gaps.
+"""
+
+import math
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.supabase_service import supabase_admin
+
+EARTH_RADIUS_M = 6371000.0
+SIMPLIFY_TOLERANCE_M = 10.0
+IDLE_EVICT_SECONDS = 3600.0
+
+
+# ---------- trajectory helpers ----------
+
+def simplify_track(lats: np.ndarray, lngs: np.ndarray, tolerance_m: float = SIMPLIFY_TOLERANCE_M) -> np.ndarray:
+    """Indices of the points Douglas-Peucker keeps (first and last always)."""
+    n = len(lats)
+    if n < 3:
+        return np.arange(n)
+    # Local equirectangular projection: plenty accurate at city scale.
+    cos_lat = math.cos(math.radians(float(np.mean(lats))))
+    x = np.radians(lngs) * cos_lat * EARTH_RADIUS_M
+    y = np.radians(lats) * EARTH_RADIUS_M
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        seg2 = dx * dx + dy * dy
+        if seg2 == 0:
+            dist = np.hypot(px, py)
+        else:
+            t = np.clip((px * dx + py * dy) / seg2, 0.0, 1.0)
+            dist = np.hypot(px - t * dx, py - t * dy)
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def encode_polyline(points: Sequence[Tuple[float, float]], precision: int = 5) -> str:
+    """Google encoded polyline of (lat, lng) points."""
+    factor = 10 ** precision
+    out: List[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = int(round(lat * factor)), int(round(lng * factor))
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(out)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    factor = 10 ** precision
+    points: List[Tuple[float, float]] = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+
+# ---------- buffers ----------
+
+class TrackBuffer:
+    __slots__ = ("lats", "lngs", "times", "persisted", "last_seen")
+
+    def __init__(self) -> None:
+        self.lats = array("d")
+        self.lngs = array("d")
+        self.times = array("d")
+        # Leading points already written (only the joint point, after a flush).
+        self.persisted = 0
+        self.last_seen = time.time()
+
+    def append(self, lat: float, lng: float, ts: float) -> None:
+        if self.lats and self.lats[-1] == lat and self.lngs[-1] == lng:
+            self.last_seen = ts
+            return
+        self.lats.append(lat)
+        self.lngs.append(lng)
+        self.times.append(ts)
+        self.last_seen = ts
+
+    def has_new_points(self) -> bool:
+        return len(self.lats) > self.persisted
+
+
+class TrackStore:
+    def __init__(self, tolerance_m: float = SIMPLIFY_TOLERANCE_M) -> None:
+        self.tolerance_m = tolerance_m
+        self._buffers: Dict[Any, TrackBuffer] = {}
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+
+    def record(self, task_id: Any, lat: float, lng: float, ts: Optional[float] = None) -> None:
+        with self._lock:
+            buf = self._buffers.get(task_id)
+            if buf is None:
+                buf = self._buffers[task_id] = TrackBuffer()
+            buf.append(float(lat), float(lng), ts if ts is not None else time.time())
+
+    def _segment(self, task_id: Any, buf: TrackBuffer) -> Dict[str, Any]:
+        lats = np.frombuffer(buf.lats, dtype=np.float64)
+        lngs = np.frombuffer(buf.lngs, dtype=np.float64)
+        keep = simplify_track(lats, lngs, self.tolerance_m)
+        return {
+            "task_id": task_id,
+            "polyline": encode_polyline(zip(lats[keep].tolist(), lngs[keep].tolist())),
+            "point_count": int(len(keep)),
+            "raw_point_count": len(lats),
+            "started_at": datetime.utcfromtimestamp(buf.times[0]).isoformat(),
+            "ended_at": datetime.utcfromtimestamp(buf.times[-1]).isoformat(),
+        }
+
+    def persist(self) -> Dict[str, Any]:
+        """Write one simplified segment per task with new points, in one insert."""
+        with self._persist_lock:
+            with self._lock:
+                snapshot = {
+                    task_id: (buf, len(buf.lats))
+                    for task_id, buf in self._buffers.items()
+                    if buf.has_new_points()
+                }
+                # Copy the points so pings can keep arriving during the insert.
+                frozen = {}
+                for task_id, (buf, n) in snapshot.items():
+                    copy = TrackBuffer()
+                    copy.lats, copy.lngs, copy.times = buf.lats[:n], buf.lngs[:n], buf.times[:n]
+                    frozen[task_id] = copy
+            if not frozen:
+                self._evict_idle()
+                return {"segments": 0}
+
+            rows = [self._segment(task_id, buf) for task_id, buf in frozen.items()]
+            supabase_admin.table("delivery_track_segments").insert(rows).execute()
+
+            with self._lock:
+                for task_id, (buf, n) in snapshot.items():
+                    # Keep the joint point plus anything that arrived meanwhile.
+                    del buf.lats[:n - 1]
+                    del buf.lngs[:n - 1]
+                    del buf.times[:n - 1]
+                    buf.persisted = 1
+            self._evict_idle()
+            return {"segments": len(rows), "raw_points": sum(r["raw_point_count"] for r in rows), "kept_points": sum(r["point_count"] for r in rows)}
+
+    def _evict_idle(self) -> None:
+        cutoff = time.time() - IDLE_EVICT_SECONDS
+        with self._lock:
+            for task_id in [t for t, b in self._buffers.items() if b.last_seen < cutoff and not b.has_new_points()]:
+                del self._buffers[task_id]
+
+    def pending_points(self, task_id: Any) -> List[Tuple[float, float]]:
+        """Simplified points not yet persisted (joint point included)."""
+        with self._lock:
+            buf = self._buffers.get(task_id)
+            if buf is None or not buf.has_new_points():
+                return []
+            lats = np.array(buf.lats, dtype=np.float64)
+            lngs = np.array(buf.lngs, dtype=np.float64)
+        keep = simplify_track(lats, lngs, self.tolerance_m)
+        return list(zip(lats[keep].tolist(), lngs[keep].tolist()))
+
+
+# Process-wide store fed by the location endpoints, persisted by the scheduler
+track_store = TrackStore()
+
+
+def persist_tracks():
+    try:
+        return track_store.persist()
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def get_task_track(task_id: int) -> Dict[str, Any]:
+    """Full simplified route of a task as one encoded polyline."""
+    try:
+        res = supabase_admin.table("delivery_track_segments").select("polyline, point_count, raw_point_count, started_at, ended_at")\
+            .eq("task_id", task_id).order("id").execute()
+        segments = res.data or []
+        points: List[Tuple[float, float]] = []
+        for segment in segments:
+            decoded = decode_polyline(segment["polyline"])
+            if points and decoded and decoded[0] == points[-1]:
+                decoded = decoded[1:]
+            points.extend(decoded)
+        # Same rounding as the stored polylines, so the joint point matches.
+        pending = [(round(lat, 5), round(lng, 5)) for lat, lng in track_store.pending_points(task_id)]
+        if points and pending and pending[0] == points[-1]:
+            pending = pending[1:]
+        points.extend(pending)
+        return {
+            "task_id": task_id,
+            "polyline": encode_polyline(points),
+            "point_count": len(points),
+            "raw_point_count": sum(s["raw_point_count"] for s in segments),
+            "started_at": segments[0]["started_at"] if segments else None,
+            "ended_at": segments[-1]["ended_at"] if segments else None,
+        }
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,35 @@
+# app/services/user_service.py
+from typing import Any, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.services.supabase_service import supabase
+
+PROFILE_FLAGS = "id, kyc_verified, is_admin"
+
+# Short TTL: KYC/admin changes made on another instance show up within seconds.
+_profile_cache = TTLCache(maxsize=10000, ttl=30.0)
+
+
+def get_user_profile(user_id: str) -> Optional[Dict[str, Any]]:
+    """Return the user's profile flags (kyc_verified, is_admin), cached per user."""
+    if not user_id:
+        return None
+    profile = _profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+
+    rows = supabase.table("users").select(PROFILE_FLAGS).eq("id", user_id).execute().data
+    if not rows:
+        return None
+    profile = {
+        "id": rows[0].get("id", user_id),
+        "kyc_verified": bool(rows[0].get("kyc_verified")),
+        "is_admin": bool(rows[0].get("is_admin")),
+    }
+    _profile_cache.set(user_id, profile)
+    return profile
+
+
+def invalidate_user_profile(user_id: str) -> None:
+    """Drop the cached flags after the users row changes in this process."""
+    _profile_cache.pop(user_id)
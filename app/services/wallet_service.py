@@ -1,65 +1,124 @@
 # app/services/wallet_service.py
-from app.services.supabase_service import supabase
-from datetime import datetime
-from typing import Dict, Any, Union
+import threading
+from app.core.cache import TTLCache
+from app.services.supabase_service import supabase, supabase_admin
+from app.utils.pagination import apply_keyset, clamp_limit, page_result
+from typing import Dict, Any, Iterator, Optional, Union
 
-def get_wallet_balance(user_id: str) -> Dict[str, Union[float,int]]:
-    res = supabase.table("wallets").select("balance").eq("user_id", user_id).execute()
-    if not res.data:
-        supabase.table("wallets").insert({"user_id": user_id, "balance": 0, "last_updated": datetime.utcnow().isoformat()}).execute()
-        return {"balance": 0}
-    return res.data[0]
+# Write-through balance cache: filled by reads, overwritten by every
+# successful wallet_apply in this process, and refreshed from realtime
+# wallets events for writes made elsewhere. Entries are (balance, version);
+# the short TTL bounds how long a missed event can leave a stale balance.
+_balance_cache = TTLCache(maxsize=50000, ttl=30.0)
+_balance_lock = threading.Lock()
 
 
-def get_wallet_record(user_id: str) -> Dict[str, Any]:
-    res = supabase.table("wallets").select("*").eq("user_id", user_id).execute()
-    if not res.data:
-        supabase.table("wallets").insert({"user_id": user_id, "balance": 0, "last_updated": datetime.utcnow().isoformat()}).execute()
-        return {"user_id": user_id, "balance": 0}
-    return res.data[0]
+def _cache_balance(user_id: str, balance: float, version: Optional[int]) -> None:
+    """Store the balance unless the cache already holds a newer version, so a
+    slow read that finishes after a write can't put the old balance back."""
+    with _balance_lock:
+        cached = _balance_cache.get(user_id)
+        if cached is not None and cached[1] is not None and (version is None or version < cached[1]):
+            return
+        _balance_cache.set(user_id, (float(balance), version))
 
 
-def debit_wallet(user_id: str, amount: float, description: str) -> Dict[str, Any]:
+def invalidate_wallet_balance(user_id: str) -> None:
+    _balance_cache.pop(user_id)
+
+
+def apply_wallet_event(row: Dict[str, Any]) -> None:
+    """Realtime wallets INSERT/UPDATE: cache the event balance if it is the newer one."""
+    user_id = row.get("user_id")
+    if not user_id:
+        return
+    if row.get("balance") is None or row.get("version") is None:
+        invalidate_wallet_balance(user_id)
+        return
+    _cache_balance(user_id, row["balance"], row["version"])
+
+
+def get_wallet_balance(user_id: str) -> Dict[str, Union[float,int]]:
+    cached = _balance_cache.get(user_id)
+    if cached is not None:
+        return {"balance": cached[0]}
     wallet = get_wallet_record(user_id)
-    new_balance = float(wallet.get("balance", 0)) - float(amount)
-    if new_balance < 0:
-        return {"error": "Insufficient balance", "balance": wallet.get("balance", 0)}
+    return {"balance": wallet.get("balance", 0)}
 
-    supabase.table("wallets").update({
-        "balance": new_balance,
-        "last_updated": datetime.utcnow().isoformat()
-    }).eq("user_id", user_id).execute()
 
-    supabase.table("wallet_transactions").insert({
-        "user_id": user_id,
-        "type": "debit",
-        "amount": amount,
-        "description": description,
-        "created_at": datetime.utcnow().isoformat()
-    }).execute()
+def get_wallet_record(user_id: str) -> Dict[str, Any]:
+    """
+    Read the wallet row. A missing row reads as a zero balance; the row itself
+    is created by wallet_apply on the first credit/debit (idempotent upsert).
+    """
+    res = supabase.table("wallets").select("*").eq("user_id", user_id).execute()
+    if not res.data:
+        _cache_balance(user_id, 0, 0)
+        return {"user_id": user_id, "balance": 0, "version": 0}
+    wallet = res.data[0]
+    _cache_balance(user_id, wallet.get("balance") or 0, wallet.get("version"))
+    return wallet
 
-    return {"balance": new_balance}
 
+def _apply_delta(user_id: str, delta: float, description: str, reference: Optional[str] = None, expected_version: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Change the balance and write the ledger row in one round trip via the
+    wallet_apply database function (see supabase/migrations). The update is
+    a single conditional statement, so concurrent calls cannot lose writes.
+    """
+    try:
+        res = supabase_admin.rpc("wallet_apply", {
+            "p_user_id": user_id,
+            "p_delta": delta,
+            "p_description": description,
+            "p_reference": reference,
+            "p_expected_version": expected_version,
+        }).execute()
+    except Exception as e:
+        if "insufficient_balance" in str(e):
+            return {"error": "Insufficient balance", "balance": get_wallet_record(user_id).get("balance", 0)}
+        if "version_conflict" in str(e):
+            return {"error": "Wallet was modified concurrently, retry"}
+        raise
+    row = res.data[0] if isinstance(res.data, list) else res.data
+    _cache_balance(user_id, row["balance"], row["version"])
+    return {"balance": float(row["balance"]), "version": row["version"]}
 
-def credit_wallet(user_id: str, amount: float, description: str) -> Dict[str, Any]:
-    wallet = get_wallet_record(user_id)
-    new_balance = float(wallet.get("balance", 0)) + float(amount)
-    supabase.table("wallets").update({
-        "balance": new_balance,
-        "last_updated": datetime.utcnow().isoformat()
-    }).eq("user_id", user_id).execute()
 
-    supabase.table("wallet_transactions").insert({
-        "user_id": user_id,
-        "type": "credit",
-        "amount": amount,
-        "description": description,
-        "created_at": datetime.utcnow().isoformat()
-    }).execute()
+def debit_wallet(user_id: str, amount: float, description: str, reference: Optional[str] = None, expected_version: Optional[int] = None) -> Dict[str, Any]:
+    """Debit `amount`; fails with {"error": "Insufficient balance"} instead of going negative."""
+    return _apply_delta(user_id, -float(amount), description, reference, expected_version)
+
 
-    return {"balance": new_balance}
+def credit_wallet(user_id: str, amount: float, description: str, reference: Optional[str] = None, expected_version: Optional[int] = None) -> Dict[str, Any]:
+    return _apply_delta(user_id, float(amount), description, reference, expected_version)
 
 
 def get_wallet_transactions(user_id: str):
     res = supabase.table("wallet_transactions").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
     return res.data or []
+
+
+def get_wallet_transactions_page(user_id: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    """One page of the user's ledger, newest first, keyset-paginated on (created_at, id)."""
+    try:
+        limit = clamp_limit(limit, default=50)
+        query = supabase.table("wallet_transactions").select("*").eq("user_id", user_id)
+        res = apply_keyset(query, cursor).limit(limit + 1).execute()
+        page = page_result(res.data or [], limit)
+        return {"transactions": page["items"], "next_cursor": page["next_cursor"], "has_more": page["has_more"]}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def iter_wallet_transactions(user_id: str, page_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """Yield the user's whole ledger page by page; memory stays at one page."""
+    cursor = None
+    while True:
+        query = supabase.table("wallet_transactions").select("*").eq("user_id", user_id)
+        res = apply_keyset(query, cursor).limit(page_size + 1).execute()
+        page = page_result(res.data or [], page_size)
+        yield from page["items"]
+        if not page["has_more"]:
+            return
+        cursor = page["next_cursor"]
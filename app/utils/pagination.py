@@ -0,0 +1,69 @@
+# app/utils/pagination.py
+"""Keyset (cursor) pagination helpers for Supabase queries.
+
+A cursor is the sort key of the last row on a page, encoded as url-safe
+base64 JSON, so the next page is a `WHERE (created_at, id) < (...)` query
+instead of an OFFSET scan.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def clamp_limit(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    if not limit or limit < 1:
+        return default
+    return min(int(limit), maximum)
+
+
+def encode_cursor(row: Dict[str, Any], keys: Sequence[str] = ("created_at", "id")) -> str:
+    raw = json.dumps([row.get(k) for k in keys], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[str] = ("created_at", "id")) -> List[Any]:
+    """Raises ValueError for a cursor that was not produced by encode_cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def quote_filter_value(value: Any) -> str:
+    """Quote a value for a PostgREST or=(...) filter, whose logic trees split
+    on ',' '.' ':' and parentheses; timestamps contain '.' and ':'."""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def apply_keyset(query, cursor: Optional[str], keys: Sequence[str] = ("created_at", "id"), desc: bool = True):
+    """
+    Order `query` by `keys` and, when a cursor is given, keep only rows after it.
+    Works for two sort columns (a timestamp plus a unique tie-breaker).
+    """
+    first, second = keys
+    query = query.order(first, desc=desc).order(second, desc=desc)
+    if not cursor:
+        return query
+    v1, v2 = decode_cursor(cursor, keys)
+    op = "lt" if desc else "gt"
+    return query.or_(
+        f"{first}.{op}.{quote_filter_value(v1)},and({first}.eq.{quote_filter_value(v1)},{second}.{op}.{quote_filter_value(v2)})"
+    )
+
+
+def page_result(rows: List[Dict[str, Any]], limit: int, keys: Sequence[str] = ("created_at", "id")) -> Dict[str, Any]:
+    """Split a `limit + 1` fetch into one page plus the cursor for the next."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1], keys) if has_more and rows else None,
+        "has_more": has_more,
+    }
@@ -0,0 +1,154 @@
+# benchmarks/wallet_concurrency.py
+"""Concurrent wallet debit benchmark and stress check.
+
+Fires N parallel debits at a local SQLite stand-in for the wallets /
+wallet_transactions tables and compares:
+
+  * rmw    - the old read-modify-write flow (read balance, compute in Python,
+             write balance, insert ledger row: three round trips), and
+  * atomic - the wallet_apply flow (one conditional UPDATE plus the ledger
+             insert in a single transaction).
+
+Each simulated round trip sleeps for --rtt milliseconds. After every run
+the final balance is checked against the ledger; the rmw flow is expected
+to lose updates, the atomic flow must not.
+
+    python benchmarks/wallet_concurrency.py --debits 200 --workers 32
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+USER_ID = "bench-user"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _setup(path: str, balance: float) -> None:
+    conn = _connect(path)
+    conn.executescript(
+        """
+        DROP TABLE IF EXISTS wallets;
+        DROP TABLE IF EXISTS wallet_transactions;
+        CREATE TABLE wallets (user_id TEXT PRIMARY KEY, balance REAL NOT NULL, version INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE wallet_transactions (id INTEGER PRIMARY KEY, user_id TEXT, type TEXT, amount REAL, description TEXT);
+        """
+    )
+    conn.execute("INSERT INTO wallets (user_id, balance) VALUES (?, ?)", (USER_ID, balance))
+    conn.close()
+
+
+def _round_trip(rtt: float) -> None:
+    if rtt:
+        time.sleep(rtt)
+
+
+def debit_rmw(conn: sqlite3.Connection, amount: float, rtt: float) -> bool:
+    _round_trip(rtt)
+    (balance,) = conn.execute("SELECT balance FROM wallets WHERE user_id = ?", (USER_ID,)).fetchone()
+    new_balance = balance - amount
+    if new_balance < 0:
+        return False
+    _round_trip(rtt)
+    conn.execute("UPDATE wallets SET balance = ? WHERE user_id = ?", (new_balance, USER_ID))
+    _round_trip(rtt)
+    conn.execute(
+        "INSERT INTO wallet_transactions (user_id, type, amount, description) VALUES (?, 'debit', ?, 'bench')",
+        (USER_ID, amount),
+    )
+    return True
+
+
+def debit_atomic(conn: sqlite3.Connection, amount: float, rtt: float) -> bool:
+    _round_trip(rtt)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cur = conn.execute(
+            "UPDATE wallets SET balance = balance - ?, version = version + 1 WHERE user_id = ? AND balance - ? >= 0",
+            (amount, USER_ID, amount),
+        )
+        if cur.rowcount == 0:
+            conn.execute("ROLLBACK")
+            return False
+        conn.execute(
+            "INSERT INTO wallet_transactions (user_id, type, amount, description) VALUES (?, 'debit', ?, 'bench')",
+            (USER_ID, amount),
+        )
+        conn.execute("COMMIT")
+        return True
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def run(strategy, path: str, debits: int, workers: int, amount: float, initial: float, rtt: float):
+    _setup(path, initial)
+    local = threading.local()
+
+    def task(_):
+        if not hasattr(local, "conn"):
+            local.conn = _connect(path)
+        return strategy(local.conn, amount, rtt)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        succeeded = sum(pool.map(task, range(debits)))
+    elapsed = time.perf_counter() - started
+
+    conn = _connect(path)
+    (balance,) = conn.execute("SELECT balance FROM wallets WHERE user_id = ?", (USER_ID,)).fetchone()
+    (ledger_total,) = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM wallet_transactions").fetchone()
+    conn.close()
+
+    expected = initial - ledger_total
+    return {
+        "succeeded": succeeded,
+        "elapsed_s": elapsed,
+        "debits_per_s": debits / elapsed if elapsed else float("inf"),
+        "final_balance": balance,
+        "expected_balance": expected,
+        "lost_updates": round((balance - expected) / amount) if amount else 0,
+        "consistent": abs(balance - expected) < 1e-6 and balance >= 0,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--debits", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--amount", type=float, default=20.0)
+    parser.add_argument("--initial", type=float, default=2000.0, help="starting balance (default allows half the debits)")
+    parser.add_argument("--rtt", type=float, default=2.0, help="simulated round trip in ms")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "wallet.db")
+        results = {}
+        for name, strategy in (("rmw", debit_rmw), ("atomic", debit_atomic)):
+            results[name] = r = run(strategy, path, args.debits, args.workers, args.amount, args.initial, args.rtt / 1000)
+            print(
+                f"{name:>6}: {r['succeeded']:4d} ok  {r['debits_per_s']:8.1f} debits/s  "
+                f"balance={r['final_balance']:.2f} expected={r['expected_balance']:.2f}  "
+                f"lost_updates={r['lost_updates']}  consistent={r['consistent']}"
+            )
+
+    # Stress check: the atomic path must never lose or over-apply a debit.
+    atomic = results["atomic"]
+    if not atomic["consistent"] or atomic["succeeded"] != min(args.debits, int(args.initial // args.amount)):
+        print("FAIL: atomic debits produced an inconsistent balance", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+-- Debit the booking fee, write the ledger row and insert the booking in one
+-- transaction. Used by bookings_service.create_booking_async so the fee is
+-- never charged without a booking (or the other way round).
+-- p_renter_id is trusted, so only the service role may call it: the backend
+-- passes the id of the authenticated caller.
+
+create or replace function public.create_booking_with_fee(
+    p_listing_id bigint,
+    p_renter_id uuid,
+    p_owner_id uuid,
+    p_start_date date,
+    p_end_date date,
+    p_rent_amount numeric,
+    p_fee numeric
+)
+returns public.bookings
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_balance numeric;
+    v_booking public.bookings;
+begin
+    select balance into v_balance
+      from wallets
+     where user_id = p_renter_id
+       for update;
+
+    if v_balance is null or v_balance < p_fee then
+        raise exception 'insufficient_balance' using errcode = 'P0001';
+    end if;
+
+    update wallets
+       set balance = balance - p_fee,
+           last_updated = now()
+     where user_id = p_renter_id;
+
+    insert into wallet_transactions (user_id, type, amount, description, created_at)
+    values (p_renter_id, 'debit', p_fee, 'Booking fee for listing ' || p_listing_id, now());
+
+    insert into bookings (
+        listing_id, renter_id, owner_id, start_date, end_date,
+        rent_amount, total_amount, platform_fee, delivery_fee, status, created_at
+    )
+    values (
+        p_listing_id, p_renter_id, p_owner_id, p_start_date, p_end_date,
+        p_rent_amount, p_rent_amount + p_fee, 0, 0, 'requested', now()
+    )
+    returning * into v_booking;
+
+    return v_booking;
+end;
+$$;
+
+revoke execute on function public.create_booking_with_fee(bigint, uuid, uuid, date, date, numeric, numeric)
+    from public, anon, authenticated;
+grant execute on function public.create_booking_with_fee(bigint, uuid, uuid, date, date, numeric, numeric)
+    to service_role;
@@ -0,0 +1,111 @@
+-- Atomic wallet mutations: balance change and ledger row in one statement
+-- batch, with an optimistic version for callers that read-then-write.
+-- The functions take the user id as an argument, so only the service role
+-- may execute them (see the revokes at the end).
+
+alter table public.wallets
+    add column if not exists version bigint not null default 0;
+
+alter table public.wallet_transactions
+    add column if not exists reference text;
+
+-- wallet_apply upserts on user_id, which needs a unique constraint.
+create unique index if not exists wallets_user_id_key on public.wallets (user_id);
+
+create or replace function public.wallet_apply(
+    p_user_id uuid,
+    p_delta numeric,
+    p_description text,
+    p_reference text default null,
+    p_expected_version bigint default null
+)
+returns table (balance numeric, version bigint)
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_balance numeric;
+    v_version bigint;
+begin
+    -- Lazily create the wallet so first-time credits need no extra round trip.
+    insert into wallets (user_id, balance, version, last_updated)
+    values (p_user_id, 0, 0, now())
+    on conflict (user_id) do nothing;
+
+    update wallets w
+       set balance = w.balance + p_delta,
+           version = w.version + 1,
+           last_updated = now()
+     where w.user_id = p_user_id
+       and w.balance + p_delta >= 0
+       and (p_expected_version is null or w.version = p_expected_version)
+    returning w.balance, w.version into v_balance, v_version;
+
+    if not found then
+        select w.balance, w.version into v_balance, v_version
+          from wallets w
+         where w.user_id = p_user_id;
+        if p_expected_version is not null and v_version <> p_expected_version then
+            raise exception 'version_conflict' using errcode = 'P0001';
+        end if;
+        raise exception 'insufficient_balance' using errcode = 'P0001';
+    end if;
+
+    insert into wallet_transactions (user_id, type, amount, description, reference, created_at)
+    values (
+        p_user_id,
+        case when p_delta < 0 then 'debit' else 'credit' end,
+        abs(p_delta),
+        p_description,
+        p_reference,
+        now()
+    );
+
+    return query select v_balance, v_version;
+end;
+$$;
+
+-- Route the booking fee through wallet_apply so it bumps the wallet version too.
+create or replace function public.create_booking_with_fee(
+    p_listing_id bigint,
+    p_renter_id uuid,
+    p_owner_id uuid,
+    p_start_date date,
+    p_end_date date,
+    p_rent_amount numeric,
+    p_fee numeric
+)
+returns public.bookings
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_booking public.bookings;
+begin
+    perform public.wallet_apply(p_renter_id, -p_fee, 'Booking fee for listing ' || p_listing_id);
+
+    insert into bookings (
+        listing_id, renter_id, owner_id, start_date, end_date,
+        rent_amount, total_amount, platform_fee, delivery_fee, status, created_at
+    )
+    values (
+        p_listing_id, p_renter_id, p_owner_id, p_start_date, p_end_date,
+        p_rent_amount, p_rent_amount + p_fee, 0, 0, 'requested', now()
+    )
+    returning * into v_booking;
+
+    return v_booking;
+end;
+$$;
+
+revoke execute on function public.wallet_apply(uuid, numeric, text, text, bigint)
+    from public, anon, authenticated;
+grant execute on function public.wallet_apply(uuid, numeric, text, text, bigint)
+    to service_role;
+
+revoke execute on function public.create_booking_with_fee(bigint, uuid, uuid, date, date, numeric, numeric)
+    from public, anon, authenticated;
+grant execute on function public.create_booking_with_fee(bigint, uuid, uuid, date, date, numeric, numeric)
+    to service_role;
@@ -0,0 +1,49 @@
+-- Razorpay webhook ingestion: processed-event ledger and batched settlement.
+
+create table if not exists public.payment_webhook_events (
+    event_id text primary key,
+    event text not null,
+    received_at timestamptz not null default now()
+);
+
+-- Backend-only (service role); no policies, so anon/authenticated see nothing.
+alter table public.payment_webhook_events enable row level security;
+
+-- Mark a batch of orders as paid and credit each wallet exactly once.
+-- Only payments not yet succeeded/refunded transition, so the webhook and
+-- /payments/verify can both settle the same order without a double credit.
+-- p_items: [{"order_id": "...", "payment_id": "...", "signature": "..."}]
+-- Service role only: the caller must have verified the payment first.
+create or replace function public.payments_settle(p_items jsonb)
+returns setof public.payments
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_payment public.payments;
+begin
+    for v_payment in
+        update payments p
+           set status = 'succeeded',
+               provider_payment_id = coalesce(i.payment_id, p.provider_payment_id),
+               signature = coalesce(i.signature, p.signature),
+               verified_at = now()
+          from jsonb_to_recordset(p_items) as i(order_id text, payment_id text, signature text)
+         where p.provider_order_id = i.order_id
+           and p.status not in ('succeeded', 'refunded')
+        returning p.*
+    loop
+        perform public.wallet_apply(
+            v_payment.user_id,
+            v_payment.amount,
+            'Top-up ' || coalesce(v_payment.metadata ->> 'purpose', ''),
+            'payment:' || v_payment.id
+        );
+        return next v_payment;
+    end loop;
+end;
+$$;
+
+revoke execute on function public.payments_settle(jsonb) from public, anon, authenticated;
+grant execute on function public.payments_settle(jsonb) to service_role;
@@ -0,0 +1,18 @@
+-- Outcomes of requests sent with an Idempotency-Key header. A row is
+-- inserted as 'pending' before the handler runs and completed with its
+-- response afterwards, so concurrent retries on any instance see it.
+
+create table if not exists public.idempotency_keys (
+    scope text not null,
+    key text not null,
+    request_hash text not null,
+    status text not null default 'pending' check (status in ('pending', 'completed')),
+    response jsonb,
+    created_at timestamptz not null default now(),
+    primary key (scope, key)
+);
+
+create index if not exists idempotency_keys_created_at_idx on public.idempotency_keys (created_at);
+
+-- Backend-only (service role); stored responses are not readable with the anon key.
+alter table public.idempotency_keys enable row level security;
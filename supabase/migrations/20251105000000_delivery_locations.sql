@@ -0,0 +1,36 @@
+-- Batched live-location writes for delivery_tasks.
+
+alter table public.delivery_tasks
+    add column if not exists location_seq bigint not null default 0;
+
+-- Apply the latest position of many tasks in one statement.
+-- Rows whose stored location_seq is already newer are left alone, so a
+-- delayed or retried flush never moves a task backwards. location_seq is
+-- the acceptance time in epoch milliseconds, so any worker's pings order
+-- correctly. Finished tasks are never moved. Service role only.
+-- p_updates: [{"id": 1, "lat": 12.9, "lng": 77.6, "ts": "...", "seq": 42}]
+create or replace function public.delivery_apply_locations(p_updates jsonb)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_count integer;
+begin
+    update delivery_tasks t
+       set current_lat = u.lat,
+           current_lng = u.lng,
+           last_update = u.ts,
+           location_seq = u.seq
+      from jsonb_to_recordset(p_updates) as u(id bigint, lat double precision, lng double precision, ts timestamptz, seq bigint)
+     where t.id = u.id
+       and t.location_seq < u.seq
+       and t.status not in ('completed', 'cancelled', 'canceled');
+    get diagnostics v_count = row_count;
+    return v_count;
+end;
+$$;
+
+revoke execute on function public.delivery_apply_locations(jsonb) from public, anon, authenticated;
+grant execute on function public.delivery_apply_locations(jsonb) to service_role;
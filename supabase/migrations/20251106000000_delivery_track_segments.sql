@@ -0,0 +1,20 @@
+-- Simplified location history of delivery tasks.
+-- Each row is one flushed stretch of the route as a Google-encoded
+-- polyline (precision 5). Consecutive segments share their joint point.
+
+create table if not exists public.delivery_track_segments (
+    id bigserial primary key,
+    task_id bigint not null references public.delivery_tasks (id) on delete cascade,
+    polyline text not null,
+    point_count integer not null,
+    raw_point_count integer not null,
+    started_at timestamptz not null,
+    ended_at timestamptz not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists delivery_track_segments_task_idx
+    on public.delivery_track_segments (task_id, id);
+
+-- Backend-only (service role); routes check owner/renter/admin before reading.
+alter table public.delivery_track_segments enable row level security;
@@ -0,0 +1,36 @@
+-- Last activity of WebSocket users, written by every worker's presence
+-- sync job so any instance can answer GET /presence/{user_id}.
+
+create table if not exists public.user_presence (
+    user_id text primary key,
+    last_seen timestamptz not null,
+    updated_at timestamptz not null default now()
+);
+
+-- Backend-only (service role); no policies.
+alter table public.user_presence enable row level security;
+
+-- Upsert many users at once, never moving last_seen backwards: workers
+-- sync independently and one may hold older data than another.
+-- p_rows: [{"user_id": "...", "last_seen": "..."}]
+create or replace function public.presence_touch(p_rows jsonb)
+returns integer
+language plpgsql
+set search_path = public
+as $$
+declare
+    v_count integer;
+begin
+    insert into user_presence (user_id, last_seen, updated_at)
+    select r.user_id, r.last_seen, now()
+      from jsonb_to_recordset(p_rows) as r(user_id text, last_seen timestamptz)
+    on conflict (user_id) do update
+       set last_seen = greatest(user_presence.last_seen, excluded.last_seen),
+           updated_at = now();
+    get diagnostics v_count = row_count;
+    return v_count;
+end;
+$$;
+
+revoke execute on function public.presence_touch(jsonb) from public, anon, authenticated;
+grant execute on function public.presence_touch(jsonb) to service_role;
@@ -0,0 +1,31 @@
+-- updated_at on bookings and listings, maintained by trigger, so the
+-- realtime listener can re-read rows edited while its channel was down
+-- (not only rows created then).
+
+create or replace function public.touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+alter table public.bookings
+    add column if not exists updated_at timestamptz not null default now();
+alter table public.listings
+    add column if not exists updated_at timestamptz not null default now();
+
+drop trigger if exists bookings_touch_updated_at on public.bookings;
+create trigger bookings_touch_updated_at
+    before update on public.bookings
+    for each row execute function public.touch_updated_at();
+
+drop trigger if exists listings_touch_updated_at on public.listings;
+create trigger listings_touch_updated_at
+    before update on public.listings
+    for each row execute function public.touch_updated_at();
+
+create index if not exists bookings_updated_at_idx on public.bookings (updated_at);
+create index if not exists listings_updated_at_idx on public.listings (updated_at);
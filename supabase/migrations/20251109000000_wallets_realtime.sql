@@ -0,0 +1,13 @@
+-- Publish wallets changes so every instance's balance cache sees writes
+-- made by the others (app/services/realtime_listener.py subscribes to them).
+
+do $$
+begin
+    if not exists (
+        select 1 from pg_publication_tables
+         where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = 'wallets'
+    ) then
+        alter publication supabase_realtime add table public.wallets;
+    end if;
+end
+$$;
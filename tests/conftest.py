@@ -0,0 +1,15 @@
+# tests/conftest.py
+"""Shared test setup.
+
+The Supabase clients are created at import time, so give them placeholder
+credentials; no test talks to Supabase.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
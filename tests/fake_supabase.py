@@ -0,0 +1,166 @@
+# tests/fake_supabase.py
+"""In-memory stand-in for the supabase-py client, enough for service tests.
+
+Supports table().select/insert/upsert/update/delete with eq/neq/lt/gt/in_
+filters, order and limit, plus rpc() handlers registered by the test.
+Unique keys per table make insert raise like PostgREST does on a conflict.
+"""
+
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class DuplicateKeyError(Exception):
+    pass
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str) -> None:
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.payload: Any = None
+        self.columns: Optional[List[str]] = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+        self._limit: Optional[int] = None
+        self._order: List[tuple] = []
+
+    # --- actions ---
+    def select(self, columns: str = "*"):
+        self.action = "select"
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, ignore_duplicates: bool = False):
+        self.action, self.payload = "upsert", rows
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- filters ---
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    # --- execution ---
+    def _matches(self, row) -> bool:
+        return all(f(row) for f in self.filters)
+
+    def _project(self, row):
+        return dict(row) if self.columns is None else {c: row.get(c) for c in self.columns}
+
+    def execute(self):
+        with self.db.lock:
+            self.db.calls.append((self.table, self.action))
+            failure = self.db.failures.get((self.table, self.action))
+            if failure is not None:
+                raise failure
+            rows = self.db.tables.setdefault(self.table, [])
+            if self.action == "select":
+                data = [r for r in rows if self._matches(r)]
+                for column, desc in reversed(self._order):
+                    data.sort(key=lambda r: r.get(column), reverse=desc)
+                if self._limit is not None:
+                    data = data[: self._limit]
+                return SimpleNamespace(data=[self._project(r) for r in data])
+            if self.action in ("insert", "upsert"):
+                return SimpleNamespace(data=self._write(rows))
+            if self.action == "update":
+                data = []
+                for row in rows:
+                    if self._matches(row):
+                        row.update(self.payload)
+                        data.append(dict(row))
+                return SimpleNamespace(data=data)
+            if self.action == "delete":
+                data = [dict(r) for r in rows if self._matches(r)]
+                rows[:] = [r for r in rows if not self._matches(r)]
+                return SimpleNamespace(data=data)
+        raise ValueError(self.action)
+
+    def _write(self, rows):
+        key = self.db.keys.get(self.table) or ()
+        written = []
+        for raw in self.payload if isinstance(self.payload, list) else [self.payload]:
+            existing = next((r for r in rows if key and all(r.get(k) == raw.get(k) for k in key)), None)
+            if existing is None:
+                row = {**self.db.defaults_for(self.table), **raw}
+                rows.append(row)
+                written.append(dict(row))
+            elif self.action == "insert":
+                raise DuplicateKeyError(f'duplicate key value violates unique constraint "{self.table}_pkey" (23505)')
+            elif not self.ignore_duplicates:
+                # ON CONFLICT DO UPDATE only sets the columns that were sent.
+                existing.update(raw)
+                written.append(dict(existing))
+        return written
+
+
+class FakeSupabase:
+    def __init__(self, keys: Optional[Dict[str, Sequence[str]]] = None) -> None:
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.keys = {name: tuple(cols) for name, cols in (keys or {}).items()}
+        self.rpcs: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self.failures: Dict[tuple, Exception] = {}
+        self.calls: List[tuple] = []
+        self.lock = threading.RLock()
+
+    def defaults_for(self, table: str) -> Dict[str, Any]:
+        return {"created_at": datetime.now(timezone.utc).isoformat()}
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]):
+        db = self
+
+        class _Call:
+            def execute(self):
+                db.calls.append((name, "rpc"))
+                failure = db.failures.get((name, "rpc"))
+                if failure is not None:
+                    raise failure
+                return SimpleNamespace(data=db.rpcs[name](params))
+
+        return _Call()
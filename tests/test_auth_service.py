@@ -0,0 +1,98 @@
+# tests/test_auth_service.py
+import base64
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import auth_service
+
+SECRET = "test-jwt-secret"
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def make_token(claims, secret=SECRET, alg="HS256"):
+    header = _b64(json.dumps({"alg": alg, "typ": "JWT"}).encode())
+    payload = _b64(json.dumps(claims).encode())
+    signature = _b64(hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest())
+    return f"{header}.{payload}.{signature}"
+
+
+class FakeAuth:
+    def __init__(self, user_id=None, error=None):
+        self.user_id = user_id
+        self.error = error
+        self.calls = 0
+
+    def get_user(self, token):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return SimpleNamespace(user=SimpleNamespace(id=self.user_id) if self.user_id else None)
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    fake = FakeAuth(user_id="remote-user")
+    monkeypatch.setattr(auth_service.settings, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth_service, "supabase", SimpleNamespace(auth=fake))
+    auth_service._claims_cache.clear()
+    yield fake
+    auth_service._claims_cache.clear()
+
+
+def test_valid_token_is_verified_locally_and_cached(auth, monkeypatch):
+    token = make_token({"sub": "user-1", "exp": time.time() + 3600})
+    assert auth_service.verify_access_token(token) == "user-1"
+    # A cache hit does not re-check the signature.
+    monkeypatch.setattr(auth_service.settings, "SUPABASE_JWT_SECRET", "rotated")
+    assert auth_service.verify_access_token(token) == "user-1"
+    assert auth.calls == 0
+
+
+@pytest.mark.parametrize("token", [
+    make_token({"sub": "user-1", "exp": time.time() + 3600}, secret="wrong"),
+    make_token({"sub": "user-1", "exp": time.time() - 1}),
+    make_token({"exp": time.time() + 3600}),
+    "not.a.jwt",
+    "garbage",
+    "",
+])
+def test_invalid_tokens_are_rejected_without_the_auth_server(auth, token):
+    assert auth_service.verify_access_token(token) is None
+    assert auth.calls == 0
+
+
+def test_cache_never_outlives_the_token(auth):
+    token = make_token({"sub": "user-1", "exp": time.time() + 0.2})
+    assert auth_service.verify_access_token(token) == "user-1"
+    time.sleep(0.3)
+    assert auth_service.verify_access_token(token) is None
+
+
+def test_without_a_secret_the_auth_server_decides(auth, monkeypatch):
+    monkeypatch.setattr(auth_service.settings, "SUPABASE_JWT_SECRET", None)
+    token = make_token({"sub": "ignored", "exp": time.time() + 3600})
+    assert auth_service.verify_access_token(token) == "remote-user"
+    assert auth_service.verify_access_token(token) == "remote-user"
+    assert auth.calls == 1
+
+
+def test_other_algorithms_go_to_the_auth_server(auth):
+    token = make_token({"sub": "ignored", "exp": time.time() + 3600}, alg="RS256")
+    assert auth_service.verify_access_token(token) == "remote-user"
+    assert auth.calls == 1
+
+
+def test_auth_server_rejection_and_failure(auth, monkeypatch):
+    monkeypatch.setattr(auth_service.settings, "SUPABASE_JWT_SECRET", None)
+    auth.user_id = None
+    assert auth_service.verify_access_token("opaque-1") is None
+    auth.error = ConnectionError("auth down")
+    assert auth_service.verify_access_token("opaque-2") is None
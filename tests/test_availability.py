@@ -0,0 +1,73 @@
+# tests/test_availability.py
+from datetime import date
+
+import pytest
+
+from app.services.availability_service import AvailabilityIndex, IntervalIndex, booking_range
+
+
+def d(day):
+    return date(2025, 11, day)
+
+
+@pytest.fixture
+def index():
+    idx = IntervalIndex()
+    idx.add("a", d(1), d(5))
+    idx.add("b", d(10), d(12))
+    return idx
+
+
+def test_booking_range_is_half_open_and_same_day_holds_one_day():
+    assert booking_range("2025-11-01", "2025-11-05") == (d(1), d(5))
+    assert booking_range("2025-11-03T09:00:00", "2025-11-03") == (d(3), d(4))
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    (d(5), d(10), False),   # touches both neighbours, overlaps neither
+    (d(4), d(6), True),     # last day of "a"
+    (d(9), d(11), True),    # first day of "b"
+    (d(2), d(3), True),     # inside "a"
+    (d(1), d(20), True),    # covers everything
+    (d(12), d(15), False),  # starts on "b"'s end date
+    (d(20), d(25), False),
+])
+def test_overlaps(index, start, end, expected):
+    assert index.overlaps(start, end) is expected
+
+
+def test_overlaps_uses_running_max_end():
+    # A long early booking must block a range after a short later one.
+    idx = IntervalIndex()
+    idx.add("long", d(1), d(20))
+    idx.add("short", d(2), d(3))
+    assert idx.overlaps(d(15), d(16))
+    assert [b for _, _, b in idx.overlapping(d(15), d(16))] == ["long"]
+
+
+def test_ignore_booking(index):
+    assert not index.overlaps(d(2), d(4), ignore_booking="a")
+    assert index.overlaps(d(2), d(11), ignore_booking="a")
+
+
+def test_remove_and_move(index):
+    index.remove("a")
+    assert not index.overlaps(d(1), d(5))
+    index.add("b", d(1), d(2))
+    assert index.overlaps(d(1), d(2))
+    assert not index.overlaps(d(10), d(12))
+    assert len(index) == 1
+
+
+def test_availability_index_tracks_status_and_listing_changes():
+    availability = AvailabilityIndex()
+    availability._warm = True  # everything is "loaded"; no database reads
+    availability.apply_booking({"id": 1, "listing_id": 7, "start_date": "2025-11-01", "end_date": "2025-11-05", "status": "pending"})
+    assert availability.has_conflict(7, d(3), d(4))
+
+    availability.apply_booking({"id": 1, "listing_id": 8, "start_date": "2025-11-01", "end_date": "2025-11-05", "status": "approved"})
+    assert not availability.has_conflict(7, d(3), d(4))
+    assert availability.booked_ranges(8, d(1), d(30)) == [{"booking_id": 1, "start_date": "2025-11-01", "end_date": "2025-11-05"}]
+
+    availability.apply_booking({"id": 1, "listing_id": 8, "start_date": "2025-11-01", "end_date": "2025-11-05", "status": "cancelled"})
+    assert not availability.has_conflict(8, d(3), d(4))
@@ -0,0 +1,92 @@
+# tests/test_bookings_service.py
+import asyncio
+
+import pytest
+
+from app.services import bookings_service
+from app.services.availability_service import AvailabilityIndex
+from fake_supabase import FakeSupabase
+
+RENTER = {"id": "renter-1", "kyc_verified": True, "is_admin": False}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    db = FakeSupabase()
+    index = AvailabilityIndex()
+    index._warm = True
+    state = {"balance": 100.0, "profile_reads": 0}
+
+    def profile(user_id):
+        state["profile_reads"] += 1
+        return {"id": user_id, "kyc_verified": True}
+
+    def create_booking_with_fee(params):
+        if state["balance"] < params["p_fee"]:
+            raise Exception("insufficient_balance")
+        state["balance"] -= params["p_fee"]
+        return [{"id": 1, "listing_id": params["p_listing_id"], "renter_id": params["p_renter_id"],
+                 "start_date": params["p_start_date"], "end_date": params["p_end_date"], "status": "requested"}]
+
+    db.rpcs["create_booking_with_fee"] = create_booking_with_fee
+    monkeypatch.setattr(bookings_service, "supabase_admin", db)
+    monkeypatch.setattr(bookings_service, "availability", index)
+    monkeypatch.setattr(bookings_service, "get_user_profile", profile)
+    monkeypatch.setattr(bookings_service, "_fetch_listing_price", lambda listing_id: {"price_per_day": 50} if listing_id == 7 else None)
+    monkeypatch.setattr(bookings_service, "get_wallet_balance", lambda user_id: {"balance": state["balance"]})
+    return db, index, state
+
+
+def book(start="2025-11-01", end="2025-11-04", listing_id=7, renter=RENTER):
+    return asyncio.run(bookings_service.create_booking_async(listing_id, "renter-1", "owner-1", start, end, renter=renter))
+
+
+def test_books_with_the_dates_the_client_sent(env):
+    db, index, state = env
+    result = book(start="2025-11-01T10:00:00", end="2025-11-04")
+    assert result["booking"][0]["start_date"] == "2025-11-01T10:00:00"
+    assert state["balance"] == 100.0 - bookings_service.BOOKING_FEE
+    assert state["profile_reads"] == 0  # the request's profile is reused
+    assert index.has_conflict(7, *bookings_service.booking_range("2025-11-02", "2025-11-03"))
+
+
+def test_loads_the_profile_when_none_is_given(env):
+    db, index, state = env
+    assert "booking" in book(renter=None)
+    assert state["profile_reads"] == 1
+
+
+def test_rejects_overlapping_dates(env):
+    book()
+    assert book(start="2025-11-03", end="2025-11-05") == {"error": "Listing is already booked for these dates"}
+    assert "booking" in book(start="2025-11-04", end="2025-11-05")
+
+
+@pytest.mark.parametrize("renter, listing_id, error", [
+    ({"id": "renter-1", "kyc_verified": False}, 7, "KYC verification required before booking."),
+    (RENTER, 8, "Listing not found"),
+])
+def test_validation_errors(env, renter, listing_id, error):
+    assert book(renter=renter, listing_id=listing_id) == {"error": error}
+
+
+def test_insufficient_balance(env):
+    db, index, state = env
+    state["balance"] = 5.0
+    assert book()["error"] == "Insufficient wallet balance. Please top-up first."
+    assert db.calls == []
+
+
+def test_wallet_read_errors_are_reported_as_such(env, monkeypatch):
+    db, index, state = env
+    monkeypatch.setattr(bookings_service, "get_wallet_balance", lambda user_id: {"error": "wallet service unavailable"})
+    assert book() == {"error": "wallet service unavailable"}
+    assert db.calls == []
+
+
+def test_balance_spent_between_check_and_commit(env, monkeypatch):
+    db, index, state = env
+    monkeypatch.setattr(bookings_service, "get_wallet_balance", lambda user_id: {"balance": 100.0})
+    state["balance"] = 0.0
+    assert book() == {"error": "Insufficient wallet balance. Please top-up first."}
+    assert not index.has_conflict(7, *bookings_service.booking_range("2025-11-01", "2025-11-04"))
@@ -0,0 +1,167 @@
+# tests/test_idempotency_service.py
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import idempotency_service as idem
+from fake_supabase import FakeSupabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeSupabase(keys={"idempotency_keys": ("scope", "key")})
+    monkeypatch.setattr(idem, "supabase_admin", fake)
+    idem._memory.clear()
+    yield fake
+    idem._memory.clear()
+
+
+def counting(response):
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return response
+
+    return handler, calls
+
+
+def _hours_ago(hours):
+    return (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+
+
+def test_same_key_replays_without_running_the_handler(db):
+    handler, calls = counting({"refund_id": "rf_1"})
+    assert idem.run_idempotent("k1", "refund", {"amount": 10}, handler) == {"refund_id": "rf_1"}
+    idem._memory.clear()  # force the replay to come from the table
+    assert idem.run_idempotent("k1", "refund", {"amount": 10}, handler) == {"refund_id": "rf_1"}
+    assert len(calls) == 1
+    assert db.tables["idempotency_keys"][0]["status"] == idem.COMPLETED
+
+
+def test_different_parameters_are_rejected(db):
+    handler, calls = counting({"ok": True})
+    idem.run_idempotent("k1", "refund", {"amount": 10}, handler)
+    assert idem.run_idempotent("k1", "refund", {"amount": 99}, handler) == {
+        "error": "Idempotency-Key was already used with different parameters"
+    }
+    assert len(calls) == 1
+
+
+def test_error_responses_are_replayed(db):
+    handler, calls = counting({"error": "Provider timeout"})
+    idem.run_idempotent("k1", "refund", {}, handler)
+    assert idem.run_idempotent("k1", "refund", {}, handler) == {"error": "Provider timeout"}
+    assert len(calls) == 1
+
+
+def test_handler_exception_records_unknown_outcome(db):
+    def boom():
+        raise RuntimeError("socket closed")
+
+    with pytest.raises(RuntimeError):
+        idem.run_idempotent("k1", "refund", {}, boom)
+    assert idem.run_idempotent("k1", "refund", {}, boom) == idem.UNKNOWN_OUTCOME
+
+
+def test_concurrent_requests_run_the_handler_once(db):
+    started = threading.Barrier(6)
+    calls = []
+
+    def slow_handler():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"ok": True}
+
+    results = []
+
+    def attempt():
+        started.wait()
+        results.append(idem.run_idempotent("k1", "refund", {"amount": 1}, slow_handler))
+
+    threads = [threading.Thread(target=attempt) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"ok": True}] * 6
+
+
+def test_claim_held_by_another_instance_reports_in_progress(db):
+    db.tables["idempotency_keys"] = [{
+        "scope": "refund", "key": "k1", "request_hash": idem.request_hash({}),
+        "status": idem.PENDING, "response": None, "created_at": datetime.now(timezone.utc).isoformat(),
+    }]
+    handler, calls = counting({"ok": True})
+    assert idem.run_idempotent("k1", "refund", {}, handler) == {
+        "error": "A request with this Idempotency-Key is still in progress"
+    }
+    assert calls == []
+
+
+def test_stale_pending_claim_is_taken_over(db):
+    db.tables["idempotency_keys"] = [{
+        "scope": "refund", "key": "k1", "request_hash": idem.request_hash({}),
+        "status": idem.PENDING, "response": None, "created_at": _hours_ago(1),
+    }]
+    handler, calls = counting({"ok": True})
+    assert idem.run_idempotent("k1", "refund", {}, handler) == {"ok": True}
+    assert len(calls) == 1
+    assert db.tables["idempotency_keys"][0]["status"] == idem.COMPLETED
+
+
+def test_stale_pending_claim_with_other_parameters_is_not_taken_over(db):
+    db.tables["idempotency_keys"] = [{
+        "scope": "refund", "key": "k1", "request_hash": idem.request_hash({"amount": 1}),
+        "status": idem.PENDING, "response": None, "created_at": _hours_ago(1),
+    }]
+    handler, calls = counting({"ok": True})
+    assert "different parameters" in idem.run_idempotent("k1", "refund", {"amount": 2}, handler)["error"]
+    assert calls == []
+
+
+def test_table_outage_falls_back_to_memory(db):
+    outage = ConnectionError("supabase unreachable")
+    for action in ("select", "insert", "upsert"):
+        db.failures[("idempotency_keys", action)] = outage
+    handler, calls = counting({"ok": True})
+    assert idem.run_idempotent("k1", "refund", {}, handler) == {"ok": True}
+    assert idem.run_idempotent("k1", "refund", {}, handler) == {"ok": True}
+    assert len(calls) == 1
+
+
+def test_async_variant_replays(db):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return {"order_id": "order_1"}
+
+    async def scenario():
+        first, second = await asyncio.gather(
+            idem.run_idempotent_async("k1", "topup", {"amount": 5}, handler),
+            idem.run_idempotent_async("k1", "topup", {"amount": 5}, handler),
+        )
+        return first, second
+
+    assert asyncio.run(scenario()) == ({"order_id": "order_1"}, {"order_id": "order_1"})
+    assert len(calls) == 1
+
+
+def test_oversized_key_is_rejected(db):
+    handler, calls = counting({"ok": True})
+    assert "at most" in idem.run_idempotent("k" * 300, "refund", {}, handler)["error"]
+    assert calls == []
+
+
+def test_purge_deletes_only_expired_keys(db):
+    db.tables["idempotency_keys"] = [
+        {"scope": "refund", "key": "old", "created_at": _hours_ago(48)},
+        {"scope": "refund", "key": "new", "created_at": _hours_ago(1)},
+    ]
+    assert idem.purge_expired_keys() == {"purged": 1}
+    assert [row["key"] for row in db.tables["idempotency_keys"]] == ["new"]
@@ -0,0 +1,78 @@
+# tests/test_location_ingest.py
+import pytest
+
+from app.services import location_ingest
+from app.services.location_ingest import LocationIngestor
+from fake_supabase import FakeSupabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeSupabase()
+    fake.tables["delivery_tasks"] = [
+        {"id": 1, "owner_id": "o1", "renter_id": "r1", "status": "in_transit", "location_seq": 0},
+        {"id": 2, "owner_id": "o2", "renter_id": "r2", "status": "completed", "location_seq": 0},
+    ]
+    fake.rpcs["delivery_apply_locations"] = lambda params: None
+    monkeypatch.setattr(location_ingest, "supabase", fake)
+    monkeypatch.setattr(location_ingest, "supabase_admin", fake)
+    monkeypatch.setattr(location_ingest.delivery_index, "apply_task", lambda row: None)
+    return fake
+
+
+def test_only_participants_of_active_tasks_can_ping(db):
+    ingestor = LocationIngestor()
+    assert ingestor.submit(99, 1.0, 2.0, "o1") == {"error": "Task not found"}
+    assert ingestor.submit(1, 1.0, 2.0, "stranger") == {"error": "Not authorized"}
+    assert ingestor.submit(2, 1.0, 2.0, "o2") == {"error": "Delivery is no longer active"}
+    assert ingestor.submit(1, 1.0, 2.0, "r1")["success"] is True
+
+
+def test_participants_are_cached(db):
+    ingestor = LocationIngestor()
+    for _ in range(3):
+        ingestor.submit(1, 1.0, 2.0, "o1")
+    assert db.calls.count(("delivery_tasks", "select")) == 1
+
+
+def test_status_updates_reach_the_cache(db):
+    ingestor = LocationIngestor()
+    ingestor.submit(1, 1.0, 2.0, "o1")
+    ingestor.apply_task({"id": 1, "status": "completed"})
+    assert ingestor.submit(1, 1.0, 2.0, "o1") == {"error": "Delivery is no longer active"}
+
+
+def test_seq_is_time_based_and_strictly_increasing(db, monkeypatch):
+    monkeypatch.setattr(location_ingest.time, "time", lambda: 1000.0)
+    ingestor = LocationIngestor()
+    seqs = [ingestor.submit(1, 1.0, 2.0, "o1")["seq"] for _ in range(3)]
+    assert seqs == [1_000_000, 1_000_001, 1_000_002]
+
+
+def test_seq_continues_after_a_newer_stored_seq(db, monkeypatch):
+    monkeypatch.setattr(location_ingest.time, "time", lambda: 1000.0)
+    ingestor = LocationIngestor()
+    ingestor.apply_task({"id": 1, "location_seq": 5_000_000})
+    assert ingestor.submit(1, 1.0, 2.0, "o1")["seq"] == 5_000_001
+
+
+def test_flush_writes_the_latest_position_once_per_task(db):
+    sent = []
+    db.rpcs["delivery_apply_locations"] = lambda params: sent.append(params["p_updates"])
+    ingestor = LocationIngestor()
+    ingestor.submit(1, 1.0, 2.0, "o1")
+    ingestor.submit(1, 3.0, 4.0, "r1")
+    assert ingestor.flush() == 1
+    assert [(u["id"], u["lat"], u["lng"]) for u in sent[0]] == [(1, 3.0, 4.0)]
+    assert ingestor.flush() == 0
+    assert ingestor.stats["rows_written"] == 1
+
+
+def test_failed_flush_keeps_positions_for_the_next_one(db):
+    ingestor = LocationIngestor()
+    ingestor.submit(1, 1.0, 2.0, "o1")
+    db.failures[("delivery_apply_locations", "rpc")] = ConnectionError("down")
+    assert ingestor.flush() == 0
+    assert ingestor.stats["flush_errors"] == 1
+    del db.failures[("delivery_apply_locations", "rpc")]
+    assert ingestor.flush() == 1
@@ -0,0 +1,77 @@
+# tests/test_pagination.py
+import pytest
+
+from app.utils.pagination import apply_keyset, clamp_limit, decode_cursor, encode_cursor, page_result
+
+
+class RecordingQuery:
+    """Stands in for a supabase query builder; records the chained calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def order(self, column, desc=False):
+        self.calls.append(("order", column, desc))
+        return self
+
+    def or_(self, filters):
+        self.calls.append(("or", filters))
+        return self
+
+
+def test_cursor_round_trip():
+    row = {"created_at": "2025-11-01T10:00:00+00:00", "id": 42, "title": "ignored"}
+    cursor = encode_cursor(row)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ["2025-11-01T10:00:00+00:00", 42]
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!!", encode_cursor({"id": 1}, keys=("id",)), "e30"])
+def test_decode_rejects_foreign_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("limit, expected", [(None, 20), (0, 20), (-5, 20), (10, 10), (1000, 100)])
+def test_clamp_limit(limit, expected):
+    assert clamp_limit(limit) == expected
+
+
+def test_first_page_only_orders():
+    query = apply_keyset(RecordingQuery(), None)
+    assert query.calls == [("order", "created_at", True), ("order", "id", True)]
+
+
+def test_next_page_filters_after_cursor():
+    cursor = encode_cursor({"created_at": "2025-11-01T10:00:00+00:00", "id": 7})
+    query = apply_keyset(RecordingQuery(), cursor)
+    assert query.calls[-1] == (
+        "or",
+        'created_at.lt."2025-11-01T10:00:00+00:00",and(created_at.eq."2025-11-01T10:00:00+00:00",id.lt."7")',
+    )
+
+
+def test_ascending_keyset_uses_gt():
+    cursor = encode_cursor({"created_at": "2025-11-01", "id": 7})
+    query = apply_keyset(RecordingQuery(), cursor, desc=False)
+    assert query.calls[0] == ("order", "created_at", False)
+    assert query.calls[-1][1].startswith('created_at.gt."2025-11-01"')
+
+
+def test_cursor_values_are_quoted():
+    cursor = encode_cursor({"created_at": 'a,b.c"d', "id": 1})
+    filters = apply_keyset(RecordingQuery(), cursor).calls[-1][1]
+    assert filters.startswith('created_at.lt."a,b.c\\"d"')
+
+
+def test_page_result_splits_extra_row():
+    rows = [{"created_at": f"2025-11-0{i}", "id": i} for i in (5, 4, 3)]
+    page = page_result(rows, 2)
+    assert page["items"] == rows[:2]
+    assert page["has_more"] is True
+    assert decode_cursor(page["next_cursor"]) == ["2025-11-04", 4]
+
+
+def test_page_result_last_page():
+    rows = [{"created_at": "2025-11-01", "id": 1}]
+    assert page_result(rows, 2) == {"items": rows, "next_cursor": None, "has_more": False}
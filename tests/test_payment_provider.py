@@ -0,0 +1,136 @@
+# tests/test_payment_provider.py
+import asyncio
+import hashlib
+import hmac
+
+import httpx
+import pytest
+
+from app.services import payment_provider
+from app.services.payment_provider import (
+    FakePaymentProvider,
+    PaymentProviderError,
+    RazorpayProvider,
+    SignatureVerificationError,
+    verify_webhook_signature,
+)
+
+
+def provider_with(handler, max_retries=3):
+    """RazorpayProvider whose HTTP client answers through `handler(request, attempt)`."""
+    provider = RazorpayProvider("rzp_test", "secret", max_retries=max_retries, backoff=0)
+    attempts = []
+
+    def respond(request):
+        attempts.append(request)
+        return handler(request, len(attempts))
+
+    provider._http = httpx.AsyncClient(base_url="https://razorpay.test", transport=httpx.MockTransport(respond))
+    return provider, attempts
+
+
+def test_retries_5xx_for_idempotent_calls():
+    def handler(request, attempt):
+        return httpx.Response(503) if attempt < 3 else httpx.Response(200, json={"id": "order_1"})
+
+    provider, attempts = provider_with(handler)
+    assert asyncio.run(provider.create_order(1000)) == {"id": "order_1"}
+    assert len(attempts) == 3
+    assert attempts[0].url.path == "/orders"
+
+
+def test_gives_up_after_max_retries_with_provider_message():
+    def handler(request, attempt):
+        return httpx.Response(502, json={"error": {"description": "Bad gateway"}})
+
+    provider, attempts = provider_with(handler, max_retries=2)
+    with pytest.raises(PaymentProviderError) as exc:
+        asyncio.run(provider.create_order(1000))
+    assert str(exc.value) == "Bad gateway"
+    assert exc.value.status_code == 502
+    assert len(attempts) == 3
+
+
+def test_client_errors_are_not_retried():
+    def handler(request, attempt):
+        return httpx.Response(400, json={"error": {"description": "amount is invalid"}})
+
+    provider, attempts = provider_with(handler)
+    with pytest.raises(PaymentProviderError, match="amount is invalid"):
+        asyncio.run(provider.create_order(-1))
+    assert len(attempts) == 1
+
+
+def test_refund_is_not_retried_on_timeout_or_5xx():
+    def timeout(request, attempt):
+        raise httpx.ReadTimeout("read timed out", request=request)
+
+    provider, attempts = provider_with(timeout)
+    with pytest.raises(PaymentProviderError, match="timed out"):
+        asyncio.run(provider.refund("pay_1", 500))
+    assert len(attempts) == 1
+
+    provider, attempts = provider_with(lambda request, attempt: httpx.Response(503))
+    with pytest.raises(PaymentProviderError):
+        asyncio.run(provider.refund("pay_1", 500))
+    assert len(attempts) == 1
+
+
+def test_connection_failures_are_retried_even_for_refunds():
+    def handler(request, attempt):
+        if attempt == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"id": "rfnd_1"})
+
+    provider, attempts = provider_with(handler)
+    assert asyncio.run(provider.refund("pay_1", 500)) == {"id": "rfnd_1"}
+    assert len(attempts) == 2
+
+
+def test_timeouts_are_retried_for_idempotent_calls():
+    def handler(request, attempt):
+        if attempt == 1:
+            raise httpx.ReadTimeout("read timed out", request=request)
+        return httpx.Response(200, json={"id": "order_1"})
+
+    provider, attempts = provider_with(handler)
+    assert asyncio.run(provider.create_order(1000))["id"] == "order_1"
+    assert len(attempts) == 2
+
+
+def test_payment_signature_verification():
+    provider = RazorpayProvider("rzp_test", "secret")
+    good = hmac.new(b"secret", b"order_1|pay_1", hashlib.sha256).hexdigest()
+    provider.verify_payment_signature("order_1", "pay_1", good)
+    for bad in ("", "0" * 64, good.upper()):
+        with pytest.raises(SignatureVerificationError):
+            provider.verify_payment_signature("order_1", "pay_1", bad)
+    with pytest.raises(SignatureVerificationError):
+        provider.verify_payment_signature("order_2", "pay_1", good)
+
+
+def test_webhook_signature_verification():
+    body = b'{"event":"payment.captured"}'
+    signature = hmac.new(b"whsec", body, hashlib.sha256).hexdigest()
+    assert verify_webhook_signature(body, signature, "whsec")
+    assert not verify_webhook_signature(body + b" ", signature, "whsec")
+    assert not verify_webhook_signature(body, signature, "other")
+    assert not verify_webhook_signature(body, None, "whsec")
+    assert not verify_webhook_signature(body, signature, None)
+
+
+def test_fake_provider_round_trip():
+    fake = FakePaymentProvider()
+    order = asyncio.run(fake.create_order(2500, receipt="topup-1"))
+    assert order["id"].startswith("order_") and fake.orders[order["id"]]["amount"] == 2500
+    fake.verify_payment_signature(order["id"], "pay_1", fake.sign_payment(order["id"], "pay_1"))
+    refund = asyncio.run(fake.refund("pay_1", 1000))
+    assert refund["status"] == "processed" and refund["id"] in fake.refunds
+    with pytest.raises(PaymentProviderError):
+        asyncio.run(fake.refund("bogus", 1000))
+
+
+def test_fake_provider_is_selected_by_setting(monkeypatch):
+    monkeypatch.setattr(payment_provider.settings, "PAYMENT_PROVIDER", "fake")
+    monkeypatch.setattr(payment_provider, "_provider", None)
+    assert isinstance(payment_provider.get_payment_provider(), FakePaymentProvider)
@@ -0,0 +1,107 @@
+# tests/test_payment_webhooks.py
+import asyncio
+
+import pytest
+
+from app.services import payment_webhooks
+from app.services.payment_webhooks import WebhookProcessor, event_id_for
+from fake_supabase import FakeSupabase
+
+
+def paid(order_id, payment_id="pay_1"):
+    return {"event": "payment.captured", "payload": {"payment": {"entity": {"id": payment_id, "order_id": order_id}}}}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    db = FakeSupabase(keys={"payment_webhook_events": ("event_id",)})
+    settled = []
+
+    def settle(items):
+        if db.failures.get(("payments_settle", "rpc")):
+            raise db.failures.pop(("payments_settle", "rpc"))
+        settled.append(items)
+        return [{"order_id": i["order_id"]} for i in items]
+
+    monkeypatch.setattr(payment_webhooks, "supabase_admin", db)
+    monkeypatch.setattr(payment_webhooks, "supabase", db)
+    monkeypatch.setattr(payment_webhooks, "settle_payments", settle)
+    return db, settled
+
+
+def recorded(db):
+    return sorted(row["event_id"] for row in db.tables.get("payment_webhook_events", []))
+
+
+def test_event_id_falls_back_to_body_hash():
+    assert event_id_for(b"{}", "evt_1") == "evt_1"
+    assert event_id_for(b"{}", None).startswith("sha256:")
+
+
+def test_events_are_recorded_after_settlement(env):
+    db, settled = env
+    processor = WebhookProcessor()
+    asyncio.run(processor._process([("evt_1", paid("order_1"), 0), ("evt_1", paid("order_1"), 0)]))
+    assert settled == [[{"order_id": "order_1", "payment_id": "pay_1", "signature": None}]]
+    assert recorded(db) == ["evt_1"]
+    assert db.calls.index(("payment_webhook_events", "upsert")) == len(db.calls) - 1
+
+
+def test_recorded_events_are_skipped(env):
+    db, settled = env
+    db.tables["payment_webhook_events"] = [{"event_id": "evt_1", "event": "payment.captured"}]
+    processor = WebhookProcessor()
+    asyncio.run(processor._process([("evt_1", paid("order_1"), 0)]))
+    assert settled == []
+    # Now known locally, so later deliveries skip the table too.
+    calls = len(db.calls)
+    asyncio.run(processor._process([("evt_1", paid("order_1"), 0)]))
+    assert len(db.calls) == calls
+
+
+def test_failed_settlement_leaves_the_event_unrecorded(env):
+    db, settled = env
+    db.failures[("payments_settle", "rpc")] = ConnectionError("rpc timeout")
+    processor = WebhookProcessor()
+    with pytest.raises(ConnectionError):
+        asyncio.run(processor._process([("evt_1", paid("order_1"), 0)]))
+    assert recorded(db) == []
+    # The provider's redelivery (or our retry) is processed, not dropped.
+    asyncio.run(processor._process([("evt_1", paid("order_1"), 0)]))
+    assert len(settled) == 1
+    assert recorded(db) == ["evt_1"]
+
+
+def test_payment_failed_marks_created_payments(env):
+    db, settled = env
+    db.tables["payments"] = [
+        {"provider_order_id": "order_2", "status": "created"},
+        {"provider_order_id": "order_3", "status": "succeeded"},
+    ]
+    failed = {"event": "payment.failed", "payload": {"payment": {"entity": {"order_id": "order_2"}}}}
+    other = {"event": "payment.failed", "payload": {"payment": {"entity": {"order_id": "order_3"}}}}
+    asyncio.run(WebhookProcessor()._process([("evt_2", failed, 0), ("evt_3", other, 0)]))
+    assert [row["status"] for row in db.tables["payments"]] == ["failed", "succeeded"]
+    assert settled == []
+    assert recorded(db) == ["evt_2", "evt_3"]
+
+
+def test_worker_retries_a_failed_batch(env):
+    db, settled = env
+    db.failures[("payments_settle", "rpc")] = ConnectionError("rpc timeout")
+
+    async def scenario():
+        processor = WebhookProcessor(workers=1, batch_wait=0.01)
+        processor.start()
+        try:
+            assert processor.enqueue("evt_1", paid("order_1"))
+            for _ in range(300):
+                if recorded(db):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await processor.stop(timeout=0.1)
+
+    asyncio.run(scenario())
+    assert len(settled) == 1
+    assert recorded(db) == ["evt_1"]
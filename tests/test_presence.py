@@ -0,0 +1,123 @@
+# tests/test_presence.py
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.websocket_manager import ConnectionManager
+from app.services import presence_service
+from fake_supabase import FakeSupabase
+
+
+class QuietWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        return None
+
+    async def send_text(self, frame):
+        self.sent.append(frame)
+
+    async def send_bytes(self, frame):
+        self.sent.append(frame)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+@pytest.fixture
+def env(monkeypatch):
+    manager = ConnectionManager()
+    db = FakeSupabase(keys={"user_presence": ("user_id",)})
+    db.rpcs["presence_touch"] = lambda params: None
+    monkeypatch.setattr(presence_service, "manager", manager)
+    monkeypatch.setattr(presence_service, "supabase_admin", db)
+    return manager, db
+
+
+def _iso(seconds_ago):
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)).isoformat()
+
+
+def test_heartbeat_leaves_listen_only_sockets_alone(env):
+    manager, _ = env
+
+    async def scenario():
+        listener = await manager.connect("u1", QuietWebSocket())
+        listener.last_seen -= 1000
+        manager.pop_seen_changes()
+        assert manager.heartbeat(idle_timeout=75) == {"pinged": 0, "reaped": 0}
+        assert time.time() - manager.last_seen("u1") >= 1000
+        assert manager.pop_seen_changes() == {}
+        assert manager.is_connected("u1")
+        manager.disconnect("u1")
+
+    asyncio.run(scenario())
+
+
+def test_heartbeat_pings_and_reaps_opted_in_sockets(env):
+    manager, _ = env
+
+    async def scenario():
+        live_ws, idle_ws = QuietWebSocket(), QuietWebSocket()
+        await manager.connect("live", live_ws, heartbeat=True)
+        idle = await manager.connect("idle", idle_ws, heartbeat=True)
+        idle.last_seen -= 1000
+        assert manager.heartbeat(idle_timeout=75) == {"pinged": 1, "reaped": 1}
+        await asyncio.sleep(0.01)
+        assert '"type":"ping"' in live_ws.sent[0]
+        assert idle_ws.closed_with == 1001
+        assert not manager.is_connected("idle")
+        manager.disconnect("live")
+
+    asyncio.run(scenario())
+
+
+def test_connect_and_inbound_traffic_mark_users_seen(env):
+    manager, _ = env
+
+    async def scenario():
+        connection = await manager.connect("u1", QuietWebSocket())
+        assert "u1" in manager.pop_seen_changes()
+        manager.touch(connection)
+        assert "u1" in manager.pop_seen_changes()
+        manager.disconnect("u1")
+
+    asyncio.run(scenario())
+
+
+def test_presence_falls_back_to_the_persisted_row(env):
+    _, db = env
+    db.tables["user_presence"] = [
+        {"user_id": "recent", "last_seen": _iso(10)},
+        {"user_id": "stale", "last_seen": _iso(3600)},
+    ]
+    recent = presence_service.get_presence("recent")
+    assert recent["online"] is True and recent["connections"] == 0
+    assert presence_service.get_presence("stale")["online"] is False
+    assert presence_service.get_presence("unknown") == {"user_id": "unknown", "online": False, "last_seen": None, "connections": 0}
+
+
+def test_presence_lookup_failure_uses_local_knowledge(env):
+    manager, db = env
+    db.failures[("user_presence", "select")] = ConnectionError("down")
+    manager.recently_seen.set("u1", time.time() - 5)
+    assert presence_service.get_presence("u1")["online"] is True
+
+
+def test_sync_presence_sends_changes_and_restores_them_on_failure(env):
+    manager, db = env
+    sent = []
+    db.rpcs["presence_touch"] = lambda params: sent.append(params["p_rows"])
+    manager._seen_changed = {"u1": time.time()}
+    assert presence_service.sync_presence() == {"synced": 1}
+    assert sent[0][0]["user_id"] == "u1"
+    assert presence_service.sync_presence() == {"synced": 0}
+
+    manager._seen_changed = {"u2": time.time()}
+    db.failures[("presence_touch", "rpc")] = ConnectionError("down")
+    assert "error" in presence_service.sync_presence()
+    assert "u2" in manager.pop_seen_changes()
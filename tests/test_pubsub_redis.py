@@ -0,0 +1,140 @@
+# tests/test_pubsub_redis.py
+"""RedisBackend against a minimal in-process RESP server (AUTH, SUBSCRIBE, PUBLISH)."""
+
+import asyncio
+
+import pytest
+
+from app.core.pubsub import RedisBackend, _StreamBackend, _read_reply, _resp_command
+
+
+class StubRedis:
+    def __init__(self, password=None):
+        self.password = password
+        self.subscribers = {}
+        self.writers = set()
+        self.commands = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _serve(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                args = await _read_reply(reader)
+                name = args[0].decode().upper()
+                self.commands.append(name)
+                if name == "AUTH":
+                    ok = args[-1].decode() == self.password
+                    writer.write(b"+OK\r\n" if ok else b"-WRONGPASS invalid password\r\n")
+                elif name == "SUBSCRIBE":
+                    channel = args[1]
+                    self.subscribers.setdefault(channel, set()).add(writer)
+                    writer.write(b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:1\r\n" % (len(channel), channel))
+                elif name == "PUBLISH":
+                    channel, payload = args[1], args[2]
+                    targets = self.subscribers.get(channel, set())
+                    for sub in targets:
+                        sub.write(_resp_command("message", channel, payload))
+                    writer.write(b":%d\r\n" % len(targets))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subs in self.subscribers.values():
+                subs.discard(writer)
+            self.writers.discard(writer)
+            writer.close()
+
+    def drop_connections(self):
+        for writer in list(self.writers):
+            writer.close()
+
+    async def stop(self):
+        self.server.close()
+        self.drop_connections()
+        await self.server.wait_closed()
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def test_resp_command_encoding():
+    assert _resp_command("PUBLISH", "ch", b"\x00hi") == b"*3\r\n$7\r\nPUBLISH\r\n$2\r\nch\r\n$3\r\n\x00hi\r\n"
+
+
+def test_publish_reaches_other_worker():
+    async def scenario():
+        stub = StubRedis(password="secret")
+        port = await stub.start()
+        received = []
+        a = RedisBackend(f"redis://:secret@127.0.0.1:{port}/0")
+        b = RedisBackend(f"redis://:secret@127.0.0.1:{port}/0")
+        await a.start(lambda payload: None)
+        await b.start(received.append)
+        try:
+            await _wait_for(lambda: a.stats["connected"] and b.stats["connected"])
+            a.publish(b"hello \r\n binary \x00")
+            await _wait_for(lambda: received)
+            assert received == [b"hello \r\n binary \x00"]
+            assert "AUTH" in stub.commands
+        finally:
+            await a.stop()
+            await b.stop()
+            await stub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_clears_connected_and_reconnects():
+    async def scenario():
+        stub = StubRedis()
+        port = await stub.start()
+        backend = RedisBackend(f"redis://127.0.0.1:{port}/0")
+        await backend.start(lambda payload: None)
+        try:
+            await _wait_for(lambda: backend.stats["connected"])
+            stub.drop_connections()
+            await _wait_for(lambda: not backend.stats["connected"])
+            # While disconnected, publish drops instead of queueing.
+            backend.publish(b"lost")
+            assert backend.stats["dropped"] == 1
+            await _wait_for(lambda: backend.stats["connected"], timeout=5.0)
+            assert backend.stats["reconnects"] == 1
+        finally:
+            await backend.stop()
+            await stub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_auth_failure_keeps_backend_disconnected():
+    async def scenario():
+        stub = StubRedis(password="secret")
+        port = await stub.start()
+        backend = RedisBackend(f"redis://:wrong@127.0.0.1:{port}/0")
+        await backend.start(lambda payload: None)
+        try:
+            await _wait_for(lambda: backend.stats["reconnects"] >= 1)
+            assert not backend.stats["connected"]
+        finally:
+            await backend.stop()
+            await stub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stream_backend_without_a_session_cannot_be_created():
+    class Incomplete(_StreamBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
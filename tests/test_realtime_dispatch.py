@@ -0,0 +1,117 @@
+# tests/test_realtime_dispatch.py
+import asyncio
+from datetime import datetime, timezone
+
+from app.services.realtime_dispatch import EventDispatcher, normalize_payload, parse_timestamp
+
+
+def test_normalize_current_payload_shape():
+    event = normalize_payload({"data": {
+        "table": "bookings", "type": "insert", "record": {"id": 1}, "old_record": None,
+        "commit_timestamp": "2025-01-01T00:00:00Z",
+    }})
+    assert event == {
+        "table": "bookings", "type": "INSERT", "new": {"id": 1}, "old": {},
+        "commit_timestamp": "2025-01-01T00:00:00Z",
+    }
+
+
+def test_normalize_legacy_payload_shape():
+    event = normalize_payload({"table": "listings", "eventType": "DELETE", "old": {"id": 7}})
+    assert (event["table"], event["type"], event["new"], event["old"]) == ("listings", "DELETE", {}, {"id": 7})
+
+
+def test_parse_timestamp_treats_naive_values_as_utc():
+    assert parse_timestamp("2025-01-01 10:00:00") == datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+    assert parse_timestamp("not a date") is None
+    assert parse_timestamp(None) is None
+
+
+def event(table, row_id, type_="UPDATE", **extra):
+    return {"table": table, "type": type_, "new": {"id": row_id, **extra}, "old": {}, "commit_timestamp": None}
+
+
+async def drain(dispatcher):
+    await asyncio.wait_for(asyncio.gather(*(q.join() for q in dispatcher._queues)), 2)
+
+
+def test_changes_to_one_row_are_handled_in_order():
+    async def scenario():
+        dispatcher = EventDispatcher(workers=4)
+        seen = []
+
+        async def handler(e):
+            await asyncio.sleep(0.001 * (3 - e["new"]["n"]))
+            seen.append((e["new"]["id"], e["new"]["n"]))
+
+        dispatcher.on("bookings", "*", handler)
+        dispatcher.start()
+        for n in range(3):
+            for row_id in (1, 2):
+                dispatcher.enqueue(event("bookings", row_id, n=n))
+        await drain(dispatcher)
+        await dispatcher.stop()
+        return seen
+
+    seen = asyncio.run(scenario())
+    for row_id in (1, 2):
+        assert [n for rid, n in seen if rid == row_id] == [0, 1, 2]
+
+
+def test_failed_and_unhandled_events_are_counted():
+    async def scenario():
+        dispatcher = EventDispatcher(workers=2)
+
+        async def broken(e):
+            raise RuntimeError("boom")
+
+        dispatcher.on("payments", "UPDATE", broken)
+        dispatcher.start()
+        dispatcher.enqueue(event("payments", 1))
+        dispatcher.enqueue(event("payments", 2, type_="DELETE"))
+        await drain(dispatcher)
+        await dispatcher.stop()
+        return dispatcher.stats
+
+    stats = asyncio.run(scenario())
+    assert stats["received"] == 2
+    assert stats["processed"] == 2
+    assert stats["failed"] == 1
+    assert stats["unhandled"] == 1
+
+
+def test_events_before_start_are_dropped():
+    dispatcher = EventDispatcher()
+    dispatcher.enqueue(event("bookings", 1))
+    assert dispatcher.stats["dropped"] == 1
+
+
+def test_full_queue_drops_instead_of_blocking():
+    async def scenario():
+        dispatcher = EventDispatcher(workers=1, queue_size=1)
+        dispatcher._queues = [asyncio.Queue(maxsize=1)]  # no consumer running
+        dispatcher.enqueue(event("bookings", 1))
+        dispatcher.enqueue(event("bookings", 2))
+        return dispatcher.stats["dropped"]
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_watermark_only_moves_forward():
+    dispatcher = EventDispatcher()
+    newer = {**event("bookings", 1), "commit_timestamp": "2025-01-02T00:00:00+00:00"}
+    older = {**event("bookings", 2), "commit_timestamp": "2025-01-01T00:00:00+00:00"}
+    dispatcher.enqueue(newer)
+    dispatcher.enqueue(older)
+    assert dispatcher.watermark("bookings") == datetime(2025, 1, 2, tzinfo=timezone.utc)
+    dispatcher.advance_watermark("bookings", datetime(2025, 1, 3, tzinfo=timezone.utc))
+    assert dispatcher.watermark("bookings") == datetime(2025, 1, 3, tzinfo=timezone.utc)
+
+
+def test_catch_up_events_do_not_count_as_live_lag():
+    dispatcher = EventDispatcher()
+    dispatcher.enqueue({**event("bookings", 1), "commit_timestamp": "2020-01-01T00:00:00+00:00", "catch_up": True})
+    stats = dispatcher.metrics()["tables"]["bookings"]
+    assert stats["catch_up_events"] == 1
+    assert stats["events"] == 0
+    assert stats["delivery_lag_ms"] == 0.0
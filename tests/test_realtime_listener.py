@@ -0,0 +1,150 @@
+# tests/test_realtime_listener.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import realtime_listener
+from app.services.realtime_dispatch import EventDispatcher
+
+
+class RecordingQuery:
+    """Records filters; returns `rows` for the requested range."""
+
+    def __init__(self, rows, log):
+        self.rows = rows
+        self.log = log
+
+    def select(self, columns):
+        return self
+
+    def gt(self, column, value):
+        self.log.append(("gt", column, value))
+        return self
+
+    def or_(self, filters):
+        self.log.append(("or", filters))
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self):
+        start, end = self.bounds
+        return SimpleNamespace(data=self.rows[start:end + 1])
+
+
+class RecordingSupabase:
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.log = []
+
+    def table(self, name):
+        return RecordingQuery(self.tables.get(name, []), self.log)
+
+
+class Recorder:
+    def __init__(self):
+        self.notified = []
+        self.logged = []
+
+    def notify(self, **kwargs):
+        self.notified.append(kwargs)
+
+    def log(self, *args):
+        self.logged.append(args)
+
+
+@pytest.fixture
+def env(monkeypatch):
+    db = RecordingSupabase()
+    dispatcher = EventDispatcher()
+    enqueued = []
+    monkeypatch.setattr(dispatcher, "enqueue", enqueued.append)
+    recorder = Recorder()
+    monkeypatch.setattr(realtime_listener, "supabase", db)
+    monkeypatch.setattr(realtime_listener, "dispatcher", dispatcher)
+    monkeypatch.setattr(realtime_listener, "admin_events", recorder)
+    monkeypatch.setitem(realtime_listener.listener_stats, "catch_ups", 0)
+    realtime_listener._notified.clear()
+    return db, dispatcher, enqueued, recorder
+
+
+SINCE = datetime(2025, 11, 1, 10, 0, 0, 123456, tzinfo=timezone.utc)
+
+
+def test_multi_column_watermark_filter_is_quoted(env):
+    db, *_ = env
+    realtime_listener._read_changed_rows("delivery_tasks", ("last_status_update", "last_update"), SINCE)
+    assert db.log == [(
+        "or",
+        'last_status_update.gt."2025-11-01T10:00:00.123456",last_update.gt."2025-11-01T10:00:00.123456"',
+    )]
+
+
+def test_single_column_watermark_uses_gt(env):
+    db, *_ = env
+    realtime_listener._read_changed_rows("bookings", ("updated_at",), SINCE)
+    assert db.log == [("gt", "updated_at", "2025-11-01T10:00:00.123456")]
+
+
+def test_read_changed_rows_pages_until_short_page(env, monkeypatch):
+    db, *_ = env
+    monkeypatch.setattr(realtime_listener, "CATCH_UP_PAGE", 2)
+    db.tables["bookings"] = [{"id": i} for i in range(5)]
+    assert [r["id"] for r in realtime_listener._read_changed_rows("bookings", ("updated_at",), SINCE)] == [0, 1, 2, 3, 4]
+
+
+def test_first_subscription_only_sets_watermarks(env):
+    db, dispatcher, enqueued, _ = env
+    dispatcher.on("bookings", "UPDATE", realtime_listener.handle_booking_change)
+    assert asyncio.run(realtime_listener.catch_up(SINCE)) == 0
+    assert enqueued == [] and db.log == []
+    assert dispatcher.watermark("bookings") == SINCE
+
+
+def test_reconnect_replays_changed_rows(env):
+    db, dispatcher, enqueued, _ = env
+    dispatcher.on("bookings", "UPDATE", realtime_listener.handle_booking_change)
+    dispatcher.on("categories", "*", realtime_listener.handle_category_change)
+    asyncio.run(realtime_listener.catch_up(SINCE))
+
+    db.tables["bookings"] = [{"id": 9, "status": "approved", "updated_at": "2025-11-01T10:05:00"}]
+    later = SINCE + timedelta(minutes=10)
+    assert asyncio.run(realtime_listener.catch_up(later)) == 1
+    by_table = {event["table"]: event for event in enqueued}
+    assert by_table["bookings"]["new"]["id"] == 9
+    assert by_table["bookings"]["catch_up"] is True and by_table["bookings"]["old"] == {}
+    assert by_table["bookings"]["commit_timestamp"] == "2025-11-01T10:05:00"
+    # Tables without change columns get one synthetic refresh event.
+    assert by_table["categories"]["new"] == {}
+    assert dispatcher.watermark("bookings") == later
+    # The margin covers clock skew between the database and this server.
+    assert db.log[0][2] == (SINCE - realtime_listener.CATCH_UP_MARGIN).replace(tzinfo=None).isoformat()
+
+
+def test_replayed_payment_notifies_once(env):
+    *_, recorder = env
+    live = {"new": {"id": 3, "status": "succeeded", "user_id": "u1", "amount": 100}, "old": {"status": "created"}}
+    replay = {"new": dict(live["new"]), "old": {}, "catch_up": True}
+    asyncio.run(realtime_listener.handle_payment_update(live))
+    asyncio.run(realtime_listener.handle_payment_update(replay))
+    assert len(recorder.notified) == 1 and len(recorder.logged) == 1
+
+
+def test_replayed_report_and_delivery_status_notify_once(env, monkeypatch):
+    *_, recorder = env
+    monkeypatch.setattr(realtime_listener, "delivery_index", SimpleNamespace(apply_task=lambda row: None))
+    monkeypatch.setattr(realtime_listener, "location_ingestor", SimpleNamespace(apply_task=lambda row: None))
+    report = {"new": {"id": 1, "issue_type": "damage", "listing_id": 4}, "old": {}}
+    asyncio.run(realtime_listener.handle_new_report(report))
+    asyncio.run(realtime_listener.handle_new_report(report))
+    task = {"new": {"id": 8, "status": "picked"}, "old": {}}
+    asyncio.run(realtime_listener.handle_delivery_update(task))
+    asyncio.run(realtime_listener.handle_delivery_update(task))
+    assert [n["title"] for n in recorder.notified] == ["New Report Filed", "Delivery picked"]
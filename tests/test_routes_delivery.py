@@ -0,0 +1,38 @@
+# tests/test_routes_delivery.py
+import pytest
+
+from app.api import routes_delivery
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    recorded = []
+    for name in ("create_self_delivery_task", "verify_pickup_otp", "verify_drop_otp"):
+        monkeypatch.setattr(routes_delivery, name, lambda *args, _name=name: recorded.append((_name, args)) or {"success": True})
+    return recorded
+
+
+def test_routes_act_as_the_authenticated_user(calls):
+    user = {"id": "u1"}
+    assert routes_delivery.schedule_self_delivery(5, user) == {"success": True}
+    assert routes_delivery.pickup_verify(5, "123456", user) == {"success": True}
+    assert routes_delivery.drop_verify(5, "654321", user) == {"success": True}
+    assert calls == [
+        ("create_self_delivery_task", (5, "u1")),
+        ("verify_pickup_otp", (5, "123456", "u1")),
+        ("verify_drop_otp", (5, "654321", "u1")),
+    ]
+
+
+def test_routes_reject_unauthenticated_callers(calls):
+    error = {"error": "Missing token"}
+    assert routes_delivery.schedule_self_delivery(5, error) == error
+    assert routes_delivery.pickup_verify(5, "123456", error) == error
+    assert routes_delivery.drop_verify(5, "654321", error) == error
+    assert calls == []
+
+
+def test_legacy_verify_paths_share_the_authenticated_handlers():
+    endpoints = {route.path: route.endpoint for route in routes_delivery.router.routes}
+    assert endpoints["/delivery/verify_pickup"] is endpoints["/delivery/pickup/verify"]
+    assert endpoints["/delivery/verify_drop"] is endpoints["/delivery/drop/verify"]
@@ -0,0 +1,110 @@
+# tests/test_search_service.py
+import asyncio
+from unittest import mock
+
+import pytest
+
+from app.services import search_service
+from app.services.search_service import ListingSearchIndex, tokenize
+from fake_supabase import FakeSupabase
+
+LISTINGS = [
+    {"id": 1, "title": "Mountain bike", "description": "Trek bike for trails", "price_per_day": 300, "category_id": 1, "created_at": "2025-11-01"},
+    {"id": 2, "title": "Camera tripod", "description": "Sturdy tripod, fits any bike mount", "price_per_day": 80, "category_id": 2, "created_at": "2025-11-02"},
+    {"id": 3, "title": "DSLR camera", "description": "Canon camera with lens", "price_per_day": 900, "category_id": 2, "created_at": "2025-11-03"},
+    {"id": 4, "title": "Tent", "description": "Four person tent", "price": 450, "category_id": 3, "created_at": "2025-11-04"},
+]
+
+
+@pytest.fixture
+def index():
+    idx = ListingSearchIndex()
+    idx.replace_all(LISTINGS)
+    return idx
+
+
+def ids(result):
+    return [hit["id"] for hit in result["results"]]
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("The Bike of a Kid, 2 wheels") == ["bike", "kid", "wheels"]
+    assert tokenize(None) == []
+
+
+def test_title_matches_outrank_description_matches(index):
+    result = index.search("bike")
+    assert ids(result) == [1, 2]
+    assert result["results"][0]["score"] > result["results"][1]["score"]
+
+
+def test_filters_and_facets(index):
+    result = index.search("camera", category_id=2, max_price=500)
+    assert ids(result) == [2]
+    assert result["total"] == 1
+    browse = index.search("", limit=2)
+    assert ids(browse) == [4, 3]  # newest first without a query
+    assert browse["total"] == 4
+    assert {f["value"]: f["count"] for f in browse["facets"]["category_id"]} == {1: 1, 2: 2, 3: 1}
+    assert dict((f["range"], f["count"]) for f in browse["facets"]["price_per_day"]) == {"0-100": 1, "100-500": 2, "500-1000": 1}
+
+
+def test_offset_pages_through_results(index):
+    assert ids(index.search("", limit=2, offset=2)) == [2, 1]
+
+
+def test_upsert_and_remove_keep_postings_consistent(index):
+    index.upsert({"id": 1, "title": "Road cycle", "description": "", "price_per_day": 200, "category_id": 1})
+    assert ids(index.search("bike")) == [2]
+    assert ids(index.search("cycle")) == [1]
+    index.remove(3)
+    assert index.search("canon")["total"] == 0
+    assert len(index) == 3
+
+
+def test_changes_during_a_rebuild_survive_the_swap():
+    idx = ListingSearchIndex()
+    idx.begin_rebuild()
+    idx.upsert({"id": 2, "title": "Camera tripod v2"})
+    idx.remove(3)
+    idx.upsert({"id": 5, "title": "Kayak"})
+    idx.replace_all(LISTINGS)  # snapshot read before those changes
+    assert idx.ready
+    assert ids(idx.search("v2")) == [2]
+    assert idx.search("canon")["total"] == 0
+    assert ids(idx.search("kayak")) == [5]
+    # Recording stops after the swap.
+    idx.upsert({"id": 6, "title": "Canoe"})
+    idx.replace_all(LISTINGS)
+    assert idx.search("canoe")["total"] == 0
+
+
+def test_build_search_index_loads_the_table(monkeypatch):
+    db = FakeSupabase()
+    db.tables["listings"] = [dict(row) for row in LISTINGS]
+    idx = ListingSearchIndex()
+    monkeypatch.setattr(search_service, "supabase", db)
+    monkeypatch.setattr(search_service, "listing_index", idx)
+    assert search_service.search_listings("bike") == {"error": "Search index is still building, try again shortly"}
+    assert search_service.build_search_index() == {"indexed": 4}
+    assert ids(search_service.search_listings("bike")) == [1, 2]
+
+
+def test_failed_build_is_retried_with_backoff(monkeypatch):
+    db = FakeSupabase()
+    db.tables["listings"] = [dict(row) for row in LISTINGS]
+    db.failures[("listings", "select")] = ConnectionError("supabase down")
+    idx = ListingSearchIndex()
+    monkeypatch.setattr(search_service, "supabase", db)
+    monkeypatch.setattr(search_service, "listing_index", idx)
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        if len(delays) == 3:
+            db.failures.clear()
+
+    with mock.patch.object(search_service.asyncio, "sleep", fake_sleep):
+        assert asyncio.run(search_service.build_search_index_with_retry(max_delay=3)) == {"indexed": 4}
+    assert delays == [1.0, 2.0, 3]
+    assert idx.ready
@@ -0,0 +1,57 @@
+# tests/test_track_service.py
+import numpy as np
+import pytest
+
+from app.services.track_service import decode_polyline, encode_polyline, simplify_track
+
+# Roughly 1.1 m per 1e-5 degree of latitude.
+METERS_PER_DEG = 111_195.0
+
+
+def test_encode_polyline_matches_reference():
+    # Example from Google's encoded polyline algorithm documentation.
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_polyline_round_trip():
+    rng = np.random.default_rng(0)
+    points = [(round(lat, 5), round(lng, 5)) for lat, lng in zip(rng.uniform(-80, 80, 50), rng.uniform(-179, 179, 50))]
+    decoded = decode_polyline(encode_polyline(points))
+    assert len(decoded) == len(points)
+    for (lat, lng), (exp_lat, exp_lng) in zip(decoded, points):
+        assert lat == pytest.approx(exp_lat, abs=1e-9)
+        assert lng == pytest.approx(exp_lng, abs=1e-9)
+
+
+def test_polyline_empty_and_precision():
+    assert encode_polyline([]) == ""
+    assert decode_polyline("") == []
+    [(lat, lng)] = decode_polyline(encode_polyline([(12.9715987, 77.5945627)], precision=6), precision=6)
+    assert (lat, lng) == (pytest.approx(12.971599, abs=1e-9), pytest.approx(77.594563, abs=1e-9))
+
+
+def test_simplify_keeps_short_tracks():
+    assert list(simplify_track(np.array([1.0, 2.0]), np.array([1.0, 2.0]))) == [0, 1]
+
+
+def test_simplify_drops_collinear_points():
+    lats = np.linspace(12.90, 12.91, 20)
+    lngs = np.full(20, 77.60)
+    assert list(simplify_track(lats, lngs)) == [0, 19]
+
+
+def test_simplify_keeps_corner_and_respects_tolerance():
+    # An L-shaped route with 3 m of jitter on each leg.
+    lats = np.array([12.9000, 12.9005, 12.9010, 12.9010, 12.9010])
+    lngs = np.array([77.6000, 77.6000 + 3 / METERS_PER_DEG, 77.6000, 77.6005, 77.6010])
+    kept = list(simplify_track(lats, lngs, tolerance_m=10.0))
+    assert kept == [0, 2, 4]
+    assert list(simplify_track(lats, lngs, tolerance_m=1.0)) == [0, 1, 2, 4]
+
+
+def test_simplify_handles_repeated_endpoints():
+    # A loop that ends where it started (zero-length base segment).
+    lats = np.array([12.90, 12.901, 12.90])
+    lngs = np.array([77.60, 77.60, 77.60])
+    assert list(simplify_track(lats, lngs)) == [0, 1, 2]
@@ -0,0 +1,61 @@
+# tests/test_wallet_cache.py
+import pytest
+
+from app.services import wallet_service
+from fake_supabase import FakeSupabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeSupabase()
+    fake.tables["wallets"] = [{"user_id": "u1", "balance": 40.0, "version": 3}]
+    fake.rpcs["wallet_apply"] = lambda params: [{"balance": 40.0 + params["p_delta"], "version": 4}]
+    monkeypatch.setattr(wallet_service, "supabase", fake)
+    monkeypatch.setattr(wallet_service, "supabase_admin", fake)
+    wallet_service._balance_cache.clear()
+    yield fake
+    wallet_service._balance_cache.clear()
+
+
+def reads(db):
+    return db.calls.count(("wallets", "select"))
+
+
+def test_balance_reads_are_cached(db):
+    assert wallet_service.get_wallet_balance("u1") == {"balance": 40.0}
+    assert wallet_service.get_wallet_balance("u1") == {"balance": 40.0}
+    assert reads(db) == 1
+
+
+def test_writes_update_the_cache(db):
+    wallet_service.credit_wallet("u1", 10, "Top-up")
+    assert wallet_service.get_wallet_balance("u1") == {"balance": 50.0}
+    assert reads(db) == 0
+
+
+def test_slow_read_cannot_overwrite_a_newer_balance(db):
+    wallet_service.credit_wallet("u1", 10, "Top-up")  # caches version 4
+    wallet_service._cache_balance("u1", 40.0, 3)  # a read that started before the write
+    wallet_service._cache_balance("u1", 0.0, None)
+    assert wallet_service.get_wallet_balance("u1") == {"balance": 50.0}
+
+
+@pytest.mark.parametrize("event, expected", [
+    ({"user_id": "u1", "balance": 70.0, "version": 5}, 70.0),  # newer write elsewhere
+    ({"user_id": "u1", "balance": 30.0, "version": 2}, 40.0),  # stale event
+])
+def test_realtime_events_keep_the_newer_balance(db, event, expected):
+    wallet_service.get_wallet_balance("u1")
+    wallet_service.apply_wallet_event(event)
+    assert wallet_service.get_wallet_balance("u1") == {"balance": expected}
+
+
+def test_events_without_a_version_invalidate(db):
+    wallet_service.get_wallet_balance("u1")
+    wallet_service.apply_wallet_event({"user_id": "u1", "balance": 99.0})
+    wallet_service.get_wallet_balance("u1")
+    assert reads(db) == 2
+
+
+def test_money_values_expire_quickly():
+    assert wallet_service._balance_cache.ttl <= 30
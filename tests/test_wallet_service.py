@@ -0,0 +1,65 @@
+# tests/test_wallet_service.py
+import pytest
+
+from app.services import wallet_service
+from fake_supabase import FakeSupabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeSupabase(keys={"wallets": ("user_id",)})
+
+    def wallet_apply(params):
+        """Same rules as the wallet_apply database function."""
+        wallets = fake.tables.setdefault("wallets", [])
+        wallet = next((w for w in wallets if w["user_id"] == params["p_user_id"]), None)
+        if wallet is None:
+            wallet = {"user_id": params["p_user_id"], "balance": 0.0, "version": 0}
+            wallets.append(wallet)
+        expected = params["p_expected_version"]
+        if expected is not None and wallet["version"] != expected:
+            raise Exception("version_conflict")
+        if wallet["balance"] + params["p_delta"] < 0:
+            raise Exception("insufficient_balance")
+        wallet["balance"] += params["p_delta"]
+        wallet["version"] += 1
+        fake.tables.setdefault("wallet_transactions", []).append({
+            "user_id": params["p_user_id"], "amount": abs(params["p_delta"]), "description": params["p_description"],
+        })
+        return [{"balance": wallet["balance"], "version": wallet["version"]}]
+
+    fake.rpcs["wallet_apply"] = wallet_apply
+    monkeypatch.setattr(wallet_service, "supabase", fake)
+    monkeypatch.setattr(wallet_service, "supabase_admin", fake)
+    wallet_service._balance_cache.clear()
+    yield fake
+    wallet_service._balance_cache.clear()
+
+
+def test_credit_and_debit_go_through_one_rpc(db):
+    assert wallet_service.credit_wallet("u1", 100, "Top-up") == {"balance": 100.0, "version": 1}
+    assert wallet_service.debit_wallet("u1", 30, "Booking fee") == {"balance": 70.0, "version": 2}
+    assert db.calls == [("wallet_apply", "rpc"), ("wallet_apply", "rpc")]
+    assert [t["amount"] for t in db.tables["wallet_transactions"]] == [100, 30]
+
+
+def test_debit_never_goes_negative(db):
+    wallet_service.credit_wallet("u1", 10, "Top-up")
+    assert wallet_service.debit_wallet("u1", 20, "Too much") == {"error": "Insufficient balance", "balance": 10.0}
+    assert db.tables["wallets"][0]["balance"] == 10.0
+
+
+def test_expected_version_detects_concurrent_writes(db):
+    wallet_service.credit_wallet("u1", 50, "Top-up")
+    assert wallet_service.debit_wallet("u1", 5, "Fee", expected_version=0) == {"error": "Wallet was modified concurrently, retry"}
+    assert wallet_service.debit_wallet("u1", 5, "Fee", expected_version=1)["version"] == 2
+
+
+def test_unexpected_rpc_errors_propagate(db):
+    db.failures[("wallet_apply", "rpc")] = ConnectionError("down")
+    with pytest.raises(ConnectionError):
+        wallet_service.credit_wallet("u1", 5, "Top-up")
+
+
+def test_missing_wallet_reads_as_zero(db):
+    assert wallet_service.get_wallet_record("nobody") == {"user_id": "nobody", "balance": 0, "version": 0}
@@ -0,0 +1,96 @@
+# tests/test_websocket_manager.py
+import asyncio
+
+from app.core.websocket_manager import ConnectionManager
+
+
+class SlowWebSocket:
+    """Accepts frames only once `release` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.sent = []
+
+    async def accept(self):
+        return None
+
+    async def send_text(self, frame):
+        await self.release.wait()
+        self.sent.append(frame)
+
+    async def send_bytes(self, frame):
+        await self.release.wait()
+        self.sent.append(frame)
+
+    async def close(self, code=1000):
+        return None
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def test_full_queue_drops_oldest_frames():
+    async def scenario():
+        manager = ConnectionManager(queue_size=3)
+        ws = SlowWebSocket()
+        connection = await manager.connect("u1", ws)
+        try:
+            # The writer hasn't run yet, so all six land in the queue.
+            for i in range(6):
+                manager.deliver_local("u1", f"m{i}")
+            assert connection.queue.qsize() == 3
+            assert connection.dropped == 3
+            assert manager.stats["messages_dropped"] == 3
+
+            ws.release.set()
+            await _wait_for(lambda: len(ws.sent) == 3)
+            assert ws.sent == ["m3", "m4", "m5"]
+            assert manager.stats["messages_sent"] == 3
+        finally:
+            manager.disconnect("u1")
+
+    asyncio.run(scenario())
+
+
+def test_slow_socket_does_not_block_other_sockets():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2)
+        slow, fast = SlowWebSocket(), SlowWebSocket()
+        fast.release.set()
+        await manager.connect("u1", slow)
+        await manager.connect("u1", fast)
+        try:
+            for i in range(5):
+                manager.deliver_local("u1", f"m{i}")
+                await _wait_for(lambda: len(fast.sent) == i + 1)
+            assert fast.sent == [f"m{i}" for i in range(5)]
+            assert slow.sent == []
+            assert manager.stats["messages_dropped"] > 0
+        finally:
+            manager.disconnect("u1")
+
+    asyncio.run(scenario())
+
+
+def test_frames_follow_connection_encoding():
+    async def scenario():
+        manager = ConnectionManager(queue_size=5)
+        text_ws, binary_ws = SlowWebSocket(), SlowWebSocket()
+        text_ws.release.set()
+        binary_ws.release.set()
+        await manager.connect("u1", text_ws)
+        await manager.connect("u1", binary_ws, encoding="binary")
+        try:
+            manager.deliver_local("u1", {"json": "{}", "binary": b"\x01"})
+            await _wait_for(lambda: text_ws.sent and binary_ws.sent)
+            assert text_ws.sent == ["{}"]
+            assert binary_ws.sent == [b"\x01"]
+        finally:
+            manager.disconnect("u1")
+
+    asyncio.run(scenario())
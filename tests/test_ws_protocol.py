@@ -0,0 +1,47 @@
+# tests/test_ws_protocol.py
+import pytest
+
+from app.core.ws_protocol import DELIVERY_UPDATE, STATUS_NAMES, decode_delivery_update, encode_delivery_update
+
+
+@pytest.mark.parametrize("status", list(STATUS_NAMES.values()) + [None])
+def test_round_trip(status):
+    frame = encode_delivery_update(123, 1730000000123, 12.9715987, 77.5945627, status)
+    assert len(frame) == DELIVERY_UPDATE.size == 32
+    assert decode_delivery_update(frame) == {
+        "type": "delivery_update",
+        "task_id": 123,
+        "lat": 12.9715987,
+        "lng": 77.5945627,
+        "status": status,
+        "seq": 1730000000123,
+    }
+
+
+def test_unknown_status_and_missing_seq():
+    decoded = decode_delivery_update(encode_delivery_update("7", None, -33.9, 151.2, "teleported"))
+    assert decoded["task_id"] == 7
+    assert decoded["status"] is None
+    assert decoded["seq"] is None
+
+
+def test_canceled_spelling_decodes_to_cancelled():
+    assert decode_delivery_update(encode_delivery_update(1, 1, 0.0, 0.0, "canceled"))["status"] == "cancelled"
+
+
+@pytest.mark.parametrize("task_id, seq, lat", [
+    (-1, 1, 0.0),
+    (2 ** 32, 1, 0.0),
+    (1, 2 ** 64, 0.0),
+    ("abc", 1, 0.0),
+    (1, 1, None),
+])
+def test_values_outside_the_layout_are_not_encoded(task_id, seq, lat):
+    assert encode_delivery_update(task_id, seq, lat, 0.0, "picked") is None
+
+
+def test_decode_rejects_other_message_types():
+    frame = bytearray(encode_delivery_update(1, 1, 0.0, 0.0, None))
+    frame[0] = 9
+    with pytest.raises(ValueError):
+        decode_delivery_update(bytes(frame))